@@ -0,0 +1,200 @@
+"""End-to-end crawl throughput against the local mock site, no network needed.
+
+Starts benchmarks.mock_site in a separate process, then runs each scenario in a
+fresh interpreter (so CPU time and peak RSS are per scenario) through the real
+crawl code:
+
+    sitemap           get_all_sitemaps_url + get_all_document_url
+    listing           process_urls_multithreaded over the Q&A listing pages
+    documents-thread  DocumentCrawler, thread engine
+    documents-process DocumentCrawler, fetch threads + parse processes
+    documents-async   DocumentCrawler, async engine
+    qa-thread         QACrawler, thread engine
+    qa-async          QACrawler, async engine
+    qa-stream         QACrawler.crawl_topics, pagination discovery and articles together
+
+and reports items/s, p50/p99 of the per-request latency (from the metrics
+registry), CPU seconds (parse workers included) and peak RSS.
+
+    python -m benchmarks.crawl_e2e [--documents 1000] [--latency 0.02 --jitter 0.01]
+        [--throttle-rate 0.01] [--disconnect-rate 0.005] [--scenarios ...] [--json out.json]
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from .mock_site import FIRST_ID, MockSite, SiteConfig, document_url
+
+SCENARIOS = ("sitemap", "listing", "documents-thread", "documents-process", "documents-async", "qa-thread", "qa-async", "qa-stream")
+TOPICS = ("lao-dong-tien-luong", "doanh-nghiep", "bat-dong-san", "bao-hiem")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Geometric buckets 1.05x apart from 0.1 ms to ~60 s, so p50/p99 are within 5%
+FINE_BUCKETS = tuple(round(0.0001 * 1.05 ** step, 7) for step in range(275))
+
+
+def cpu_seconds() -> float:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def listing_urls(base_url: str, pages: int):
+    return [f"{base_url}/phap-luat/{topic}?page={page}" for topic in TOPICS for page in range(1, pages + 1)]
+
+
+def run_scenario(scenario: str, args) -> dict:
+    """Run one scenario in this process and return its measurements."""
+    from src.crawler.document_crawler import DocumentCrawler
+    from src.crawler.qa_crawler import QACrawler
+    from src.crawler.sitemap_crawler import get_all_document_url, load_record_to_list
+    from src.extractor.qa_extractor import process_urls_multithreaded
+    from src.utils.metrics import CrawlMetrics, set_metrics
+    from src.utils.output_sink import JsonlSink
+    from src.utils.rate_limiter import configure_rate_limit
+    from src.utils.url_status import peak_rss_mb
+    from src.utils.url_utils import get_all_sitemaps_url, set_site_url
+
+    logging.disable(logging.INFO)
+    set_site_url(args.base_url)
+    # The politeness limiter would otherwise be what is measured
+    configure_rate_limit(rate=args.rate, max_rate=args.rate, concurrency=args.concurrency, max_concurrency=args.concurrency)
+    document_urls = [document_url(args.base_url, FIRST_ID + index) for index in range(args.documents)]
+    listing = None
+    if scenario in ("qa-thread", "qa-async"):
+        # The listing pages are not part of the measurement
+        listing = process_urls_multithreaded(listing_urls(args.base_url, args.listing_pages), max_workers=args.threads)
+
+    metrics = CrawlMetrics(buckets=FINE_BUCKETS)
+    set_metrics(metrics)
+    sink = JsonlSink(os.path.join(os.getcwd(), f"{scenario}.jsonl"))
+    cpu_start = cpu_seconds()
+    start = time.perf_counter()
+    if scenario == "sitemap":
+        get_all_document_url(get_all_sitemaps_url(args.base_url + "/sitemap.xml"), "urls", "sitemap", max_workers=args.threads)
+        items, failed = len(load_record_to_list(os.path.join("urls", "urls.lines"))), 0
+    elif scenario == "listing":
+        urls = listing_urls(args.base_url, args.listing_pages)
+        df = process_urls_multithreaded(urls, max_workers=args.threads)
+        items, failed = len(df), 0
+    elif scenario.startswith("documents"):
+        engine = "async" if scenario == "documents-async" else "thread"
+        crawler = DocumentCrawler(
+            num_threads=args.threads,
+            engine=engine,
+            concurrency=args.concurrency,
+            sink=sink,
+            use_processes=scenario != "documents-thread",
+            parse_workers=args.parse_workers,
+            bounded_memory=True,
+            metrics=metrics,
+        )
+        crawler.crawl_batch(document_urls)
+        crawler.close()
+        items, failed = crawler.status.success_count, crawler.status.failure_count
+    else:
+        crawler = QACrawler(
+            num_threads=args.threads,
+            engine="async" if scenario == "qa-async" else "thread",
+            concurrency=args.concurrency,
+            sink=sink,
+            parse_workers=args.parse_workers,
+            bounded_memory=True,
+            metrics=metrics,
+        )
+        if listing is None:
+            topics = [f"{args.base_url}/phap-luat/{topic}?page={{}}" for topic in TOPICS]
+            crawler.crawl_topics(topics, listing_threads=args.threads)
+        else:
+            crawler.crawl_batch(listing)
+        items, failed = crawler.status.success_count, crawler.status.failure_count
+    seconds = time.perf_counter() - start
+    cpu = cpu_seconds() - cpu_start
+    sink.close()
+
+    requests = metrics.histograms.get("request")
+    return {
+        "scenario": scenario,
+        "items": items,
+        "failed": failed,
+        "seconds": round(seconds, 3),
+        "items_per_second": round(items / seconds, 1) if seconds else 0.0,
+        "request_p50_ms": round(requests.quantile(0.5) * 1000, 2) if requests else None,
+        "request_p99_ms": round(requests.quantile(0.99) * 1000, 2) if requests else None,
+        "requests": requests.count if requests else 0,
+        "cpu_seconds": round(cpu, 3),
+        "peak_rss_mb": round(max(peak_rss_mb(), peak_rss_mb(children=True)), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--documents", type=int, default=1000, help="document pages to crawl (also the sitemap size)")
+    parser.add_argument("--listing-pages", type=int, default=5, help="listing pages per topic")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=64, help="async requests in flight and per-host slots")
+    parser.add_argument("--parse-workers", type=int, default=2)
+    parser.add_argument("--rate", type=float, default=5000.0, help="per-host requests/second allowed by the limiter")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--disconnect-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_scenario(args.run, args)))
+        return
+
+    config = SiteConfig(
+        parts=2,
+        urls_per_part=(args.documents + 1) // 2,
+        listing_pages=args.listing_pages,
+        latency=args.latency,
+        jitter=args.jitter,
+        throttle_rate=args.throttle_rate,
+        disconnect_rate=args.disconnect_rate,
+        seed=args.seed,
+    )
+    passthrough = [
+        "--documents", str(args.documents), "--listing-pages", str(args.listing_pages),
+        "--threads", str(args.threads), "--concurrency", str(args.concurrency),
+        "--parse-workers", str(args.parse_workers), "--rate", str(args.rate),
+    ]
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    results = []
+    print(f"{'scenario':18} {'items':>7} {'failed':>6} {'s':>7} {'items/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'CPU s':>7} {'RSS MB':>7}")
+    with MockSite(config) as site:
+        for scenario in args.scenarios:
+            # Scratch files (sinks, urls.lines, failed_links*.txt) stay in a temporary directory
+            with tempfile.TemporaryDirectory() as workdir:
+                completed = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.crawl_e2e", "--run", scenario, "--base-url", site.base_url, *passthrough],
+                    cwd=workdir, env=env, capture_output=True, text=True,
+                )
+            if completed.returncode:
+                print(f"{scenario:18} failed:\n{completed.stderr}", file=sys.stderr)
+                continue
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            results.append(result)
+            print(
+                f"{scenario:18} {result['items']:>7} {result['failed']:>6} {result['seconds']:>7.2f} "
+                f"{result['items_per_second']:>9.1f} {result['request_p50_ms'] or 0:>8.2f} {result['request_p99_ms'] or 0:>8.2f} "
+                f"{result['cpu_seconds']:>7.2f} {result['peak_rss_mb']:>7.1f}"
+            )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": config._asdict(), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Content dedup on a corpus with known duplicates: precision, recall, speed and bytes saved.
+
+Builds documents from the saved fixture (document_page/luocdo through the real
+extractors) and gives each original its own text by shuffling the words of the
+fixture with a per-document seed. Every original then gets copies under
+other document IDs:
+
+    exact       the same text
+    whitespace  the same text, re-wrapped and with changed letter case
+    edit        one word replaced
+    amended     a tenth of the text replaced by a new passage; must not match
+
+Every record goes through ContentIndex.add (what DocumentCrawler does with
+dedup) in shuffled order, and the decisions are compared with the truth.
+Exact matches become references without text; near matches keep theirs and
+are only annotated, so a wrong near match ("amended") loses nothing. The
+storage line compares the JSONL of every full record with what is stored.
+
+    python -m benchmarks.dedup [--originals 500] [--max-distance 3]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from src.crawler.document_crawler import clean_document
+from src.extractor.document_extractor import build_document, extract_document_content, parse_luocdo_content
+from src.utils.content_index import ContentIndex
+
+from .parity import DOCUMENT_URL, FIXTURES_DIR, read
+
+COPY_KINDS = ("exact", "whitespace", "edit", "amended")
+
+
+def vary(text: str, kind: str, rng: random.Random) -> str:
+    if kind == "exact":
+        return text
+    if kind == "whitespace":
+        lines = [" ".join(words) for words in _chunks(text.split(" "), 12)]
+        return "\n".join(line.upper() if index % 2 else "  " + line for index, line in enumerate(lines))
+    words = text.split(" ")
+    if kind == "edit":
+        words[rng.randrange(len(words))] = "sửa_đổi"
+        return " ".join(words)
+    size = len(words) // 10
+    start = rng.randrange(len(words) - size)
+    words[start:start + size] = [f"mới{rng.randrange(10 ** 6)}" for _ in range(size)]
+    return " ".join(words)
+
+
+def _chunks(items, size):
+    return [items[index:index + size] for index in range(0, len(items), size)]
+
+
+def corpus(originals: int, seed: int = 0):
+    """(url, record, original url or None, kind) for every original and its copies."""
+    attributes = parse_luocdo_content(DOCUMENT_URL, read(os.path.join(FIXTURES_DIR, "luocdo.html")))
+    base = build_document(DOCUMENT_URL, attributes, extract_document_content(read(os.path.join(FIXTURES_DIR, "document_page.html"))))
+    words = base["full_text"].split()
+    rng = random.Random(seed)
+    items, next_id = [], 435290
+    for _ in range(originals):
+        shuffled = words[:]
+        rng.shuffle(shuffled)
+        text = " ".join(shuffled)
+        original_url = DOCUMENT_URL.replace("435290", str(next_id))
+        next_id += 1
+        items.append((original_url, dict(base, url=original_url, full_text=text), None, "original"))
+        for kind in COPY_KINDS:
+            url = DOCUMENT_URL.replace("435290", str(next_id))
+            next_id += 1
+            items.append((url, dict(base, url=url, full_text=vary(text, kind, rng)), None if kind == "amended" else original_url, kind))
+    # Originals first, so every copy has something to match; the copies in random order
+    copies = [item for item in items if item[3] != "original"]
+    rng.shuffle(copies)
+    return [item for item in items if item[3] == "original"] + copies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--originals", type=int, default=500)
+    parser.add_argument("--max-distance", type=int, default=3, choices=range(4))
+    args = parser.parse_args()
+
+    items = corpus(args.originals)
+    with tempfile.TemporaryDirectory() as directory:
+        index = ContentIndex(os.path.join(directory, "frontier.sqlite3"), max_distance=args.max_distance)
+        found = {}
+        start = time.perf_counter()
+        for url, record, _, _ in items:
+            found[url] = index.add(url, record["full_text"])
+        seconds = time.perf_counter() - start
+        index.close()
+
+    print(f"{len(items)} documents indexed in {seconds:.2f} s ({len(items) / seconds:.0f} docs/s)")
+    print(f"{'kind':>10} {'count':>6} {'matched':>8} {'right':>6} {'refs':>6} {'notes':>6}")
+    true_positives = false_positives = expected = 0
+    for kind in ("original",) + COPY_KINDS:
+        group = [(url, truth) for url, _, truth, item_kind in items if item_kind == kind]
+        matched = [(url, truth) for url, truth in group if found[url] is not None]
+        right = sum(1 for url, truth in matched if truth and found[url].url == truth)
+        references = sum(1 for url, _ in matched if found[url].exact)
+        print(f"{kind:>10} {len(group):>6} {len(matched):>8} {right:>6} {references:>6} {len(matched) - references:>6}")
+        true_positives += right
+        false_positives += len(matched) - right
+        expected += sum(1 for _, truth in group if truth)
+    precision = true_positives / max(1, true_positives + false_positives)
+    print(f"precision {precision:.3f}  recall {true_positives / max(1, expected):.3f}")
+
+    full = stored = 0
+    for url, record, _, _ in items:
+        line = len(json.dumps(clean_document(record), ensure_ascii=False).encode("utf-8")) + 1
+        full += line
+        duplicate = found[url]
+        if duplicate is None or not duplicate.exact:
+            stored += line
+        else:
+            reference = {key: record[key] for key in ("source_id", "source", "url", "title", "attribute")}
+            reference.update(duplicate_of=duplicate.key, duplicate_url=duplicate.url, similarity=duplicate.similarity)
+            stored += len(json.dumps(reference, ensure_ascii=False).encode("utf-8")) + 1
+    print(f"storage: {full / 1024 / 1024:.1f} MB as full records, {stored / 1024 / 1024:.1f} MB with references ({1 - stored / full:.0%} saved)")
+
+
+if __name__ == "__main__":
+    main()
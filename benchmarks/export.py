@@ -0,0 +1,134 @@
+"""Parquet export against the old JSON output: export time, then load time and memory of each.
+
+Builds a synthetic corpus from the saved fixtures (the real extractors on
+document_page/luocdo and qa_article, with document types, issue dates and Q&A
+types varied), writes it both as the old indented documents.json array and as
+JSONL, exports the JSONL with export_parquet (what main_export.py runs) and compares
+
+    json.load           the whole documents.json, as dataset building does today
+    meta columns        title + issued_date of every document, from the meta group
+    partition           the same columns for one document type and the years >= 2020
+
+Every exported row is checked against document_row/qa_row of its record.
+
+    python -m benchmarks.export [--documents 2000] [--articles 2000] [--keep DIR]
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from src.crawler.qa_crawler import extract_qa
+from src.extractor.document_extractor import build_document, extract_document_content, parse_luocdo_content
+from src.utils.output_sink import JsonlSink
+from src.utils.parquet_export import KINDS, ds, export_parquet, pa, read_export
+
+from .parity import DOCUMENT_URL, FIXTURES_DIR, QA_ARGS, QA_URL, read
+
+DOCUMENT_TYPES = ("Nghị định", "Thông tư", "Quyết định", "Luật", "Công văn")
+QA_TYPES = ("lao-dong-tien-luong", "doanh-nghiep", "bat-dong-san", "bao-hiem")
+
+
+def documents(count: int):
+    attributes = parse_luocdo_content(DOCUMENT_URL, read(os.path.join(FIXTURES_DIR, "luocdo.html")))
+    html_text = extract_document_content(read(os.path.join(FIXTURES_DIR, "document_page.html")))
+    for index, document_type in zip(range(count), itertools.cycle(DOCUMENT_TYPES)):
+        varied = dict(attributes, **{"Loại văn bản": document_type, "Ngày ban hành": f"{index % 28 + 1:02d}/{index % 12 + 1:02d}/{2000 + index % 25}"})
+        url = DOCUMENT_URL.replace("435290", str(435290 + index))
+        yield build_document(url, varied, html_text)
+
+
+def articles(count: int):
+    article = extract_qa(QA_URL, read(os.path.join(FIXTURES_DIR, "qa_article.html")), *QA_ARGS)
+    for index, qa_type in zip(range(count), itertools.cycle(QA_TYPES)):
+        metadata = dict(article["metadata"], type=qa_type, date_published=f"{index % 28 + 1:02d}/{index % 12 + 1:02d}/2024")
+        yield dict(article, urls=QA_URL.replace(".html", f"-{index}.html"), metadata=metadata)
+
+
+def measure(func):
+    """Seconds and peak MB of one call: traced Python allocations plus what Arrow still holds after it."""
+    arrow_before = pa.total_allocated_bytes()
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func()
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, (peak + pa.total_allocated_bytes() - arrow_before) / 1024 / 1024
+
+
+def write_corpus(records, directory: str, name: str) -> str:
+    """Write `records` as JSONL and as the old JSON array; returns the JSONL path."""
+    jsonl_path = os.path.join(directory, f"{name}.jsonl")
+    sink = JsonlSink(jsonl_path)
+    with open(os.path.join(directory, f"{name}.json"), "w", encoding="utf-8") as f:
+        f.write("[")
+        for index, record in enumerate(records):
+            sink.write(record)
+            f.write(",\n  " if index else "\n  ")
+            f.write(json.dumps(record, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+        f.write("\n]")
+    sink.close()
+    return jsonl_path
+
+
+def check(kind: str, records, output_dir: str) -> None:
+    """Every exported row equals the flattened record it came from."""
+    spec = KINDS[kind]
+    expected = {row["url"]: row for row in map(spec.row, records)}
+    for group in spec.groups:
+        table = read_export(output_dir, kind, group)
+        if table.num_rows != len(expected):
+            raise SystemExit(f"{kind}/{group}: {table.num_rows} rows, expected {len(expected)}")
+        for row in table.to_pylist():
+            want = expected[row["url"]]
+            if any(row[name] != want[name] for name in row):
+                raise SystemExit(f"{kind}/{group}: {row['url']} differs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--articles", type=int, default=2000)
+    parser.add_argument("--keep", help="write the corpus and exports here instead of a temporary directory")
+    args = parser.parse_args()
+
+    directory = args.keep or tempfile.mkdtemp()
+    os.makedirs(directory, exist_ok=True)
+    try:
+        print(f"{'step':34} {'rows':>7} {'s':>8} {'peak MB':>8}")
+        for kind, records in (("documents", list(documents(args.documents))), ("qa", list(articles(args.articles)))):
+            jsonl_path = write_corpus(records, directory, kind)
+            output_dir = os.path.join(directory, "parquet", kind)
+            rows, seconds, peak = measure(lambda: export_parquet([jsonl_path], output_dir, kind=kind))
+            print(f"{kind + ' export':34} {rows:>7} {seconds:>8.3f} {peak:>8.1f}")
+            check(kind, records, output_dir)
+
+            with open(os.path.join(directory, f"{kind}.json"), encoding="utf-8") as f:
+                loaded, seconds, peak = measure(lambda: json.load(f))
+            print(f"{kind + ' json.load':34} {len(loaded):>7} {seconds:>8.3f} {peak:>8.1f}")
+            del loaded
+
+            columns = ["title", "issued_date"] if kind == "documents" else ["title", "date_published"]
+            table, seconds, peak = measure(lambda: read_export(output_dir, kind, "meta", columns))
+            print(f"{kind + ' meta columns':34} {table.num_rows:>7} {seconds:>8.3f} {peak:>8.1f}")
+            if kind == "documents":
+                only = (ds.field("document_type") == DOCUMENT_TYPES[0]) & (ds.field("year") >= 2020)
+            else:
+                only = ds.field("type") == QA_TYPES[0]
+            table, seconds, peak = measure(lambda: read_export(output_dir, kind, "meta", columns, only))
+            print(f"{kind + ' partition':34} {table.num_rows:>7} {seconds:>8.3f} {peak:>8.1f}")
+        print("exported rows match their records")
+    finally:
+        if not args.keep:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Micro-benchmarks and golden-output checks for the extractor functions.
+
+Every case runs the network-free part of a crawl step on each saved fixture
+that matches it:
+
+    get_document_content        extract_document_content on document_*.html
+    document_attributes         parse_luocdo_content (get_document_attributes_from_ajax) on luocdo*.html
+    modify_document_attribute   on the parsed luocdo*.html attributes
+    extract_raw_text_from_html  on the content div of document_*.html, per text mode
+    get_all_sub_qa_url          extract_sub_qa_url on qa_listing*.html
+    crawl_qa                    extract_qa (the h2 sibling walk) on qa_article*.html
+
+The parsing cases run on every parser backend. Each output is serialized
+canonically and compared with benchmarks/golden.json, so an optimization must
+be byte-equivalent on every backend (the *_malformed.html fixtures are held
+to html.parser's output only; see benchmarks/parity.py). Timings (best and median per call) and
+peak traced allocations are compared with benchmarks/baseline.json.
+
+    python -m benchmarks.extractors [--filter crawl_qa] [--repeat 7] [--max-ratio 1.5]
+    python -m benchmarks.extractors --update-golden   # after an intended output change
+    python -m benchmarks.extractors --save-baseline   # after a measured speed-up
+
+Exits non-zero on a golden mismatch, or when --max-ratio is given and a case got
+slower than that many times its baseline.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Iterator, Tuple
+
+import pandas as pd
+
+from src.crawler.qa_crawler import extract_qa
+from src.extractor.document_extractor import (
+    TEXT_MODES,
+    extract_document_content,
+    extract_raw_text_from_html,
+    get_text_mode,
+    modify_document_attribute,
+    parse_luocdo_content,
+    set_text_mode,
+)
+from src.extractor.qa_extractor import extract_sub_qa_url
+from src.utils.html_parser import BACKENDS, get_parser_backend, set_parser_backend
+
+from .parity import DOCUMENT_URL, FIXTURES_DIR, LISTING_URL, QA_ARGS, QA_URL, known_gap, read
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_PATH = os.path.join(BENCHMARKS_DIR, "golden.json")
+BASELINE_PATH = os.path.join(BENCHMARKS_DIR, "baseline.json")
+# Calls per timing sample are raised until one sample takes at least this long
+MIN_SAMPLE_SECONDS = 0.02
+
+# name -> (fixture pattern, prepare(raw bytes) -> argument, function, variants), where
+# variants is "backend" (run on every parser backend, one golden output for all),
+# "text_mode" (run and kept per text mode) or None
+CASES = {
+    "get_document_content": ("document_*.html", lambda raw: raw, extract_document_content, "backend"),
+    "document_attributes": ("luocdo*.html", lambda raw: raw, lambda raw: parse_luocdo_content(DOCUMENT_URL, raw), "backend"),
+    "modify_document_attribute": ("luocdo*.html", lambda raw: parse_luocdo_content(DOCUMENT_URL, raw), modify_document_attribute, None),
+    "extract_raw_text_from_html": ("document_*.html", extract_document_content, extract_raw_text_from_html, "text_mode"),
+    "get_all_sub_qa_url": ("qa_listing*.html", lambda raw: raw, lambda raw: extract_sub_qa_url(raw, LISTING_URL), "backend"),
+    "crawl_qa": ("qa_article*.html", lambda raw: raw, lambda raw: extract_qa(QA_URL, raw, *QA_ARGS), "backend"),
+}
+
+
+def canonical(output: Any) -> bytes:
+    """Byte serialization of an extractor result that golden digests are taken over."""
+    if isinstance(output, pd.DataFrame):
+        output = output.to_dict("records")
+    if isinstance(output, str):
+        return output.encode("utf-8")
+    return json.dumps(output, ensure_ascii=False, sort_keys=True, indent=1).encode("utf-8")
+
+
+def variants(kind) -> Iterator[Tuple[str, str]]:
+    if kind is None:
+        yield "", ""
+        return
+    names = BACKENDS if kind == "backend" else TEXT_MODES
+    setter = set_parser_backend if kind == "backend" else set_text_mode
+    for name in names:
+        try:
+            setter(name)
+        except ValueError:
+            continue
+        yield kind, name
+
+
+def measure(func: Callable[[Any], Any], argument: Any, repeat: int) -> Tuple[float, float, int]:
+    """Best and median seconds per call over `repeat` samples, and peak traced bytes of one call."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func(argument)
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SAMPLE_SECONDS:
+            break
+        number *= 2 if elapsed else 10
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func(argument)
+        samples.append((time.perf_counter() - start) / number)
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        func(argument)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(samples), statistics.median(samples), peak
+
+
+def load_json(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_json(path: str, data: dict) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    parser.add_argument("--filter", help="only cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--max-ratio", type=float, help="fail when a case is this many times slower than its baseline")
+    parser.add_argument("--update-golden", action="store_true", help="record the current outputs as golden")
+    parser.add_argument("--save-baseline", action="store_true", help="record the current timings as the baseline")
+    parser.add_argument("--dump", help="write every output to this directory, for diffing a golden mismatch")
+    args = parser.parse_args()
+
+    golden = load_json(GOLDEN_PATH)
+    baseline = load_json(BASELINE_PATH).get("cases", {})
+    recorded, timings = {}, {}
+    mismatches, regressions = [], []
+    original_backend, original_mode = get_parser_backend(), get_text_mode()
+
+    print(f"{'case':62} {'KB':>6} {'best ms':>9} {'median ms':>10} {'base ms':>8} {'ratio':>6} {'peak KB':>8}  golden")
+    for name, (pattern, prepare, func, kind) in CASES.items():
+        if args.filter and args.filter not in name:
+            continue
+        for path in sorted(glob.glob(os.path.join(args.fixtures, pattern))):
+            fixture = os.path.basename(path)
+            raw = read(path)
+            for variant_kind, variant in variants(kind):
+                # Every backend must give the one golden output; text modes each have their own
+                golden_key = f"{name}[{variant}]/{fixture}" if variant_kind == "text_mode" else f"{name}/{fixture}"
+                key = f"{name}[{variant}]/{fixture}" if variant else golden_key
+                argument = prepare(raw)
+                output = canonical(func(argument))
+                digest = {"sha256": hashlib.sha256(output).hexdigest(), "bytes": len(output)}
+                if args.dump:
+                    os.makedirs(args.dump, exist_ok=True)
+                    with open(os.path.join(args.dump, key.replace("/", "__")), "wb") as f:
+                        f.write(output)
+
+                gap = variant_kind == "backend" and known_gap(path, variant)
+                if args.update_golden:
+                    if gap:
+                        status = "known gap" if recorded.get(golden_key, digest) != digest else "ok"
+                    else:
+                        if recorded.setdefault(golden_key, digest) != digest:
+                            mismatches.append(f"{key}: backends disagree")
+                        status = "recorded"
+                elif golden_key not in golden:
+                    status = "missing"
+                elif golden[golden_key] != digest:
+                    if gap:
+                        status = "known gap"
+                    else:
+                        mismatches.append(f"{key}: {digest['bytes']} bytes, golden has {golden[golden_key]['bytes']}")
+                        status = "MISMATCH"
+                else:
+                    status = "ok"
+
+                best, median, peak = measure(func, argument, args.repeat)
+                timings[key] = {"best_ms": round(best * 1000, 4), "median_ms": round(median * 1000, 4), "peak_kb": round(peak / 1024, 1)}
+                base = baseline.get(key)
+                ratio = best * 1000 / base["best_ms"] if base and base["best_ms"] else None
+                if ratio is not None and args.max_ratio and ratio > args.max_ratio:
+                    regressions.append(f"{key}: {ratio:.2f}x its baseline")
+                print(
+                    f"{key:62} {len(raw) / 1024:6.0f} {best * 1000:9.3f} {median * 1000:10.3f} "
+                    f"{base['best_ms'] if base else float('nan'):8.3f} {ratio if ratio is not None else float('nan'):6.2f} "
+                    f"{peak / 1024:8.1f}  {status}"
+                )
+    set_parser_backend(original_backend)
+    set_text_mode(original_mode)
+
+    if args.update_golden and not mismatches:
+        write_json(GOLDEN_PATH, {**golden, **recorded})
+        print(f"Wrote {GOLDEN_PATH}")
+    if args.save_baseline:
+        saved = load_json(BASELINE_PATH).get("cases", {})
+        saved.update(timings)
+        write_json(BASELINE_PATH, {"python": platform.python_version(), "machine": platform.machine(), "cases": saved})
+        print(f"Wrote {BASELINE_PATH}")
+    for problem in mismatches + regressions:
+        print(problem, file=sys.stderr)
+    if mismatches or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Peak RSS of DocumentCrawler's result bookkeeping as the corpus grows.
+
+Feeds N synthetic documents (copies of the document_page fixture with distinct
+URLs) through `_record_result`: "memory" keeps them in `self.documents` and saves
+one JSON file, "sink" streams them but keeps the URL lists, "bounded" uses
+`bounded_memory`. Each run is a fresh interpreter so ru_maxrss is per run.
+
+    python -m benchmarks.memory_growth [--sizes 1000 5000 20000]
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+
+from .parity import DOCUMENT_URL, FIXTURES_DIR, read
+
+MODES = ("memory", "sink", "bounded")
+
+
+def run(size: int, mode: str, output_dir: str) -> None:
+    from src.crawler.document_crawler import DocumentCrawler
+    from src.extractor.document_extractor import extract_document
+    from src.utils.output_sink import JsonlSink
+    from src.utils.url_status import peak_rss_mb
+
+    logging.disable(logging.INFO)
+    template = extract_document(
+        DOCUMENT_URL,
+        read(os.path.join(FIXTURES_DIR, "luocdo.html")),
+        read(os.path.join(FIXTURES_DIR, "document_page.html")),
+    )
+    sink = JsonlSink(os.path.join(output_dir, f"{mode}-{size}.jsonl"), max_records=10000) if mode != "memory" else None
+    crawler = DocumentCrawler(num_threads=1, sink=sink, bounded_memory=mode == "bounded")
+    for index in range(size):
+        url = f"https://thuvienphapluat.vn/van-ban/Linh-vuc/Van-ban-{index}-{100000 + index}.aspx"
+        # Fresh strings per record, as a real crawl would produce
+        doc = dict(template, url=url, html_text=template["html_text"] + str(index), full_text=template["full_text"] + str(index))
+        crawler._record_result(url, doc if index % 10 else None)
+    if sink is None:
+        crawler.save_documents(os.path.join(output_dir, f"{mode}-{size}.json"))
+    else:
+        sink.close()
+    crawler.close()
+    print(f"{peak_rss_mb():.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--run", nargs=2, metavar=("SIZE", "MODE"), help=argparse.SUPPRESS)
+    parser.add_argument("--output-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run(int(args.run[0]), args.run[1], args.output_dir)
+        return
+
+    print(f"{'documents':>10} " + " ".join(f"{mode + ' MB':>12}" for mode in MODES))
+    with tempfile.TemporaryDirectory() as output_dir:
+        for size in args.sizes:
+            cells = []
+            for mode in MODES:
+                result = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.memory_growth", "--run", str(size), mode, "--output-dir", output_dir],
+                    capture_output=True, text=True, check=True,
+                )
+                cells.append(f"{float(result.stdout.strip().splitlines()[-1]):12.1f}")
+            print(f"{size:>10} " + " ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
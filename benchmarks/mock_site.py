@@ -0,0 +1,229 @@
+"""Local stand-in for thuvienphapluat.vn serving the saved fixtures.
+
+Every page is generated from benchmarks/fixtures, so any number of documents
+and listing pages can be served:
+
+    /sitemap.xml                                  index of `parts` sitemap parts
+    /sitemaps/sitemaps_part<N>.xml                `urls_per_part` document URLs each
+    /van-ban/<field>/<slug>-<id>.aspx             document page (every 20th is login-gated,
+                                                  every 50th is the large fixture)
+    /AjaxLoadData/LoadLuocDo.aspx?LawID=<id>      document attributes
+    /phap-luat/<topic>?page=N                     Q&A listing, empty past `listing_pages`;
+                                                  the pager links to page `listing_pages`
+    /phap-luat/<slug>-<id>.html                   Q&A article
+
+Faults are injected per request: a `latency` + uniform(0, `jitter`) delay, a 429
+with Retry-After: 0 for a `throttle_rate` share and a dropped connection for a
+`disconnect_rate` share.
+
+    python -m benchmarks.mock_site [--port 8800] [--latency 0.02] [--throttle-rate 0.01]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import re
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from .parity import FIXTURES_DIR, read
+
+DOCUMENT_PATH = re.compile(r"^/van-ban/.+-(\d+)\.aspx$")
+ARTICLE_PATH = re.compile(r"^/phap-luat/.+-(\d+)\.html$")
+LISTING_PATH = re.compile(r"^/phap-luat/([^/]+)$")
+PART_PATH = re.compile(r"^/sitemaps/sitemaps_part(\d+)\.xml$")
+LISTING_LINK = re.compile(rb'href="/phap-luat/nguoi-lao-dong-co-quyen-gi-(\d+)\.html"')
+# Last-page link of the fixture's pager
+PAGER_LAST = b'?page=42">42<'
+# First document ID, so generated IDs look like the site's six-digit ones
+FIRST_ID = 100000
+
+
+class SiteConfig(NamedTuple):
+    parts: int = 2
+    urls_per_part: int = 500
+    listing_pages: int = 5
+    latency: float = 0.0
+    jitter: float = 0.0
+    throttle_rate: float = 0.0
+    disconnect_rate: float = 0.0
+    seed: Optional[int] = None
+
+
+def load_fixtures():
+    names = ("document_page", "document_page_large", "document_login", "luocdo", "qa_article", "qa_listing", "qa_listing_empty")
+    return {name: read(os.path.join(FIXTURES_DIR, name + ".html")) for name in names}
+
+
+def document_url(base_url: str, doc_id: int) -> str:
+    return f"{base_url}/van-ban/Linh-vuc/Van-ban-{doc_id - FIRST_ID}-{doc_id}.aspx"
+
+
+class MockSiteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; with Nagle on, the second one waits for
+    # the client's delayed ACK and every keep-alive response gains ~40 ms
+    disable_nagle_algorithm = True
+    config: SiteConfig
+    fixtures: dict
+    rng: random.Random
+
+    def do_GET(self):
+        config = self.config
+        delay = config.latency + (self.rng.uniform(0, config.jitter) if config.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        roll = self.rng.random()
+        if roll < config.disconnect_rate:
+            # No status line at all: the client sees the server drop the connection
+            self.close_connection = True
+            return
+        if roll < config.disconnect_rate + config.throttle_rate:
+            self._send(429, b"Too Many Requests", "text/plain", {"Retry-After": "0"})
+            return
+
+        split = urlsplit(self.path)
+        body = self._route(split.path, parse_qs(split.query))
+        if body is None:
+            self._send(404, b"Not Found", "text/plain")
+        else:
+            self._send(200, body, "application/xml" if split.path.endswith(".xml") else "text/html; charset=utf-8")
+
+    def _route(self, path: str, query: dict) -> Optional[bytes]:
+        base_url = f"http://{self.headers.get('Host')}"
+        config = self.config
+        match = DOCUMENT_PATH.match(path)
+        if match:
+            doc_id = int(match.group(1))
+            if doc_id % 20 == 0:
+                return self.fixtures["document_login"]
+            return self.fixtures["document_page_large" if doc_id % 50 == 1 else "document_page"]
+        if path == "/AjaxLoadData/LoadLuocDo.aspx":
+            return self.fixtures["luocdo"] if query.get("LawID") else None
+        match = ARTICLE_PATH.match(path)
+        if match:
+            return self.fixtures["qa_article"]
+        match = LISTING_PATH.match(path)
+        if match:
+            page = int(query.get("page", ["1"])[0])
+            last_link = b'?page=%d">%d<' % (config.listing_pages, config.listing_pages)
+            if page > config.listing_pages:
+                return self.fixtures["qa_listing_empty"].replace(PAGER_LAST, last_link)
+            # Distinct article IDs per topic and page
+            offset = (zlib.crc32(match.group(1).encode()) % 1000 * 1000 + page) * 100
+            return LISTING_LINK.sub(
+                lambda m: b'href="/phap-luat/%s-%d.html"' % (match.group(1).encode(), offset + int(m.group(1))),
+                self.fixtures["qa_listing"],
+            ).replace(PAGER_LAST, last_link)
+        if path == "/sitemap.xml":
+            locs = "".join(
+                f"<sitemap><loc>{base_url}/sitemaps/sitemaps_part{part}.xml</loc><lastmod>2024-03-01</lastmod></sitemap>\n"
+                for part in range(1, config.parts + 1)
+            )
+            return (
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n' + locs + "</sitemapindex>\n"
+            ).encode("utf-8")
+        match = PART_PATH.match(path)
+        if match and 1 <= int(match.group(1)) <= config.parts:
+            first = FIRST_ID + (int(match.group(1)) - 1) * config.urls_per_part
+            urls = "".join(
+                f"<url><loc>{document_url(base_url, doc_id)}</loc><lastmod>2024-02-15</lastmod><changefreq>weekly</changefreq></url>\n"
+                for doc_id in range(first, first + config.urls_per_part)
+            )
+            return (
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n' + urls + "</urlset>\n"
+            ).encode("utf-8")
+        return None
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[dict] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockSiteServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The crawlers open hundreds of keep-alive connections at once
+    request_queue_size = 1024
+
+
+def create_server(config: SiteConfig, port: int = 0, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    handler = type("Handler", (MockSiteHandler,), {
+        "config": config,
+        "fixtures": load_fixtures(),
+        "rng": random.Random(config.seed),
+    })
+    return MockSiteServer((host, port), handler)
+
+
+def _serve(config: SiteConfig, port: int, ready) -> None:
+    server = create_server(config, port)
+    ready.send(server.server_address[1])
+    ready.close()
+    server.serve_forever()
+
+
+class MockSite:
+    """Run the mock site in its own process so its CPU time never counts as the crawler's."""
+
+    def __init__(self, config: SiteConfig = SiteConfig(), port: int = 0):
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self.config = config
+        self.process = multiprocessing.Process(target=_serve, args=(config, port, sender), daemon=True)
+        self.process.start()
+        self.port = receiver.recv()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+
+    def document_urls(self, count: int):
+        return [document_url(self.base_url, FIRST_ID + index) for index in range(count)]
+
+    def close(self) -> None:
+        self.process.terminate()
+        self.process.join()
+
+    def __enter__(self) -> "MockSite":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--parts", type=int, default=SiteConfig.parts)
+    parser.add_argument("--urls-per-part", type=int, default=SiteConfig.urls_per_part)
+    parser.add_argument("--listing-pages", type=int, default=SiteConfig.listing_pages)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra uniform random delay, up to this many seconds")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0, help="share of requests whose connection is dropped")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    config = SiteConfig(
+        args.parts, args.urls_per_part, args.listing_pages,
+        args.latency, args.jitter, args.throttle_rate, args.disconnect_rate, args.seed,
+    )
+    server = create_server(config, args.port)
+    print(f"Serving on http://127.0.0.1:{server.server_address[1]}/sitemap.xml")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
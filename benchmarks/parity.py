@@ -0,0 +1,138 @@
+"""Check that every parser backend gives the same extractor output as html.parser.
+
+The reference is the original code path (a full BeautifulSoup 'html.parser' tree);
+each backend in src.utils.html_parser.BACKENDS is run through the production
+extract_* functions, strainers included.
+
+    python -m benchmarks.parity [--fixtures DIR]
+
+Exits non-zero on the first mismatch. Drop saved pages named like the existing
+fixtures (document_page*.html, qa_article*.html, qa_listing*.html) into the
+fixture directory to widen the check.
+
+Known gap: html.parser nests an unclosed <p>/<td>/<li> inside the next one,
+while libxml2 closes it first, so such markup serializes differently under
+"lxml". The *_malformed.html fixtures hold that markup; their lxml mismatches
+are printed as "known gap" and do not fail the run. This gap is why
+html.parser is still the default backend.
+"""
+import argparse
+import glob
+import os
+import sys
+
+from bs4 import BeautifulSoup
+
+from src.crawler.qa_crawler import extract_qa, parse_qa_article
+from src.extractor.document_extractor import (
+    build_document,
+    extract_document,
+    get_document_content,
+    parse_document_attributes,
+)
+from src.extractor.qa_extractor import extract_listing_page, parse_last_page, parse_sub_qa_records
+from src.utils.html_parser import BACKENDS, set_parser_backend, get_parser_backend
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+DOCUMENT_URL = "https://thuvienphapluat.vn/van-ban/Vi-pham-hanh-chinh/Nghi-dinh-15-2020-ND-CP-xu-phat-435290.aspx"
+QA_URL = "https://thuvienphapluat.vn/phap-luat/nguoi-lao-dong-co-nhung-quyen-gi-123456.html"
+LISTING_URL = "https://thuvienphapluat.vn/phap-luat/lao-dong-tien-luong?page=1"
+QA_ARGS = (["quyền của người lao động"], "08:30", "12/03/2024", "lao-dong-tien-luong")
+REFERENCE_BACKEND = "html.parser"
+
+
+def known_gap(path, backend):
+    """Whether `backend` may differ from html.parser on this fixture (malformed markup, see above)."""
+    return backend != REFERENCE_BACKEND and "_malformed" in os.path.basename(path)
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def reference_document(luocdo, page):
+    atts = parse_document_attributes(BeautifulSoup(luocdo, "html.parser"))
+    return build_document(DOCUMENT_URL, atts, get_document_content(BeautifulSoup(page, "html.parser")))
+
+
+def reference_listing_page(page):
+    soup = BeautifulSoup(page, "html.parser")
+    return parse_sub_qa_records(soup, LISTING_URL), parse_last_page(soup)
+
+
+def cases(fixtures_dir):
+    luocdo = read(os.path.join(fixtures_dir, "luocdo.html"))
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, "document_*.html"))):
+        page = read(path)
+        yield path, lambda page=page: reference_document(luocdo, page), lambda page=page: extract_document(DOCUMENT_URL, luocdo, page)
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, "qa_article*.html"))):
+        page = read(path)
+        yield (
+            path,
+            lambda page=page: parse_qa_article(BeautifulSoup(page, "html.parser"), QA_URL, *QA_ARGS),
+            lambda page=page: extract_qa(QA_URL, page, *QA_ARGS),
+        )
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, "qa_listing*.html"))):
+        page = read(path)
+        yield (
+            path,
+            lambda page=page: reference_listing_page(page),
+            lambda page=page: extract_listing_page(page, LISTING_URL),
+        )
+
+
+def first_difference(expected, actual, path="$"):
+    if type(expected) is not type(actual):
+        return f"{path}: {type(expected).__name__} != {type(actual).__name__}"
+    if isinstance(expected, dict):
+        for key in expected.keys() | actual.keys():
+            if key not in expected or key not in actual:
+                return f"{path}.{key}: missing on one side"
+            diff = first_difference(expected[key], actual[key], f"{path}.{key}")
+            if diff:
+                return diff
+        return None
+    if isinstance(expected, (list, tuple)):
+        if len(expected) != len(actual):
+            return f"{path}: length {len(expected)} != {len(actual)}"
+        for index, (e, a) in enumerate(zip(expected, actual)):
+            diff = first_difference(e, a, f"{path}[{index}]")
+            if diff:
+                return diff
+        return None
+    if expected != actual and not (expected != expected and actual != actual):  # NaN == NaN here
+        return f"{path}: {expected!r:.80} != {actual!r:.80}"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    original_backend = get_parser_backend()
+    failures = 0
+    for path, reference, candidate in cases(args.fixtures):
+        set_parser_backend(REFERENCE_BACKEND)
+        expected = reference()
+        for backend in BACKENDS:
+            try:
+                set_parser_backend(backend)
+            except ValueError:
+                continue
+            diff = first_difference(expected, candidate())
+            if diff is None:
+                status = "ok"
+            elif known_gap(path, backend):
+                status = f"known gap {diff}"
+            else:
+                status = f"MISMATCH {diff}"
+                failures += 1
+            print(f"{os.path.basename(path):32} {backend:12} {status}")
+    set_parser_backend(original_backend)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
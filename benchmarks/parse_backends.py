@@ -0,0 +1,57 @@
+"""Time the extract_* functions on the saved fixtures for every parser backend.
+
+    python -m benchmarks.parse_backends [--fixtures DIR] [--repeat N]
+"""
+import argparse
+import os
+import time
+
+from src.crawler.qa_crawler import extract_qa
+from src.extractor.document_extractor import extract_document_content, parse_luocdo_content
+from src.extractor.qa_extractor import extract_sub_qa_url
+from src.utils.html_parser import BACKENDS, get_parser_backend, set_parser_backend
+
+from .parity import DOCUMENT_URL, FIXTURES_DIR, LISTING_URL, QA_ARGS, QA_URL, read
+
+CASES = [
+    ("document_page_large.html", extract_document_content),
+    ("luocdo.html", lambda content: parse_luocdo_content(DOCUMENT_URL, content)),
+    ("qa_article_large.html", lambda content: extract_qa(QA_URL, content, *QA_ARGS)),
+    ("qa_listing.html", lambda content: extract_sub_qa_url(content, LISTING_URL)),
+]
+
+
+def best_of(func, content, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(content)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    original_backend = get_parser_backend()
+    print(f"{'fixture':28} {'KB':>6} " + " ".join(f"{backend:>12}" for backend in BACKENDS) + "  speedup")
+    for name, func in CASES:
+        content = read(os.path.join(args.fixtures, name))
+        timings = {}
+        for backend in BACKENDS:
+            try:
+                set_parser_backend(backend)
+            except ValueError:
+                continue
+            timings[backend] = best_of(func, content, args.repeat)
+        cells = " ".join(f"{timings[b] * 1000:10.1f}ms" if b in timings else f"{'-':>12}" for b in BACKENDS)
+        speedup = timings["html.parser"] / timings["lxml"] if "lxml" in timings else float("nan")
+        print(f"{name:28} {len(content) / 1024:6.0f} {cells}  {speedup:6.1f}x")
+    set_parser_backend(original_backend)
+
+
+if __name__ == "__main__":
+    main()
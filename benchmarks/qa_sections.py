@@ -0,0 +1,93 @@
+"""Time the Q&A section split of parse_qa_article against the old sibling walk.
+
+The old loop called find_next_siblings() for every <h2>, materializing all the
+following siblings of each heading (quadratic in the number of sections);
+split_sections walks each parent once. Both run on the saved articles and on
+synthetic articles with a growing number of sections, and must give the same
+record (the tree is parsed once up front and not timed).
+
+    python -m benchmarks.qa_sections [--sections 100 300 1000] [--repeat 3]
+"""
+import argparse
+import glob
+import os
+
+from src.crawler.qa_crawler import clean_text, flatten_and_join, parse_qa_article
+from src.utils.html_parser import make_soup
+
+from .parity import FIXTURES_DIR, QA_ARGS, QA_URL, read
+from .parse_backends import best_of
+
+
+def sibling_walk_article(soup, url, kw, time, date, type_of_qa):
+    """parse_qa_article as it was before split_sections."""
+    author = soup.find("span", {"class": "text-end fw-bold"})
+    introduction_tag = soup.find("strong", {"class": "d-block mt-3 mb-3 sapo"})
+    content = []
+    for h2_tag in soup.find_all("h2"):
+        sub_content = []
+        for sibling in h2_tag.find_next_siblings():
+            if sibling.name == 'h2':
+                break
+            if sibling.name == 'p':
+                img_tag = sibling.find("img")
+                if img_tag:
+                    sub_content.append(img_tag.get("src") if img_tag.get("src") else "No image source")
+                else:
+                    sub_content.append(clean_text(sibling.text))
+            if sibling.name == 'blockquote':
+                sub_content.append([em.text for em in sibling.find_all("em")])
+        content.append({
+            "sub_title": h2_tag.find("strong").text if h2_tag.find("strong") else "",
+            "sub_content": "\n".join(flatten_and_join(sub_content)),
+        })
+    return {
+        "urls": url,
+        "keyword": kw,
+        "title": clean_text(soup.find("h1").text),
+        "introduction": clean_text(introduction_tag.text if introduction_tag else "No introduction found"),
+        "content": content,
+        "metadata": {
+            "time_published": time,
+            "date_published": date,
+            "type": type_of_qa,
+            "author": clean_text(author.text) if author else "",
+        },
+    }
+
+
+def synthetic_article(sections: int) -> bytes:
+    body = "".join(
+        f"<h2><strong>Mục {index}</strong></h2>"
+        f"<p>Đoạn thứ nhất của mục {index}.</p><p>Đoạn thứ hai của mục {index}.</p>"
+        f"<blockquote><em>Điều {index} Bộ luật Lao động 2019</em></blockquote><a href='#'>Xem thêm</a>"
+        for index in range(sections)
+    )
+    return (
+        "<html><body><h1>Bài viết tổng hợp</h1><strong class='d-block mt-3 mb-3 sapo'>Giới thiệu</strong>"
+        f"<section class='news-content'>{body}</section><span class='text-end fw-bold'>Tác giả</span></body></html>"
+    ).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    parser.add_argument("--sections", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = [(os.path.basename(path), read(path)) for path in sorted(glob.glob(os.path.join(args.fixtures, "qa_article*.html")))]
+    pages += [(f"synthetic, {count} sections", synthetic_article(count)) for count in args.sections]
+
+    print(f"{'article':28} {'h2':>5} {'sibling walk':>13} {'single pass':>12}  speedup")
+    for name, page in pages:
+        soup = make_soup(page)
+        if parse_qa_article(soup, QA_URL, *QA_ARGS) != sibling_walk_article(soup, QA_URL, *QA_ARGS):
+            raise SystemExit(f"{name}: records differ")
+        old = best_of(lambda soup: sibling_walk_article(soup, QA_URL, *QA_ARGS), soup, args.repeat)
+        new = best_of(lambda soup: parse_qa_article(soup, QA_URL, *QA_ARGS), soup, args.repeat)
+        print(f"{name:28} {len(soup.find_all('h2')):5} {old * 1000:11.1f}ms {new * 1000:10.1f}ms  {old / new:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
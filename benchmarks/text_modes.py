@@ -0,0 +1,45 @@
+"""Time extract_raw_text_from_html (the full_text field) in every text mode.
+
+    python -m benchmarks.text_modes [--fixtures DIR] [--repeat N]
+"""
+import argparse
+import glob
+import os
+
+from src.extractor.document_extractor import (
+    TEXT_MODES,
+    extract_document_content,
+    extract_raw_text_from_html,
+    get_text_mode,
+    set_text_mode,
+)
+
+from .parity import FIXTURES_DIR, read
+from .parse_backends import best_of
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    original_mode = get_text_mode()
+    print(f"{'fixture':28} {'KB':>6} " + " ".join(f"{mode:>12}" for mode in TEXT_MODES) + "  speedup")
+    for path in sorted(glob.glob(os.path.join(args.fixtures, "document_page*.html"))):
+        html_text = extract_document_content(read(path))
+        timings = {}
+        for mode in TEXT_MODES:
+            try:
+                set_text_mode(mode)
+            except ValueError:
+                continue
+            timings[mode] = best_of(extract_raw_text_from_html, html_text, args.repeat)
+        cells = " ".join(f"{timings[m] * 1000:10.1f}ms" if m in timings else f"{'-':>12}" for m in TEXT_MODES)
+        speedup = timings["html2text"] / timings["dom"] if "dom" in timings else float("nan")
+        print(f"{os.path.basename(path):28} {len(html_text) / 1024:6.0f} {cells}  {speedup:6.1f}x")
+    set_text_mode(original_mode)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""URL parsing over a large synthetic sitemap: the old helpers, the compiled ones and the batch API.
+
+The URL list mimics sitemap parts: document URLs in several slugs, with a
+share listed twice, with a query or fragment, in upper case or with the default
+port, plus Q&A article URLs and malformed entries. Every step is timed as a
+Python loop over the old implementation, a loop over the new scalar function,
+and the vectorized batch function on the whole list; the results of the three
+are checked against each other (the old ones only where they did not raise).
+The "hot" rows repeat lookups over a small working set, as the frontier does
+for the URLs in flight, with and without the ID cache.
+
+    python -m benchmarks.url_utils [--urls 1000000]
+"""
+import argparse
+import random
+import re
+import time
+
+import pandas as pd
+
+from src.utils.url_utils import (
+    _document_id,
+    canonicalize_url,
+    canonicalize_urls,
+    document_ids,
+    get_id_from_url,
+    get_type_of_law,
+    types_of_law,
+    unique_urls,
+)
+
+
+def legacy_id(url):
+    """get_id_from_url before the compiled patterns."""
+    regex = re.search('(/[0-9]+/)|(-[0-9]+.aspx)', url)
+    id_index = list(regex.span())
+    result = url[id_index[0]:id_index[1]]
+    return re.sub(".aspx|/|-", "", result)
+
+
+def legacy_type(url):
+    text = url.split("/")[4]
+    return text.split("?")[0]
+
+
+def synthetic_urls(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    slugs = ["Vi-pham-hanh-chinh", "Lao-dong-Tien-luong", "Doanh-nghiep", "Bat-dong-san", "Thue-Phi-Le-Phi"]
+    urls = []
+    for index in range(count):
+        kind = rng.random()
+        doc_id = 100000 + rng.randrange(count)
+        slug = rng.choice(slugs)
+        url = f"https://thuvienphapluat.vn/van-ban/{slug}/Nghi-dinh-{doc_id % 200}-2020-ND-CP-{doc_id}.aspx"
+        if kind < 0.1:
+            url += "?tab=1"
+        elif kind < 0.15:
+            url = url.replace("https://thuvienphapluat.vn", "HTTPS://ThuVienPhapLuat.vn:443")
+        elif kind < 0.2:
+            url = f"https://thuvienphapluat.vn/phap-luat/ho-tro-phap-luat/cau-hoi-{doc_id}.html#top"
+        elif kind < 0.21:
+            url = rng.choice(["", "not a url", "https://", f"/van-ban/{slug}/{doc_id}.aspx"])
+        urls.append(url)
+    return urls
+
+
+def timed(label: str, func, count: int):
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    print(f"{label:34} {seconds:>8.3f} {count / seconds / 1e6:>10.2f}")
+    return result
+
+
+def as_list(series):
+    return [None if value is pd.NA else value for value in series.tolist()]
+
+
+def safe(func, url):
+    try:
+        return func(url)
+    except Exception:
+        return "error"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--urls", type=int, default=1000000)
+    args = parser.parse_args()
+
+    urls = synthetic_urls(args.urls)
+    count = len(urls)
+    print(f"{'step':34} {'s':>8} {'M urls/s':>10}")
+
+    old = timed("id: old loop", lambda: [safe(legacy_id, url) for url in urls], count)
+    new = timed("id: compiled loop", lambda: [get_id_from_url(url) for url in urls], count)
+    batch = as_list(timed("id: batch", lambda: document_ids(urls), count))
+    errors = sum(1 for value in old if value == "error")
+    mismatched = sum(1 for a, b in zip(old, new) if a != "error" and a != b)
+    if mismatched or new != batch:
+        raise SystemExit(f"document IDs differ: {mismatched} against the old helper, {sum(1 for a, b in zip(new, batch) if a != b)} against the batch")
+    print(f"  old helper raised on {errors} URLs, the new ones return None")
+    hot = [url for url in urls[:10000] if isinstance(url, str)] * (count // 10000)
+    timed("id: hot, uncached", lambda: [_document_id.__wrapped__(url) for url in hot], len(hot))
+    timed("id: hot, cached", lambda: [get_id_from_url(url) for url in hot], len(hot))
+
+    old = timed("type: old loop", lambda: [safe(legacy_type, url) for url in urls], count)
+    new = timed("type: compiled loop", lambda: [get_type_of_law(url) for url in urls], count)
+    batch = as_list(timed("type: batch", lambda: types_of_law(urls), count))
+    if any(a != "error" and a != b for a, b in zip(old, new)) or new != batch:
+        raise SystemExit("types of law differ")
+
+    new = timed("canonicalize: compiled loop", lambda: [canonicalize_url(url) for url in urls], count)
+    batch = timed("canonicalize: batch", lambda: canonicalize_urls(urls), count)
+    if new != as_list(batch):
+        raise SystemExit("canonical URLs differ")
+
+    def unique_loop():
+        seen, unique = set(), []
+        for url in urls:
+            canonical = canonicalize_url(url)
+            if canonical is None:
+                continue
+            key = get_id_from_url(canonical) or canonical
+            if key not in seen:
+                seen.add(key)
+                unique.append(canonical)
+        return unique
+
+    new = timed("canonicalize + dedupe: loop", unique_loop, count)
+    batch = timed("canonicalize + dedupe: batch", lambda: unique_urls(urls), count)
+    if new != batch.tolist():
+        raise SystemExit("unique URLs differ")
+    print(f"  {len(new)} unique of {count}; scalar and batch results match")
+
+
+if __name__ == "__main__":
+    main()
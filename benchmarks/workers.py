@@ -0,0 +1,141 @@
+"""Throughput of 1..N crawl workers sharing one frontier, against the local mock site.
+
+For every worker count a fresh frontier is seeded with the document URLs and
+that many worker processes run DocumentCrawler.crawl_frontier on it, each with
+its own lease, heartbeat and output shard (as `main.py --worker` does). The
+table shows documents/s and the speed-up over one worker, which should grow
+about linearly while neither the site nor --host-rate is the limit.
+
+With --kill-after one worker is SIGKILLed that many seconds into each run; its
+leased URLs must still be crawled by the others once --lease-seconds pass.
+With --host-rate the workers split that per-host budget, so the request rate
+the site sees must stay below it whatever the number of workers.
+
+    python -m benchmarks.workers [--workers 1 2 4] [--documents 600] [--latency 0.05]
+        [--host-rate 100] [--kill-after 2 --lease-seconds 3]
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from .mock_site import MockSite, SiteConfig
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Pages fetched per document: the document page and its LoadLuocDo attributes
+REQUESTS_PER_DOCUMENT = 2
+
+
+def run_worker(args) -> dict:
+    """Crawl leased URLs in this process until the frontier is drained."""
+    from src.crawler.document_crawler import DocumentCrawler
+    from src.utils.frontier import CrawlFrontier
+    from src.utils.output_sink import JsonlSink
+    from src.utils.rate_limiter import configure_rate_limit
+    from src.utils.url_utils import set_site_url
+    from src.utils.worker import WorkerHeartbeat
+
+    logging.disable(logging.INFO)
+    set_site_url(args.base_url)
+    configure_rate_limit(rate=args.rate, max_rate=args.rate, concurrency=args.threads, max_concurrency=args.threads)
+    frontier = CrawlFrontier(args.frontier, worker_id=args.run, lease_seconds=args.lease_seconds)
+    sink = JsonlSink(f"documents-{args.run}.jsonl")
+    crawler = DocumentCrawler(num_threads=args.threads, sink=sink, frontier=frontier, bounded_memory=True)
+    with WorkerHeartbeat(frontier, host_rate=args.host_rate):
+        crawler.crawl_frontier(batch_size=args.batch_size)
+    crawler.close()
+    sink.close()
+    frontier.close()
+    return {"worker": args.run, "items": crawler.status.success_count, "failed": crawler.status.failure_count}
+
+
+def run_workers(count: int, site: MockSite, args, workdir: str) -> dict:
+    from src.utils.frontier import DONE, FAILED, CrawlFrontier
+
+    frontier_path = os.path.join(workdir, "frontier.sqlite3")
+    seed = CrawlFrontier(frontier_path)
+    seed.add(site.document_urls(args.documents))
+    seed.close()
+
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    command = [
+        sys.executable, "-m", "benchmarks.workers", "--base-url", site.base_url, "--frontier", frontier_path,
+        "--threads", str(args.threads), "--rate", str(args.rate), "--batch-size", str(args.batch_size),
+        "--lease-seconds", str(args.lease_seconds),
+    ]
+    if args.host_rate:
+        command += ["--host-rate", str(args.host_rate)]
+    start = time.perf_counter()
+    workers = [
+        subprocess.Popen(command + ["--run", f"w{index}"], cwd=workdir, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        for index in range(count)
+    ]
+    killed = None
+    if args.kill_after and count > 1:
+        time.sleep(args.kill_after)
+        killed = workers[0]
+        killed.send_signal(signal.SIGKILL)
+    for worker in workers:
+        _, stderr = worker.communicate()
+        if worker.returncode and worker is not killed:
+            raise SystemExit(f"worker failed:\n{stderr}")
+    seconds = time.perf_counter() - start
+
+    frontier = CrawlFrontier(frontier_path)
+    counts = frontier.counts()
+    frontier.close()
+    records = 0
+    for path in glob.glob(os.path.join(workdir, "documents-w*.jsonl")):
+        with open(path, encoding="utf-8") as f:
+            records += sum(1 for _ in f)
+    return {"workers": count, "done": counts.get(DONE, 0), "failed": counts.get(FAILED, 0), "records": records, "seconds": seconds, "killed": killed is not None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--documents", type=int, default=600)
+    parser.add_argument("--threads", type=int, default=4, help="crawl threads per worker")
+    parser.add_argument("--batch-size", type=int, default=20, help="URLs leased per claim")
+    parser.add_argument("--latency", type=float, default=0.05, help="mock site response time, so a worker is latency-bound")
+    parser.add_argument("--rate", type=float, default=5000.0, help="per-host requests/second each worker's limiter starts with")
+    parser.add_argument("--host-rate", type=float, help="per-host requests/second shared by all workers")
+    parser.add_argument("--lease-seconds", type=float, default=30.0)
+    parser.add_argument("--kill-after", type=float, help="SIGKILL one worker this many seconds into each multi-worker run")
+    parser.add_argument("--run", help=argparse.SUPPRESS)
+    parser.add_argument("--frontier", help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_worker(args)))
+        return
+
+    config = SiteConfig(urls_per_part=(args.documents + 1) // 2, latency=args.latency, seed=0)
+    print(f"{'workers':>7} {'done':>6} {'failed':>6} {'records':>8} {'s':>7} {'docs/s':>8} {'req/s':>7} {'speed-up':>9}")
+    single = None
+    with MockSite(config) as site:
+        for count in args.workers:
+            # Frontier, shards and failure logs of the run stay in a temporary directory
+            with tempfile.TemporaryDirectory() as workdir:
+                result = run_workers(count, site, args, workdir)
+            rate = result["done"] / result["seconds"]
+            single = single or rate / count
+            print(
+                f"{count:>7} {result['done']:>6} {result['failed']:>6} {result['records']:>8} {result['seconds']:>7.2f} {rate:>8.1f} "
+                f"{rate * REQUESTS_PER_DOCUMENT:>7.1f} {rate / single:>8.2f}x" + ("  (one worker killed)" if result["killed"] else "")
+            )
+            # Every 20th mock document is login-gated and fails for good
+            missing = args.documents - result["done"] - result["failed"]
+            if missing:
+                print(f"{missing} documents were left in the frontier", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
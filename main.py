@@ -1,49 +1,197 @@
-from src.utils.url_utils import get_all_sitemaps_url
+from src.utils.url_utils import use_proxy_pool
 from src.crawler.document_crawler import DocumentCrawler
-from src.crawler.sitemap_crawler import get_all_document_url, load_record_to_list
+from src.crawler.sitemap_crawler import get_all_document_url, get_sitemap_parts, iter_record
+from src.utils.output_sink import JsonlSink
+from src.utils.frontier import CrawlFrontier, default_worker_id
+from src.utils.content_index import ContentIndex
+from src.utils.refresh_store import RefreshStore
+from src.utils.response_archive import ResponseArchive
+from src.utils.metrics import CrawlMetrics, add_metrics_arguments, start_metrics
+from src.utils.retry_queue import RetryQueue
+from src.utils.worker import WorkerHeartbeat
+from src.extractor.document_extractor import TEXT_MODES, DEFAULT_TEXT_MODE, set_text_mode
+from src.utils.html_parser import BACKENDS, DEFAULT_BACKEND, set_parser_backend
+import argparse
 import logging
-from typing import List
+from typing import List, Optional
 from itertools import zip_longest
 
 def grouper(iterable, n, fillvalue=None):
     args = [iter(iterable)] * n
     return zip_longest(*args, fillvalue=fillvalue)
 
-def split_urls_into_batches(urls: List[str], batch_size: int) -> List[List[str]]:
-    """Split URLs into batches of specified size."""
-    return [urls[i:i + batch_size] for i in range(0, len(urls), batch_size)]
-
 def main():
+    parser = argparse.ArgumentParser(description="Crawl legal documents from thuvienphapluat.vn")
+    parser.add_argument("--incremental", action="store_true", help="only re-check documents whose sitemap lastmod moved and emit changed records")
+    parser.add_argument("--proxy", action="store_true", help="route requests through the scored proxy pool from config/proxy_list.txt")
+    parser.add_argument("--parse-processes", type=int, default=0, help="parse pages on this many worker processes instead of the fetching threads")
+    parser.add_argument("--text-mode", choices=TEXT_MODES, default=DEFAULT_TEXT_MODE, help="how full_text is built; html2text reproduces the old output")
+    parser.add_argument("--parser", choices=BACKENDS, default=DEFAULT_BACKEND, help="HTML parser backend; lxml is faster but matches html.parser only on well-formed pages")
+    parser.add_argument("--archive", action="store_true", help="record every fetched page and LoadLuocDo response in data/archive")
+    parser.add_argument("--replay", action="store_true", help="re-extract every document archived in data/archive, without network")
+    parser.add_argument("--frontier", default="data/frontier.sqlite3", help="frontier database; workers on several nodes share one file on shared storage")
+    parser.add_argument("--all-sitemap-parts", action="store_true", help="load every sitemap part, even those whose lastmod did not change since they were last loaded")
+    parser.add_argument("--seed-only", action="store_true", help="only queue the sitemap's document URLs in the frontier, for --worker processes")
+    parser.add_argument("--worker", action="store_true", help="crawl URLs leased from the frontier alongside other workers, without reading the sitemap")
+    parser.add_argument("--worker-id", default=None, help="name of this worker (default: host-pid); also names its output shards")
+    parser.add_argument("--lease-seconds", type=float, default=300.0, help="URLs of a worker silent for this long are handed to another worker")
+    parser.add_argument("--host-rate", type=float, help="requests per second to each host, for all workers together")
+    parser.add_argument("--host-concurrency", type=int, help="requests in flight to each host, for all workers together")
+    parser.add_argument("--network-fs", action="store_true", help="the frontier is on NFS or similar: use a rollback journal instead of WAL")
+    parser.add_argument("--no-dedup", action="store_true", help="store every document in full, even when its text duplicates an earlier one")
+    parser.add_argument("--near-duplicate-bits", type=int, default=3, choices=range(4), help="SimHash bits two texts may differ in and still be annotated as near duplicates (0: exact only); only exact duplicates lose their text")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    if args.incremental and args.parse_processes:
+        parser.error("--parse-processes cannot be combined with --incremental")
+    if args.worker and (args.seed_only or args.replay):
+        parser.error("--worker cannot be combined with --seed-only or --replay")
+
     logging.basicConfig(level=logging.INFO)
+    set_text_mode(args.text_mode)
+    set_parser_backend(args.parser)
+    archive = None
+    if args.archive or args.replay:
+        # Workers share data/archive, each appending to shards of its own
+        archive_name = f"archive-{args.worker_id or default_worker_id()}" if args.worker else "archive"
+        archive = ResponseArchive("data/archive", name=archive_name)
+    metrics, reporters = start_metrics(args)
+    try:
+        if args.replay:
+            replay(archive, args, metrics)
+        elif args.worker:
+            work(archive, args, metrics)
+        else:
+            crawl(archive, args, metrics)
+    finally:
+        for reporter in reporters:
+            reporter.close()
+
+def crawl(archive: Optional[ResponseArchive], args, metrics: Optional[CrawlMetrics]) -> None:
     logger = logging.getLogger(__name__)
+    if args.proxy:
+        use_proxy_pool()
+    journal_mode = "DELETE" if args.network_fs else "WAL"
+    refresh_store = RefreshStore(args.frontier, journal_mode=journal_mode) if args.incremental else None
+    frontier = CrawlFrontier(args.frontier, journal_mode=journal_mode)
     
-    # Get sitemap URLs
+    # Get sitemap URLs, with the lastmod of each part
     sitemap_url = 'https://thuvienphapluat.vn/sitemap.xml'
-    sitemap_urls = get_all_sitemaps_url(sitemap_url)
-    logger.info(f'Number of sitemap URLs: {len(sitemap_urls)}')
+    lastmods = dict(get_sitemap_parts(sitemap_url))
+    logger.info(f'Number of sitemap URLs: {len(lastmods)}')
     
-    # Get document URLs from first sitemap
-    get_all_document_url(sitemap_urls[:1])
+    # Get document URLs from every sitemap part that changed since a previous run loaded it
+    skipped = get_all_document_url(
+        list(lastmods), refresh_store=refresh_store, frontier=frontier, lastmods=lastmods, skip_unchanged=not args.all_sitemap_parts
+    )
+    logger.info(f'Skipped {skipped} unchanged sitemap parts')
     
-    # Load URLs
-    url_list = load_record_to_list("./data/raw/urls/urls.lines")
-    url_list = list(set(url_list))  # Remove duplicates
-    logger.info(f'Number of document URLs: {len(url_list)}')
+    # Queue URLs in the persistent frontier; already known document IDs are skipped
+    added = frontier.add(iter_record("./data/raw/urls/urls.lines"))
+    logger.info(f'Number of new document URLs: {added}, frontier state: {frontier.counts()}')
+    if refresh_store is not None:
+        requeued = frontier.requeue(refresh_store.iter_stale())
+        logger.info(f'Number of documents to re-check: {requeued}')
+    if args.seed_only:
+        frontier.close()
+        if refresh_store is not None:
+            refresh_store.close()
+        return
     
+    # Stream finished documents to rolling JSONL shards instead of rewriting one JSON file
+    sink = JsonlSink("data/processed/documents.jsonl", max_records=10000)
+
+    # Failed documents are classified, retried in the background and logged with their attempts
+    retries = RetryQueue("data/failures.jsonl")
+    run_crawler(frontier, sink, retries, refresh_store, archive, args, metrics)
+
+def work(archive: Optional[ResponseArchive], args, metrics: Optional[CrawlMetrics]) -> None:
+    """Crawl as one of several workers sharing the frontier filled by a --seed-only run.
+
+    URLs are leased in batches and the leases kept alive by a heartbeat; the
+    URLs of a worker that dies are picked up by the others once its lease runs
+    out. Each worker writes its own output shards and failure log.
+    """
+    logger = logging.getLogger(__name__)
+    if args.proxy:
+        use_proxy_pool()
+    worker_id = args.worker_id or default_worker_id()
+    journal_mode = "DELETE" if args.network_fs else "WAL"
+    refresh_store = RefreshStore(args.frontier, journal_mode=journal_mode) if args.incremental else None
+    frontier = CrawlFrontier(args.frontier, worker_id=worker_id, lease_seconds=args.lease_seconds, journal_mode=journal_mode)
+    logger.info(f'Worker {worker_id} joined, frontier state: {frontier.counts()}')
+
+    sink = JsonlSink(f"data/processed/documents-{worker_id}.jsonl", max_records=10000)
+    retries = RetryQueue(f"data/failures-{worker_id}.jsonl")
+    with WorkerHeartbeat(frontier, host_rate=args.host_rate, host_concurrency=args.host_concurrency):
+        run_crawler(frontier, sink, retries, refresh_store, archive, args, metrics)
+
+def run_crawler(
+    frontier: CrawlFrontier,
+    sink: JsonlSink,
+    retries: RetryQueue,
+    refresh_store: Optional[RefreshStore],
+    archive: Optional[ResponseArchive],
+    args,
+    metrics: Optional[CrawlMetrics],
+) -> None:
+    logger = logging.getLogger(__name__)
+    # Documents whose text was crawled before (alias slugs, mirrors) are stored as references to it
+    dedup = None
+    if not args.no_dedup:
+        dedup = ContentIndex(frontier.db_path, max_distance=args.near_duplicate_bits, journal_mode="DELETE" if args.network_fs else "WAL")
+
     # Initialize crawler with 4 threads
-    crawler = DocumentCrawler(num_threads=4)
-    
-    # Split URLs into batches (50 URLs per batch)
-    batch_size = 1
-    url_batches = split_urls_into_batches(url_list, batch_size)
-    total_batches = len(url_batches)
+    crawler = DocumentCrawler(
+        num_threads=4,
+        sink=sink,
+        frontier=frontier,
+        refresh_store=refresh_store,
+        use_processes=bool(args.parse_processes),
+        parse_workers=args.parse_processes or None,
+        archive=archive,
+        bounded_memory=True,
+        metrics=metrics,
+        retries=retries,
+        dedup=dedup,
+    )
     
-    # Process URL batches
-    for i, batch in enumerate(url_batches, 1):
-        logger.info(f'Processing batch {i}/{total_batches} ({len(batch)} URLs)')
-        crawler.crawl_batch(batch)
-        # Save after each batch
-        crawler.save_documents()
+    # Process only what is left in the frontier (50 URLs per batch)
+    crawler.crawl_frontier(batch_size=50)
+
+    crawler.close()
+    retries.close()
+    sink.close()
+    if dedup is not None:
+        logger.info(f'Indexed texts: {len(dedup)}')
+        dedup.close()
+    logger.info(f'Frontier state: {frontier.counts()}')
+    frontier.close()
+    if refresh_store is not None:
+        logger.info(f'Unchanged documents: {crawler.unchanged_count}')
+        refresh_store.close()
+    if archive is not None:
+        archive.close()
+
+def replay(archive: ResponseArchive, args, metrics: Optional[CrawlMetrics] = None) -> None:
+    """Rebuild data/processed/documents.jsonl from the archive with the current extractors."""
+    logger = logging.getLogger(__name__)
+    sink = JsonlSink("data/processed/documents.jsonl", max_records=10000)
+    crawler = DocumentCrawler(
+        num_threads=4,
+        sink=sink,
+        use_processes=bool(args.parse_processes),
+        parse_workers=args.parse_processes or None,
+        archive=archive,
+        bounded_memory=True,
+        metrics=metrics,
+    )
+    for batch in grouper(archive.iter_urls(contains="/van-ban/"), 1000):
+        crawler.replay_batch([url for url in batch if url is not None])
+    crawler.close()
+    sink.close()
+    logger.info(f'Replayed {sink.total_records} documents from {len(archive)} archived responses')
+    archive.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,31 @@
+from src.utils.parquet_export import KINDS, default_inputs, export_parquet
+import argparse
+import logging
+import time
+
+# Crawl output directory of each record kind
+INPUT_DIRS = {"documents": "data/processed", "qa": "data/qa"}
+
+def main():
+    parser = argparse.ArgumentParser(description="Export crawled documents or Q&A articles to partitioned Parquet")
+    parser.add_argument("kind", choices=sorted(KINDS), help="documents (partitioned by document_type/year) or qa (by type)")
+    parser.add_argument("inputs", nargs="*", help="JSONL files/shards or documents.json (default: every crawl output of that kind)")
+    parser.add_argument("--output", help="export directory (default: data/parquet/KIND)")
+    parser.add_argument("--batch-rows", type=int, default=1000, help="records converted per batch; bounds the memory used")
+    parser.add_argument("--compression", default="zstd", choices=("zstd", "snappy", "gzip", "none"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+    inputs = args.inputs or default_inputs(INPUT_DIRS[args.kind])
+    if not inputs:
+        parser.error(f"no crawl output found in {INPUT_DIRS[args.kind]}")
+    output = args.output or f"data/parquet/{args.kind}"
+
+    # Metadata and text columns go to output/meta and output/text, so either is read alone
+    start = time.perf_counter()
+    rows = export_parquet(inputs, output, kind=args.kind, batch_rows=args.batch_rows, compression=args.compression)
+    logger.info(f'Exported {rows} {args.kind} records from {len(inputs)} files to {output} in {time.perf_counter() - start:.1f}s')
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,13 @@
-from src.crawler.document_crawler import DocumentCrawler
 from src.crawler.qa_crawler import QACrawler
-from src.crawler.sitemap_crawler import get_all_document_url, load_record_to_list
-from src.extractor.qa_extractor import get_all_sub_qa_url, get_type_of_law, process_urls_multithreaded
-from src.utils.url_utils import load_url
+from src.utils.output_sink import JsonlSink
+from src.utils.frontier import CrawlFrontier, default_worker_id
+from src.utils.retry_queue import RetryQueue
+from src.utils.topic_walks import TopicWalks
+from src.utils.worker import WorkerHeartbeat
+from src.utils.metrics import add_metrics_arguments, set_metrics, start_metrics
+from src.utils.html_parser import BACKENDS, DEFAULT_BACKEND, set_parser_backend
+import argparse
 import logging
-from typing import List
-from itertools import zip_longest
-import os
-import pandas as pd
-import json
-import requests
-import os
 import time
 
 base_url = [ 
@@ -37,53 +34,103 @@ base_url = [
     "https://thuvienphapluat.vn/phap-luat/the-thao-y-te?page={}",
     "https://thuvienphapluat.vn/phap-luat/dich-vu-phap-ly?page={}",
     "https://thuvienphapluat.vn/phap-luat/tai-nguyen-moi-truong?page={}",
-    "https://thuvienphapluat.vn/phap-luat/cong-nghe-thong-tin?page={}",
     "https://thuvienphapluat.vn/phap-luat/giao-duc?page={}",
     "https://thuvienphapluat.vn/phap-luat/giao-thong-van-tai?page={}",
     "https://thuvienphapluat.vn/phap-luat/hanh-chinh?page={}",
     "https://thuvienphapluat.vn/phap-luat/linh-vuc-khac?page={}"
     ]
 
-def grouper(iterable, n, fillvalue=None):
-    args = [iter(iterable)] * n
-    return zip_longest(*args, fillvalue=fillvalue)
-
-def split_urls_into_batches(df: pd.DataFrame, batch_size: int) -> List[pd.DataFrame]:
-    """Split URLs into batches of specified size."""
-    return [df.iloc[i:i + batch_size] for i in range(0, len(df), batch_size)]
-
 def main():
+    parser = argparse.ArgumentParser(description="Crawl Q&A articles from thuvienphapluat.vn")
+    parser.add_argument("--pages", type=int, default=499, help="at most this many listing pages per topic")
+    parser.add_argument("--full", action="store_true", help="walk every topic to its last page, even past articles crawled before")
+    parser.add_argument("--threads", type=int, default=4, help="article crawl threads")
+    parser.add_argument("--listing-threads", type=int, default=8, help="listing page threads feeding them")
+    parser.add_argument("--engine", choices=("thread", "async"), default="thread")
+    parser.add_argument("--parser", choices=BACKENDS, default=DEFAULT_BACKEND, help="HTML parser backend; lxml is faster but matches html.parser only on well-formed pages")
+    parser.add_argument("--frontier", default="data/qa/frontier.sqlite3", help="frontier database shared by --seed-only and --worker runs")
+    parser.add_argument("--seed-only", action="store_true", help="only walk the topics and queue their articles in the frontier, for --worker processes")
+    parser.add_argument("--worker", action="store_true", help="crawl articles leased from the frontier alongside other workers")
+    parser.add_argument("--worker-id", default=None, help="name of this worker (default: host-pid); also names its output shards")
+    parser.add_argument("--lease-seconds", type=float, default=300.0, help="articles of a worker silent for this long are handed to another worker")
+    parser.add_argument("--host-rate", type=float, help="requests per second to each host, for all workers together")
+    parser.add_argument("--host-concurrency", type=int, help="requests in flight to each host, for all workers together")
+    parser.add_argument("--network-fs", action="store_true", help="the frontier is on NFS or similar: use a rollback journal instead of WAL")
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    if args.worker and args.seed_only:
+        parser.error("--worker cannot be combined with --seed-only")
+
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
+    set_parser_backend(args.parser)
+    # Installed before the listing stage so it is measured too
+    metrics, reporters = start_metrics(args)
+    set_metrics(metrics)
+    journal_mode = "DELETE" if args.network_fs else "WAL"
 
-    # Get URLs
-    num_page = 500
-    num_page_urls = [url.format(i) for url in base_url for i in range(1, num_page)]
-
-    if not os.path.exists('./data/data.csv'):
-        df = process_urls_multithreaded(num_page_urls=num_page_urls, max_workers=1024)
-        df = df.dropna()
-        df.to_csv('./data/data.csv', index=False)
+    if args.seed_only:
+        # Articles already in the frontier are not queued again, and each topic whose
+        # previous walk was complete stops where they begin
+        frontier = CrawlFrontier(args.frontier, journal_mode=journal_mode)
+        known_links = [] if args.full else list(frontier.iter_urls())
+        retries = RetryQueue("data/qa/failures-seed.jsonl")
+        topic_walks = TopicWalks(args.frontier, journal_mode=journal_mode)
+        crawler = QACrawler(frontier=frontier, metrics=metrics, retries=retries, topic_walks=topic_walks)
+        added = crawler.queue_topics(base_url, max_pages=args.pages, listing_threads=args.listing_threads, known_links=known_links)
+        topic_walks.close()
+        retries.close()
+        logger.info(f'Queued {added} new articles, frontier state: {frontier.counts()}')
+        frontier.close()
+    elif args.worker:
+        # Leased articles of a worker that dies go to the others; each worker has its own shards
+        worker_id = args.worker_id or default_worker_id()
+        frontier = CrawlFrontier(args.frontier, worker_id=worker_id, lease_seconds=args.lease_seconds, journal_mode=journal_mode)
+        sink = JsonlSink(f"data/qa/documents-{worker_id}.jsonl", max_records=10000)
+        retries = RetryQueue(f"data/qa/failures-{worker_id}.jsonl")
+        crawler = QACrawler(num_threads=args.threads, engine=args.engine, sink=sink, frontier=frontier, bounded_memory=True, metrics=metrics, retries=retries)
+        with WorkerHeartbeat(frontier, host_rate=args.host_rate, host_concurrency=args.host_concurrency):
+            crawler.crawl_frontier(batch_size=50)
+        retries.close()
+        sink.close()
+        logger.info(f'Worker {worker_id} wrote {sink.total_records} articles, frontier state: {frontier.counts()}')
+        frontier.close()
     else:
-        df = pd.read_csv('./data/data.csv').iloc[:2]
-    
-    logger.info(f'Number of sitemap URLs: {len(df)}')
-        
-    # Initialize crawler with 4 threads
-    crawler = QACrawler(num_threads=4)
-    
-    # Split URLs into batches (50 URLs per batch)
-    batch_size = 100
-    url_batches = split_urls_into_batches(df=df, batch_size=batch_size)
-    total_batches = len(url_batches)
-    logger.info(f'Total batches: {total_batches}')
+        crawl(args, logger, metrics)
+    for reporter in reporters:
+        reporter.close()
+
+def crawl(args, logger, metrics):
+    # Stream finished articles to rolling JSONL shards instead of rewriting one JSON file
+    sink = JsonlSink("data/qa/documents.jsonl", max_records=10000)
+    # Articles of earlier runs are skipped, and each topic stops where they begin once a
+    # walk of it has got to its last page (a killed run or failed listing pages walk it again)
+    known_links = [] if args.full else list(sink.read_field("urls"))
+    topic_walks = TopicWalks("data/qa/topics.sqlite3")
+
+    # Failed pages are classified, retried in the background and logged with their attempts
+    retries = RetryQueue("data/qa/failures.jsonl")
+    crawler = QACrawler(num_threads=args.threads, engine=args.engine, sink=sink, bounded_memory=True, metrics=metrics, retries=retries, topic_walks=topic_walks)
+
+    # Listing pages and articles a previous run left waiting for a retry
+    pending_listings = [entry["url"] for entry in retries.resume("listing")]
+    pending_articles = [entry["payload"] for entry in retries.resume("qa")]
+    if pending_listings:
+        crawler.crawl_listings(pending_listings, listing_threads=args.listing_threads)
+    if pending_articles:
+        crawler.crawl_batch(pending_articles)
+
+    # Each topic is paged up to the last page in its pager; articles are crawled
+    # as soon as their listing page is parsed, not after the whole listing
+    start = time.perf_counter()
+    crawler.crawl_topics(base_url, max_pages=args.pages, listing_threads=args.listing_threads, known_links=known_links)
+    crawler.save_documents()
+    logger.info(f'Crawled {len(crawler.seen)} articles in {time.perf_counter() - start:.0f}s')
 
-    # Process URL batches
-    for i, batch in enumerate(url_batches, 1):
-        logger.info(f'Processing batch {i}/{total_batches} ({len(batch)} URLs)')
-        crawler.crawl_batch(batch)
-        # Save after each batch
-        crawler.save_documents()
+    topic_walks.close()
+    retries.close()
+    logger.info(f'Retries: {retries.recovered} recovered, {retries.given_up} failed for good (see data/qa/failures.jsonl)')
+    sink.close()
 
 if __name__ == "__main__":
     main()
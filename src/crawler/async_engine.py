@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import Executor
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from ..utils.http_client import USER_AGENT, CONNECT_TIMEOUT, READ_TIMEOUT, MAX_RETRIES, get_proxy_pool, get_response_archive
+from ..utils.metrics import count, get_metrics, merge_stages, observe_stage, run_staged, sample_profile
+from ..utils.rate_limiter import THROTTLE_STATUS, backoff_delay, get_host_limiter, retry_after
+from ..utils.retry_queue import failure
+from .parse_pool import create_parse_executor
+
+_STOP = object()
+# How often a coroutine re-checks for a free per-host slot
+SLOT_POLL_INTERVAL = 0.05
+
+
+def _trace_timer(stage: str):
+    """aiohttp trace callbacks recording the time between two request events as `stage`."""
+    async def on_start(session, context, params):
+        setattr(context, stage, time.monotonic())
+
+    async def on_end(session, context, params):
+        started = getattr(context, stage, None)
+        if started is not None:
+            observe_stage(stage, time.monotonic() - started)
+
+    return on_start, on_end
+
+
+def create_trace_config():
+    """Report DNS, connect (TCP+TLS) and time to headers of every request as metric stages."""
+    trace_config = aiohttp.TraceConfig()
+    on_start, on_end = _trace_timer("dns")
+    trace_config.on_dns_resolvehost_start.append(on_start)
+    trace_config.on_dns_resolvehost_end.append(on_end)
+    on_start, on_end = _trace_timer("connect")
+    trace_config.on_connection_create_start.append(on_start)
+    trace_config.on_connection_create_end.append(on_end)
+    on_start, on_end = _trace_timer("ttfb")
+    trace_config.on_request_start.append(on_start)
+    trace_config.on_request_end.append(on_end)
+    return trace_config
+
+
+class AsyncCrawlEngine:
+    """Keep thousands of requests in flight on a single event loop.
+
+    Network I/O runs on the loop through one aiohttp session, while the CPU-bound
+    HTML parsing is pushed to a bounded thread or process pool so it never stalls
+    the loop. Handlers are coroutines `handler(engine, item)` that use `fetch` and
+    `parse` and return the record for `item` (or None).
+    """
+
+    def __init__(self, concurrency: int = 256, parse_workers: Optional[int] = None, use_processes: bool = False):
+        if aiohttp is None:
+            raise ImportError("The async engine requires aiohttp: pip install aiohttp")
+        self.concurrency = concurrency
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.use_processes = use_processes
+        self.logger = logging.getLogger(__name__)
+        self._session = None
+        self._executor: Optional[Executor] = None
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None, raise_errors: bool = False) -> Optional[bytes]:
+        """Return the body of `url`, or None on an HTTP error status (raised as
+        aiohttp.ClientResponseError with `raise_errors`).
+
+        Shares the per-host adaptive limiter of the blocking client: throttling
+        signals slow the host down and are retried with jittered backoff.
+        """
+        limiter = get_host_limiter(url)
+        pool = get_proxy_pool()
+        host = urlsplit(url).netloc
+        metrics = get_metrics()
+        for attempt in range(MAX_RETRIES + 1):
+            wait_start = time.monotonic()
+            while not limiter.try_enter():
+                await asyncio.sleep(SLOT_POLL_INTERVAL)
+            delay = None
+            proxy = pool.choose(host) if pool is not None else None
+            if metrics is not None:
+                metrics.add_gauge("in_flight", 1, stage="fetch")
+            try:
+                await asyncio.sleep(limiter.bucket.reserve())
+                start = time.monotonic()
+                observe_stage("throttle", start - wait_start)
+                async with self._session.get(url, headers=headers, proxy=proxy) as response:
+                    count("responses_total", status=response.status)
+                    if proxy:
+                        pool.report_success(proxy, time.monotonic() - start)
+                    if response.status in THROTTLE_STATUS:
+                        limiter.record_throttle()
+                        delay = retry_after(response.headers.get("Retry-After"))
+                        if attempt == MAX_RETRIES:
+                            count("errors_total", type="ClientResponseError")
+                            self.logger.warning(f"{response.status} Error: {response.reason} for url: {url}")
+                            if raise_errors:
+                                response.raise_for_status()
+                            return None
+                    elif response.status >= 400:
+                        count("errors_total", type="ClientResponseError")
+                        self.logger.warning(f"{response.status} Error: {response.reason} for url: {url}")
+                        if raise_errors:
+                            response.raise_for_status()
+                        return None
+                    else:
+                        download_start = time.monotonic()
+                        content = await response.read()
+                        observe_stage("download", time.monotonic() - download_start)
+                        observe_stage("request", time.monotonic() - start)
+                        count("response_bytes_total", len(content))
+                        limiter.record_success(time.monotonic() - start)
+                        archive = get_response_archive()
+                        if archive is not None and response.status == 200:
+                            await asyncio.get_running_loop().run_in_executor(
+                                None, archive.append, url, response.status, response.reason, dict(response.headers), content
+                            )
+                        return content
+            except aiohttp.ClientProxyConnectionError as e:
+                count("errors_total", type=type(e).__name__)
+                pool.report_failure(proxy)
+                if attempt == MAX_RETRIES:
+                    raise
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                count("errors_total", type=type(e).__name__)
+                if proxy:
+                    pool.report_failure(proxy)
+                limiter.record_throttle()
+                if attempt == MAX_RETRIES:
+                    raise
+            finally:
+                limiter.leave()
+                if metrics is not None:
+                    metrics.add_gauge("in_flight", -1, stage="fetch")
+            await asyncio.sleep(delay if delay is not None else backoff_delay(attempt))
+
+    async def parse(self, func: Callable[..., Any], *args) -> Any:
+        """Run an extraction function on the parse pool.
+
+        With metrics installed the worker's stage timings come back with the result
+        and the call may be profiled (labelled by its first string argument).
+        """
+        loop = asyncio.get_running_loop()
+        metrics = get_metrics()
+        if metrics is None:
+            return await loop.run_in_executor(self._executor, func, *args)
+        label = next((arg for arg in args if isinstance(arg, str)), func.__name__)
+        metrics.add_gauge("queue_depth", 1, queue="parse")
+        try:
+            result, stages = await loop.run_in_executor(self._executor, run_staged, func, sample_profile(label), *args)
+        finally:
+            metrics.add_gauge("queue_depth", -1, queue="parse")
+        merge_stages(stages)
+        return result
+
+    def run(
+        self,
+        items: Iterable[Any],
+        handler: Callable[["AsyncCrawlEngine", Any], Awaitable[Any]],
+        on_result: Callable[[Any, Any], None],
+    ) -> None:
+        """Crawl every item and report `on_result(item, result)` as results arrive."""
+        asyncio.run(self._run(items, handler, on_result))
+
+    async def _run(self, items, handler, on_result) -> None:
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT)
+        trace_configs = [create_trace_config()] if get_metrics() is not None else None
+        self._executor = create_parse_executor(self.parse_workers, self.use_processes)
+        try:
+            async with aiohttp.ClientSession(
+                connector=connector, timeout=timeout, headers={"User-Agent": USER_AGENT}, trace_configs=trace_configs
+            ) as session:
+                self._session = session
+                # Bounded queue so a huge URL list is never materialized as tasks up front
+                queue = asyncio.Queue(maxsize=self.concurrency * 2)
+                workers = [asyncio.create_task(self._worker(queue, handler, on_result)) for _ in range(self.concurrency)]
+                for item in items:
+                    await queue.put(item)
+                for _ in workers:
+                    await queue.put(_STOP)
+                await asyncio.gather(*workers)
+        finally:
+            self._session = None
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def _worker(self, queue: asyncio.Queue, handler, on_result) -> None:
+        metrics = get_metrics()
+        while True:
+            item = await queue.get()
+            if metrics is not None:
+                metrics.set_gauge("queue_depth", queue.qsize(), queue="fetch")
+            if item is _STOP:
+                return
+            try:
+                result = await handler(self, item)
+            except Exception as e:
+                count("errors_total", type=type(e).__name__)
+                self.logger.error(f"Error crawling {item}: {str(e)}")
+                result = failure(e)
+            on_result(item, result)
@@ -1,95 +1,401 @@
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
+import asyncio
 import pandas as pd
 import os
 import json
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from threading import Lock
 import logging
+import time
 
-from ..utils.url_utils import get_id_from_url, load_url
+from ..utils.url_utils import load_url, load_url_luocdo
+from ..utils.http_client import configure_session, set_response_archive
 from ..extractor.document_extractor import (
     get_document_attributes_from_ajax,
-    modify_document_attribute,
-    get_document_content,
-    extract_raw_text_from_html
+    get_luocdo_url,
+    build_document,
+    parse_luocdo_content,
+    extract_document_content,
+    extract_document,
 )
+from ..utils.output_sink import JsonlSink
+from ..utils.frontier import CrawlFrontier, frontier_key
+from ..utils.content_index import ContentIndex
+from ..utils.refresh_store import RefreshStore, content_hash, record_hash
+from ..utils.response_archive import ResponseArchive
+from ..utils.url_status import UrlStatus, peak_rss_mb
+from ..utils.metrics import CrawlMetrics, profiled, record_outcome, sample_profile, set_metrics, timed
+from ..utils.retry_queue import LOGIN, RETRY_LIMITS, Failure, RetryQueue, as_failure, failure
+from .async_engine import AsyncCrawlEngine
+from .parse_pool import ParsePool
+
+def clean_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Prepare a document for JSON serialization."""
+    cleaned_doc = doc.copy()
+    # Clean HTML text by replacing problematic characters
+    if 'html_text' in cleaned_doc:
+        cleaned_doc['html_text'] = cleaned_doc['html_text'].replace('\r\n', '\\n').replace('\n', '\\n')
+    return cleaned_doc
+
+# Returned by refresh_document for documents that did not change since the last check
+UNCHANGED = object()
 
 class DocumentCrawler:
-    def __init__(self, num_threads: int = 4):
+    def __init__(
+        self,
+        num_threads: int = 4,
+        engine: str = "thread",
+        concurrency: int = 256,
+        parse_workers: Optional[int] = None,
+        sink: Optional[JsonlSink] = None,
+        frontier: Optional[CrawlFrontier] = None,
+        early_abort: bool = True,
+        refresh_store: Optional[RefreshStore] = None,
+        use_processes: bool = False,
+        max_pending: Optional[int] = None,
+        archive: Optional[ResponseArchive] = None,
+        bounded_memory: bool = False,
+        metrics: Optional[CrawlMetrics] = None,
+        retries: Optional[RetryQueue] = None,
+        dedup: Optional[ContentIndex] = None,
+    ):
+        """`engine` is "thread" (blocking requests on `num_threads` threads) or "async"
+        (`concurrency` requests in flight on one event loop, parsing on `parse_workers`).
+
+        With `use_processes` parsing runs on `parse_workers` processes instead of the
+        fetching threads. The thread engine then becomes a two-stage pipeline: fetch
+        threads queue raw bodies, at most `max_pending` of them, for the extractors
+        (both bodies are always fetched, so `early_abort` does not apply there).
+
+        The LoadLuocDo attributes and the document page are fetched concurrently; with
+        `early_abort` a login-gated page fails without waiting for its attributes.
+        The thread engine has usually sent the attribute request by then, so only
+        the async engine actually aborts it.
+
+        With a `refresh_store` the crawl is incremental: pages are fetched with
+        conditional GETs, unchanged bodies are not parsed and unchanged records are
+        not emitted.
+
+        With an `archive` every fetched page and LoadLuocDo response is recorded in
+        it, and `replay_batch` re-runs the extractors on it without any network.
+
+        With `bounded_memory` (which needs a `sink`) nothing grows with the corpus:
+        records go straight to the sink and per-URL outcomes are kept as bits in
+        `self.status` instead of the successful/failed URL lists and files.
+
+        With `metrics` every stage (fetch, parse, text conversion, write) reports
+        latencies, counts and queue depths into it; see src.utils.metrics.
+
+        With `retries` failed documents are classified (see src.utils.retry_queue)
+        and the retryable ones re-crawled in the background with backoff; each
+        batch waits for its retries before it returns.
+
+        With `dedup` every full_text is indexed by document ID, content hash and
+        SimHash: a document with the same text as one crawled before is stored
+        as a reference to it instead of a copy, one with nearly the same text
+        is stored in full and annotated with it, and URLs whose document ID was
+        crawled already are not fetched again.
+        """
+        if bounded_memory and sink is None:
+            raise ValueError("bounded_memory requires a sink")
+        if refresh_store is not None and (engine != "thread" or use_processes):
+            raise ValueError("Incremental refresh is only supported by the thread engine without use_processes")
         self.documents = []
         self.num_threads = num_threads
+        self.engine = engine
+        self.concurrency = concurrency
+        self.parse_workers = parse_workers
+        # When set, finished records are streamed to the sink instead of kept in self.documents
+        self.sink = sink
+        # When set, per-URL state lives in the frontier instead of the *_urls.txt files
+        self.frontier = frontier
+        self.early_abort = early_abort
+        self.refresh_store = refresh_store
+        self.unchanged_count = 0
+        self.use_processes = use_processes
+        self.max_pending = max_pending
+        self.archive = archive
+        if archive is not None:
+            set_response_archive(archive)
+        # Side pool running the LoadLuocDo request next to each page fetch
+        self.attribute_executor = ThreadPoolExecutor(max_workers=num_threads)
         self.lock = Lock()
         self.successful_urls = []
         self.failed_urls = []
+        self.status = UrlStatus() if bounded_memory else None
+        self.metrics = metrics
+        if metrics is not None:
+            set_metrics(metrics)
+        self.retries = retries
+        self.dedup = dedup
+        # One keep-alive connection per worker thread and host, for both the page and LoadLuocDo requests
+        configure_session(pool_size=2 * num_threads)
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
 
     def crawl_document(self, url: str) -> Optional[Dict[str, Any]]:
         """Crawl a single document and extract its information."""
+        if self.refresh_store is not None:
+            return self.refresh_document(url)
+
+        attribute_future = self.attribute_executor.submit(get_document_attributes_from_ajax, url, raise_errors=True)
+        try:
+            with profiled(sample_profile(url)):
+                response = load_url(url, raise_errors=True)
+                with timed("extract"):
+                    extracted_html_text = extract_document_content(response.content)
+
+                if not extracted_html_text and self.early_abort:
+                    # Only skips the request while it waits for a side pool thread
+                    attribute_future.cancel()
+                    self.logger.warning(f"No content at {url}")
+                    return Failure(LOGIN, "no content")
+
+                doc_attribute = attribute_future.result()
+                with timed("extract"):
+                    return build_document(url, doc_attribute, extracted_html_text)
+
+        except Exception as e:
+            attribute_future.cancel()
+            self.logger.error(f"Error crawling document {url}: {str(e)}")
+            return failure(e)
+    
+    def refresh_document(self, url: str) -> Optional[Dict[str, Any]]:
+        """Re-check a document; returns UNCHANGED when neither the page nor its attributes changed.
+
+        Both the page and LoadLuocDo are fetched with conditional GETs. When
+        LoadLuocDo fails the check fails too, leaving the stored state as it was.
+        """
+        state = self.refresh_store.get(url) or {}
+        luocdo_url = get_luocdo_url(url)
+        luocdo_future = self.attribute_executor.submit(
+            load_url_luocdo, url, luocdo_url, headers=self.refresh_store.conditional_headers(state, luocdo=True), raise_errors=True
+        )
         try:
-            # Get document ID
-            doc_id = get_id_from_url(url)
-            
-            # Get document attributes
-            extracted_attributes = modify_document_attribute(
-                get_document_attributes_from_ajax(url)
+            response = load_url(url, headers=self.refresh_store.conditional_headers(state), raise_errors=True)
+            luocdo_response = luocdo_future.result()
+            luocdo_unchanged = luocdo_response.status_code == 304
+            luocdo_hash = state.get("luocdo_hash") if luocdo_unchanged else content_hash(luocdo_response.content)
+
+            if response.status_code == 304:
+                if luocdo_hash == state.get("luocdo_hash"):
+                    self.refresh_store.touch(url)
+                    return UNCHANGED
+                # Only the attributes moved: the page body is needed again
+                response = load_url(url, raise_errors=True)
+
+            page_hash = content_hash(response.content)
+            if page_hash == state.get("page_hash") and luocdo_hash == state.get("luocdo_hash"):
+                self.refresh_store.touch(url)
+                return UNCHANGED
+
+            if luocdo_unchanged:
+                # Only the page moved: the attributes body is needed to rebuild the record
+                luocdo_response = load_url_luocdo(url, luocdo_url, raise_errors=True)
+                luocdo_hash = content_hash(luocdo_response.content)
+
+            doc = build_document(url, parse_luocdo_content(url, luocdo_response.content), extract_document_content(response.content))
+            if not doc:
+                return doc
+
+            new_record_hash = record_hash(doc)
+            changed = new_record_hash != state.get("record_hash")
+            fields = dict(
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+                luocdo_etag=luocdo_response.headers.get("ETag"),
+                luocdo_last_modified=luocdo_response.headers.get("Last-Modified"),
+                page_hash=page_hash,
+                luocdo_hash=luocdo_hash,
+                record_hash=new_record_hash,
             )
-            
-            if not extracted_attributes:
-                self.logger.warning(f"No attributes found for {url}")
-                return None
-                
-            # Extract title
-            extracted_title = extracted_attributes["document_type"][0].strip() + " " + extracted_attributes["official_number"][0].strip()
-
-            # Get document content
-            doc_content = load_url(url, return_content=True)
-            extracted_html_text = get_document_content(doc_content)
-            
-            if not extracted_html_text:
-                self.logger.warning(f"No content at {url}")
-                return None
-                
-            extracted_full_text = extract_raw_text_from_html(extracted_html_text)
-            
-            
-            doc_object = {
-                "source_id" : doc_id,
-                "source" : "thuvienphapluat.vn",
-                "url": url,
-                "title" : extracted_title,
-                "html_text": extracted_html_text,
-                "full_text" : extracted_full_text,
-                "attribute": extracted_attributes,
-                
-            }
-            return doc_object
-            
+            if changed:
+                fields["changed_at"] = time.time()
+            self.refresh_store.update(url, **fields)
+            return doc if changed else UNCHANGED
+
         except Exception as e:
+            luocdo_future.cancel()
             self.logger.error(f"Error crawling document {url}: {str(e)}")
+            return failure(e)
+
+    def fetch_document(self, url: str) -> Optional[Tuple[str, Optional[bytes], bytes]]:
+        """Fetch stage of the process pipeline: the `extract_document` arguments for `url`."""
+        luocdo_future = self.attribute_executor.submit(load_url_luocdo, url, get_luocdo_url(url), raise_errors=True)
+        try:
+            response = load_url(url, raise_errors=True)
+        except Exception:
+            luocdo_future.cancel()
+            raise
+        # A failed LoadLuocDo fails the document like a failed page, so it is classified and retried
+        return url, luocdo_future.result().content, response.content
+
+    def load_archived_document(self, url: str) -> Optional[Tuple[str, Optional[bytes], bytes]]:
+        """Replay counterpart of `fetch_document`, reading both bodies from the archive."""
+        page_content = self.archive.get_content(url)
+        if page_content is None:
+            self.logger.warning(f"Not archived: {url}")
             return None
-    
-    def crawl_batch(self, urls: List[str]) -> None:
-        """Crawl a batch of URLs using multiple threads."""
-        with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
-            future_to_url = {executor.submit(self.crawl_document, url): url for url in urls}
-            for future in as_completed(future_to_url):
-                url = future_to_url[future]
-                try:
-                    doc = future.result()
-                    if doc:
-                        with self.lock:
-                            self.documents.append(doc)
-                            self.successful_urls.append(url)
-                            self.logger.info(f"Successfully crawled: {url}")
-                    else:
-                        with self.lock:
-                            self.failed_urls.append(url)
-                            self.logger.warning(f"Failed to crawl: {url}")
-                except Exception as e:
-                    with self.lock:
-                        self.failed_urls.append(url)
+        return url, self.archive.get_content(get_luocdo_url(url)), page_content
+
+    async def crawl_document_async(self, engine: AsyncCrawlEngine, url: str) -> Optional[Dict[str, Any]]:
+        """Async counterpart of `crawl_document` for the async engine."""
+        luocdo_task = asyncio.ensure_future(engine.fetch(get_luocdo_url(url), headers={"Referer": url}, raise_errors=True))
+        # Its error is only awaited when the page succeeds; mark it retrieved for the other paths
+        luocdo_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        try:
+            page_content = await engine.fetch(url, raise_errors=True)
+            extracted_html_text = await engine.parse(extract_document_content, page_content)
+
+            if not extracted_html_text and self.early_abort:
+                luocdo_task.cancel()
+                self.logger.warning(f"No content at {url}")
+                return Failure(LOGIN, "no content")
+
+            doc_attribute = await engine.parse(parse_luocdo_content, url, await luocdo_task)
+            return await engine.parse(build_document, url, doc_attribute, extracted_html_text)
+
+        except Exception as e:
+            luocdo_task.cancel()
+            self.logger.error(f"Error crawling document {url}: {str(e)}")
+            return failure(e)
+
+    def _record_result(self, url: str, doc: Optional[Dict[str, Any]]) -> None:
+        if doc is UNCHANGED:
+            record_outcome("document", "unchanged")
+            with self.lock:
+                self.unchanged_count += 1
+                self.logger.info(f"Unchanged: {url}")
+            if self.frontier is not None:
+                self.frontier.mark_done(url)
+            return
+        if self.retries is not None:
+            if doc:
+                self.retries.succeed(url, stage="document")
+            elif self.retries.fail(url, doc, lambda: self._record_result(url, self.crawl_document(url)), stage="document"):
+                # Counted once the retries are over
+                record_outcome("document", "retrying")
+                return
+        outcome = "ok" if doc else "failed"
+        if doc and self.dedup is not None:
+            doc = self._deduplicate(url, doc)
+            if "duplicate_of" in doc:
+                outcome = "duplicate" if "full_text" not in doc else "near_duplicate"
+        if doc and self.sink is not None:
+            with timed("write"):
+                self.sink.write(clean_document(doc))
+        record_outcome("document", outcome)
+        with self.lock:
+            if doc:
+                if self.sink is None:
+                    self.documents.append(doc)
+                if self.status is not None:
+                    self.status.mark(url, True)
+                else:
+                    self.successful_urls.append(url)
+                self.logger.info(f"Successfully crawled: {url}")
+            else:
+                if self.status is not None:
+                    self.status.mark(url, False)
+                else:
+                    self.failed_urls.append(url)
+                self.logger.warning(f"Failed to crawl: {url}")
+        if self.frontier is not None:
+            if doc:
+                self.frontier.mark_done(url)
+            else:
+                failed = as_failure(doc)
+                self.frontier.mark_failed(url, f"{failed.kind}: {failed.error}", retryable=failed.kind in RETRY_LIMITS)
+
+    def _deduplicate(self, url: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """The record to store for `doc`: a reference to the earlier document with the same text, or `doc` itself.
+
+        A near duplicate keeps its text, since it may be an amended version;
+        it is only annotated with the document it resembles.
+        """
+        with timed("dedup"):
+            duplicate = self.dedup.add(url, doc["full_text"])
+        self._recrawl_stale(url)
+        if duplicate is None:
+            return doc
+        if not duplicate.exact:
+            self.logger.info(f"Near duplicate of {duplicate.url} ({duplicate.similarity:.4f}): {url}")
+            return dict(doc, duplicate_of=duplicate.key, duplicate_url=duplicate.url, similarity=duplicate.similarity)
+        self.logger.info(f"Duplicate of {duplicate.url}: {url}")
+        return {
+            "source_id": doc["source_id"],
+            "source": doc["source"],
+            "url": doc["url"],
+            "title": doc["title"],
+            "attribute": doc["attribute"],
+            "duplicate_of": duplicate.key,
+            "duplicate_url": duplicate.url,
+            "similarity": duplicate.similarity,
+        }
+
+    def _recrawl_stale(self, url: str) -> None:
+        """Queue again the references whose original (`url`) has just changed text."""
+        stale = self.dedup.pop_stale()
+        if not stale:
+            return
+        if self.frontier is None:
+            self.logger.warning(f"{url} changed; {len(stale)} documents stored as references to it need a new crawl: {stale}")
+            return
+        if self.refresh_store is not None:
+            self.refresh_store.forget(stale)
+        self.frontier.requeue(stale)
+        self.logger.info(f"{url} changed; queued again {len(stale)} documents stored as references to it")
+
+    def _unseen(self, urls: List[str]) -> List[str]:
+        """Drop URLs whose document ID was crawled already (by any alias) or comes earlier in the batch."""
+        unseen, keys = [], set()
+        for url in urls:
+            key = frontier_key(url)
+            if key in keys or url in self.dedup:
+                if self.frontier is not None:
+                    self.frontier.mark_done(url)
+                continue
+            keys.add(key)
+            unseen.append(url)
+        if len(unseen) < len(urls):
+            self.logger.info(f"Skipped {len(urls) - len(unseen)} URLs of documents crawled already")
+        return unseen
+
+    def crawl_batch(self, urls: List[str], drain_retries: bool = True) -> None:
+        """Crawl a batch of URLs using multiple threads or the async engine.
+
+        Unless `drain_retries` is False, the batch waits for the retries of its failures.
+        """
+        if self.dedup is not None and self.refresh_store is None:
+            # A refresh re-checks documents on purpose
+            urls = self._unseen(urls)
+        if self.engine == "async":
+            engine = AsyncCrawlEngine(concurrency=self.concurrency, parse_workers=self.parse_workers, use_processes=self.use_processes)
+            engine.run(urls, self.crawl_document_async, self._record_result)
+        elif self.use_processes:
+            with ParsePool(workers=self.parse_workers, max_pending=self.max_pending) as parse_pool:
+                parse_pool.run(urls, self.fetch_document, extract_document, self._record_result, self.num_threads)
+        else:
+            with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
+                future_to_url = {executor.submit(self.crawl_document, url): url for url in urls}
+                for future in as_completed(future_to_url):
+                    url = future_to_url[future]
+                    try:
+                        self._record_result(url, future.result())
+                    except Exception as e:
                         self.logger.error(f"Error crawling {url}: {str(e)}")
+                        self._record_result(url, failure(e))
+        if self.retries is not None and drain_retries:
+            self.retries.drain()
+
+        if self.status is not None:
+            self.logger.info(
+                f"Crawled {self.status.success_count} documents, {self.status.failure_count} failed; "
+                f"peak RSS {peak_rss_mb():.0f} MB (parse workers {peak_rss_mb(children=True):.0f} MB)"
+            )
+            return
+        if self.frontier is not None:
+            return
 
         # Save URLs to files
         if self.successful_urls:
@@ -102,23 +408,52 @@ class DocumentCrawler:
                 f.write("\n".join(self.failed_urls))
             self.logger.info(f"Saved {len(self.failed_urls)} failed URLs to failed_urls.txt")
 
+    def replay_batch(self, urls: List[str]) -> None:
+        """Re-extract archived documents: no network, parsing on the parse pool."""
+        with ParsePool(workers=self.parse_workers, max_pending=self.max_pending, use_processes=self.use_processes) as parse_pool:
+            parse_pool.run(urls, self.load_archived_document, extract_document, self._record_result, self.num_threads)
+
+    def crawl_frontier(self, batch_size: int = 100) -> None:
+        """Pull URLs from the frontier until none are pending, saving after each batch.
+
+        Retries run alongside the following batches and are waited for at the end.
+        """
+        for batch in self.frontier.iter_batches(batch_size):
+            self.logger.info(f"Processing {len(batch)} URLs from the frontier")
+            self.crawl_batch([record["url"] for record in batch], drain_retries=False)
+            self.save_documents()
+        if self.retries is not None:
+            self.retries.drain()
+            self.save_documents()
+
     def save_documents(self, output_file: str = "data/processed/documents.json"):
-        """Save crawled documents to JSON file."""
+        """Save crawled documents to JSON file, or flush the sink when streaming."""
+        if self.sink is not None:
+            self.sink.flush()
+            self.logger.info(f"Flushed {self.sink.total_records} documents to {self.sink.output_file}")
+            return
+
         with self.lock:
             if not self.documents:
                 self.logger.warning("No documents to save")
                 return
                 
-            # Clean and prepare documents for JSON serialization
-            cleaned_documents = []
-            for doc in self.documents:
-                cleaned_doc = doc.copy()
-                # Clean HTML text by replacing problematic characters
-                if 'html_text' in cleaned_doc:
-                    cleaned_doc['html_text'] = cleaned_doc['html_text'].replace('\r\n', '\\n').replace('\n', '\\n')
-                cleaned_documents.append(cleaned_doc)
-                
+            # Same output as json.dump(list, indent=2), but only one cleaned copy alive at a time
             os.makedirs(os.path.dirname(output_file), exist_ok=True)
             with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(cleaned_documents, f, ensure_ascii=False, indent=2)
-            self.logger.info(f"Saved {len(cleaned_documents)} documents to {output_file}")
+                f.write("[")
+                for index, doc in enumerate(self.documents):
+                    f.write(",\n  " if index else "\n  ")
+                    f.write(json.dumps(clean_document(doc), ensure_ascii=False, indent=2).replace("\n", "\n  "))
+                f.write("\n]")
+            self.logger.info(f"Saved {len(self.documents)} documents to {output_file}")
+
+    def close(self) -> None:
+        """Shut down the LoadLuocDo side pool; the crawler can't be used afterwards."""
+        self.attribute_executor.shutdown(wait=True)
+
+    def __enter__(self) -> "DocumentCrawler":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
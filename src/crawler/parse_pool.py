@@ -0,0 +1,147 @@
+import logging
+import os
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from threading import BoundedSemaphore, Condition
+from typing import Any, Callable, Iterable, Optional
+
+from ..extractor.document_extractor import get_text_mode, set_text_mode
+from ..utils.html_parser import get_parser_backend, set_parser_backend
+from ..utils.metrics import count, get_metrics, merge_stages, run_staged, sample_profile
+from ..utils.retry_queue import failure
+from ..utils.url_utils import get_site_url, set_site_url
+
+
+def _init_parse_worker(backend: str, text_mode: str, site_url: str) -> None:
+    set_parser_backend(backend)
+    set_text_mode(text_mode)
+    set_site_url(site_url)
+
+
+def create_parse_executor(workers: int, use_processes: bool = True) -> Executor:
+    """Pool for the extract_* functions; worker processes inherit the parser backend, text mode and site URL."""
+    if use_processes:
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_parse_worker,
+            initargs=(get_parser_backend(), get_text_mode(), get_site_url()),
+        )
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+class ParsePool:
+    """Extraction stage of the two-stage crawl pipeline.
+
+    Fetch threads hand raw response bodies to `submit`, which blocks once
+    `max_pending` bodies are waiting for (or being run through) an extractor, so
+    pages are never downloaded faster than they can be parsed. Extraction runs in
+    worker processes and therefore off the GIL of the fetch threads.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None, use_processes: bool = True):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 2 * self.workers
+        self.executor = create_parse_executor(self.workers, use_processes)
+        self.slots = BoundedSemaphore(self.max_pending)
+        self.pending = 0
+        self.idle = Condition()
+        self.logger = logging.getLogger(__name__)
+
+    def submit(self, func: Callable[..., Any], *args, on_result: Optional[Callable[[Any], None]] = None) -> Future:
+        """Queue `func(*args)`, blocking while the queue is full.
+
+        `on_result` receives the return value, or the (falsy) Failure if the extractor raised.
+        With metrics installed the worker's stage timings are merged as each job
+        completes, and the job may be profiled (labelled by its first string argument).
+        """
+        self.slots.acquire()
+        metrics = get_metrics()
+        with self.idle:
+            self.pending += 1
+            if metrics is not None:
+                metrics.set_gauge("queue_depth", self.pending, queue="parse")
+        try:
+            if metrics is None:
+                future = self.executor.submit(func, *args)
+            else:
+                label = next((arg for arg in args if isinstance(arg, str)), func.__name__)
+                future = self.executor.submit(run_staged, func, sample_profile(label), *args)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(lambda done: self._done(done, on_result, metrics is not None))
+        return future
+
+    def _done(self, future: Future, on_result: Optional[Callable[[Any], None]], staged: bool = False) -> None:
+        try:
+            try:
+                result = future.result()
+            except Exception as e:
+                count("errors_total", type=type(e).__name__)
+                self.logger.error(f"Error extracting: {str(e)}")
+                result = failure(e)
+            else:
+                if staged:
+                    result, stages = result
+                    merge_stages(stages)
+            if on_result is not None:
+                on_result(result)
+        except Exception as e:
+            self.logger.error(f"Error handling extraction result: {str(e)}")
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        self.slots.release()
+        metrics = get_metrics()
+        with self.idle:
+            self.pending -= 1
+            if metrics is not None:
+                metrics.set_gauge("queue_depth", self.pending, queue="parse")
+            if not self.pending:
+                self.idle.notify_all()
+
+    def wait(self) -> None:
+        """Block until every submitted job has been extracted and reported."""
+        with self.idle:
+            self.idle.wait_for(lambda: not self.pending)
+
+    def run(
+        self,
+        items: Iterable[Any],
+        fetch: Callable[[Any], Optional[tuple]],
+        extract: Callable[..., Any],
+        on_result: Callable[[Any, Any], None],
+        num_threads: int,
+    ) -> None:
+        """Fetch every item on `num_threads` threads and extract on the pool.
+
+        `fetch(item)` returns the argument tuple for `extract`, or None when there
+        is nothing to parse; `on_result(item, result)` is called once per item,
+        with a Failure when `fetch` raised.
+        """
+        def stage(item):
+            try:
+                args = fetch(item)
+            except Exception as e:
+                self.logger.error(f"Error fetching {item}: {str(e)}")
+                on_result(item, failure(e))
+                return
+            if args is None:
+                on_result(item, None)
+                return
+            self.submit(extract, *args, on_result=lambda result: on_result(item, result))
+
+        with ThreadPoolExecutor(max_workers=num_threads) as fetchers:
+            for future in [fetchers.submit(stage, item) for item in items]:
+                future.result()
+        self.wait()
+
+    def shutdown(self) -> None:
+        self.wait()
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self) -> "ParsePool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
@@ -1,13 +1,32 @@
-from typing import Dict, Any, Optional, List
+from typing import Callable, Dict, Any, Iterable, Optional, List, Tuple, Union
 import pandas as pd
 import os
 import json
+import asyncio
+import queue
+from contextlib import contextmanager
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from threading import Lock
+from threading import Lock, Thread
 import logging
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, Tag
 
 from ..utils.url_utils import get_id_from_url, load_url
+from ..utils.http_client import configure_session, set_response_archive
+from ..utils.html_parser import make_soup, get_parser_backend
+try:
+    from ..extractor import lxml_extractor
+except ImportError:
+    lxml_extractor = None
+from ..utils.output_sink import JsonlSink
+from ..utils.frontier import CrawlFrontier
+from ..utils.response_archive import ResponseArchive
+from ..utils.url_status import UrlStatus, numeric_id, peak_rss_mb
+from ..utils.metrics import CrawlMetrics, profiled, record_outcome, sample_profile, set_metrics, timed
+from ..utils.retry_queue import RETRY_LIMITS, Failure, RetryQueue, as_failure, failure
+from ..utils.topic_walks import TopicWalks
+from .async_engine import AsyncCrawlEngine
+from .parse_pool import ParsePool
+from ..extractor.qa_extractor import extract_listing_page, extract_sub_qa_records, get_listing_page, get_sub_qa_records
 from ..extractor.document_extractor import (
     get_document_attributes_from_ajax,
     modify_document_attribute,
@@ -15,117 +34,295 @@ from ..extractor.document_extractor import (
     extract_raw_text_from_html
 )
 
+# Tells an article worker of `crawl_listings` that the listing pages are exhausted
+_STOP = object()
+# Listing pages in a row that may fail to load before a topic walk gives up
+MAX_LISTING_FAILURES = 3
+
 def clean_text(text):
     return text.strip() if text else ""
 
 def remove_link_tag(links):
     return [link for link in links if link]
 
+def flatten_and_join(content):
+    """Flatten nested lists of section items into a list of strings."""
+    flattened = []
+    for item in content:
+        if isinstance(item, list):
+            flattened.extend(flatten_and_join(item))  # Recursively flatten lists
+        else:
+            flattened.append(str(item))  # Ensure the item is a string
+    return flattened
+
+def split_sections(soup) -> List[Tuple[Tag, List[Tag]]]:
+    """Pair every <h2> with the sibling tags that follow it up to the next <h2>.
+
+    Same sections as calling find_next_siblings() per heading and stopping at the
+    next h2, but the children of each heading's parent are walked once, so the
+    cost is linear in the article size instead of quadratic in its sections.
+    """
+    headings = soup.find_all("h2")
+    sections = {id(h2_tag): [] for h2_tag in headings}
+    walked_parents = set()
+    for h2_tag in headings:
+        parent = h2_tag.parent
+        if id(parent) in walked_parents:
+            continue
+        walked_parents.add(id(parent))
+        current = None
+        for child in parent.children:
+            if not isinstance(child, Tag):
+                continue
+            if child.name == 'h2':
+                current = sections[id(child)]
+            elif current is not None:
+                current.append(child)
+    return [(h2_tag, sections[id(h2_tag)]) for h2_tag in headings]
+
+def parse_qa_article(soup, url: str, kw: List[str], time: str, date: str, type_of_qa: str) -> Dict[str, Any]:
+    """Build the Q&A record from a parsed article page."""
+    title = clean_text(soup.find("h1").text)
+    
+    # Check if the introduction exists
+    introduction_tag = soup.find("strong", {"class": "d-block mt-3 mb-3 sapo"})
+    introduction = clean_text(introduction_tag.text if introduction_tag else "No introduction found")
+
+    author = soup.find("span", {"class": "text-end fw-bold"})
+
+    metadata = {
+        "time_published": time,
+        "date_published": date, 
+        "type": type_of_qa,
+        "author": clean_text(author.text) if author else "",
+    }
+    
+    content = []
+    for h2_tag, siblings in split_sections(soup):
+        sub_content = []
+        for sibling in siblings:
+            if sibling.name == 'p':
+                if sibling.find("img"):
+                    img_tag = sibling.find("img")
+                    img_src = img_tag.get("src") if img_tag and img_tag.get("src") else "No image source"
+                    sub_content.append(img_src)
+                else:
+                    sub_content.append(clean_text(sibling.text))
+            if sibling.name == 'blockquote':
+                from_law = []
+                ems = sibling.find_all("em")
+                for em in ems:
+                    from_law.append(em.text)
+                sub_content.append(from_law)
+            if sibling.name == 'a':
+                continue
+
+        content.append({
+            "sub_title": h2_tag.find("strong").text if h2_tag.find("strong") else "",
+            "sub_content": "\n".join(flatten_and_join(sub_content)),
+        })
+        
+
+    article_data = {
+        "urls": url,
+        "keyword": kw,
+        "title": title,
+        "introduction": introduction,
+        "content": content,
+        "metadata": metadata,
+    }
+
+    return article_data
+
+def extract_qa(url: str, page_content: Optional[bytes], kw: List[str], time: str, date: str, type_of_qa: str) -> Optional[Dict[str, Any]]:
+    """Build the Q&A record from the raw article response body.
+
+    Module level so it can be shipped to a worker pool by the async engine.
+    """
+    if page_content is None:
+        return None
+    if get_parser_backend() == "lxml":
+        return lxml_extractor.parse_qa_article(page_content, url, kw, time, date, type_of_qa)
+    return parse_qa_article(make_soup(page_content), url, kw, time, date, type_of_qa)
+
 class QACrawler:
-    def __init__(self, num_threads: int = 4):
+    def __init__(
+        self,
+        num_threads: int = 4,
+        engine: str = "thread",
+        concurrency: int = 256,
+        parse_workers: Optional[int] = None,
+        sink: Optional[JsonlSink] = None,
+        frontier: Optional[CrawlFrontier] = None,
+        use_processes: bool = False,
+        max_pending: Optional[int] = None,
+        archive: Optional[ResponseArchive] = None,
+        bounded_memory: bool = False,
+        metrics: Optional[CrawlMetrics] = None,
+        retries: Optional[RetryQueue] = None,
+        topic_walks: Optional[TopicWalks] = None,
+    ):
+        """`engine` is "thread" (blocking requests on `num_threads` threads) or "async"
+        (`concurrency` requests in flight on one event loop, parsing on `parse_workers`).
+
+        With `use_processes` parsing runs on `parse_workers` processes; the thread
+        engine then queues at most `max_pending` raw pages for them.
+
+        With an `archive` every fetched article is recorded in it, and
+        `replay_batch` re-runs the extractor on it without any network.
+
+        With `bounded_memory` (which needs a `sink`) per-URL outcomes are kept as
+        bits in `self.status` instead of the successful/failed URL lists and files.
+
+        With `metrics` every stage reports latencies, counts and queue depths into it.
+
+        With `retries` failed articles and listing pages are classified and the
+        retryable ones re-crawled in the background with backoff; every crawl
+        call waits for its retries before it returns.
+
+        With `topic_walks` a topic walk may stop at the articles of earlier runs,
+        once the previous walk of that topic got to its end; without it every
+        topic is walked to its last page.
+        """
+        if bounded_memory and sink is None:
+            raise ValueError("bounded_memory requires a sink")
         self.documents = []
         self.num_threads = num_threads
+        self.engine = engine
+        self.concurrency = concurrency
+        self.parse_workers = parse_workers
+        # When set, finished records are streamed to the sink instead of kept in self.documents
+        self.sink = sink
+        # When set, per-URL state lives in the frontier instead of the *_qa_urls.txt files
+        self.frontier = frontier
+        self.use_processes = use_processes
+        self.max_pending = max_pending
+        self.archive = archive
+        if archive is not None:
+            set_response_archive(archive)
         self.lock = Lock()
         self.successful_urls = []
         self.failed_urls = []
+        self.status = UrlStatus() if bounded_memory else None
+        # Article keys already queued by `crawl_listings`, and its listing pages that failed
+        self.seen = set()
+        self.failed_listings = []
+        # Article keys crawled by earlier runs, see `crawl_topics`
+        self.known = set()
+        self.metrics = metrics
+        if metrics is not None:
+            set_metrics(metrics)
+        self.retries = retries
+        self.topic_walks = topic_walks
+        # One keep-alive connection per worker thread and host
+        configure_session(pool_size=num_threads)
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
 
-    def crawl_qa(self, url: str, kw: List[str], time: str, date: str, type_of_qa: str) -> Optional[Dict[str, Any]]:
+    def crawl_qa(self, url: str, kw: List[str], time: str, date: str, type_of_qa: str) -> Union[Dict[str, Any], Failure]:
         try:
-            soup = load_url(url, return_content=True)
-            title = clean_text(soup.find("h1").text)
-            
-            # Check if the introduction exists
-            introduction_tag = soup.find("strong", {"class": "d-block mt-3 mb-3 sapo"})
-            introduction = clean_text(introduction_tag.text if introduction_tag else "No introduction found")
-
-            title_content = soup.find_all("h2")
-            author = soup.find("span", {"class": "text-end fw-bold"})
-
-            metadata = {
-                "time_published": time,
-                "date_published": date, 
-                "type": type_of_qa,
-                "author": clean_text(author.text) if author else "",
-            }
-            
-            content = []
-            for index, h2_tag in enumerate(title_content):
-                siblings = h2_tag.find_next_siblings()
-
-                sub_content = []
-                for sibling in siblings:
-                    if sibling.name == 'h2':
-                        break
-                    if sibling.name == 'p':
-                        if sibling.find("img"):
-                            img_tag = sibling.find("img")
-                            img_src = img_tag.get("src") if img_tag and img_tag.get("src") else "No image source"
-                            sub_content.append(img_src)
-                        else:
-                            sub_content.append(clean_text(sibling.text))
-                    if sibling.name == 'blockquote':
-                        from_law = []
-                        ems = sibling.find_all("em")
-                        for em in ems:
-                            from_law.append(em.text)
-                        sub_content.append(from_law)
-                    if sibling.name == 'a':
-                        continue
-
-                # Flatten the sub_content and join all items into strings
-                def flatten_and_join(content):
-                    flattened = []
-                    for item in content:
-                        if isinstance(item, list):
-                            flattened.extend(flatten_and_join(item))  # Recursively flatten lists
-                        else:
-                            flattened.append(str(item))  # Ensure the item is a string
-                    return flattened
-                
-                content.append({
-                    "sub_title": h2_tag.find("strong").text if h2_tag.find("strong") else "",
-                    "sub_content": "\n".join(flatten_and_join(sub_content)),
-                })
-                
+            with profiled(sample_profile(url)):
+                response = load_url(url, raise_errors=True)
+                with timed("extract"):
+                    return extract_qa(url, response.content, kw, time, date, type_of_qa)
 
-            article_data = {
-                "urls": url,
-                "keyword": kw,
-                "title": title,
-                "introduction": introduction,
-                "content": content,
-                "metadata": metadata,
-            }
-
-            return article_data
-            
         except Exception as e:
             self.logger.error(f"Error crawling document {url}: {str(e)}")
+            return failure(e)
+
+    def fetch_qa(self, data: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+        """Fetch stage of the process pipeline: the `extract_qa` arguments for a listing row."""
+        response = load_url(data['link'], raise_errors=True)
+        return data['link'], response.content, data['keyword'], data['date'], data['time'], data['type']
+
+    def load_archived_qa(self, data: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+        """Replay counterpart of `fetch_qa`, reading the article from the archive."""
+        page_content = self.archive.get_content(data['link'])
+        if page_content is None:
+            self.logger.warning(f"Not archived: {data['link']}")
             return None
+        return data['link'], page_content, data['keyword'], data['date'], data['time'], data['type']
 
-    def crawl_batch(self, df: List[pd.DataFrame]) -> None:
-        """Crawl a batch of URLs using multiple threads."""
-        with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
-            future_to_url = {executor.submit(self.crawl_qa, data['link'], data['keyword'], data['date'], data['time'], data['type']): data for data in df.iloc}
-            for future in as_completed(future_to_url):
-                # url = future_to_url[future]
-                try:
-                    item = future.result()
-                    if item:
-                        with self.lock:
-                            self.documents.append(item)
-                            self.successful_urls.append(item['urls'])
-                            self.logger.info(f"Successfully crawled: {item['urls']}")
-                    else:
-                        with self.lock:
-                            self.failed_urls.append(item['urls'])
-                            self.logger.warning(f"Failed to crawl: {item['urls']}")
-                except Exception as e:
-                    with self.lock:
-                        self.failed_urls.append(item['urls'])
-                        self.logger.error(f"Error crawling {item['urls']}: {str(e)}")
+    async def crawl_qa_async(self, engine: AsyncCrawlEngine, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Async counterpart of `crawl_qa` for the async engine."""
+        try:
+            page_content = await engine.fetch(data['link'], raise_errors=True)
+            return await engine.parse(extract_qa, data['link'], page_content, data['keyword'], data['date'], data['time'], data['type'])
+
+        except Exception as e:
+            self.logger.error(f"Error crawling document {data['link']}: {str(e)}")
+            return failure(e)
+
+    def _crawl_record(self, data: Dict[str, Any]) -> None:
+        self._record_result(data, self.crawl_qa(data['link'], data['keyword'], data['date'], data['time'], data['type']))
+
+    def _record_result(self, data: Dict[str, Any], item: Optional[Dict[str, Any]]) -> None:
+        if self.retries is not None:
+            if item:
+                self.retries.succeed(data['link'], stage="qa")
+            elif self.retries.fail(data['link'], item, lambda: self._crawl_record(data), stage="qa", payload=data):
+                # Counted once the retries are over
+                record_outcome("qa", "retrying")
+                return
+        if item and self.sink is not None:
+            with timed("write"):
+                self.sink.write(item)
+        record_outcome("qa", "ok" if item else "failed")
+        with self.lock:
+            if item:
+                if self.sink is None:
+                    self.documents.append(item)
+                if self.status is not None:
+                    self.status.mark(data['link'], True)
+                else:
+                    self.successful_urls.append(item['urls'])
+                self.logger.info(f"Successfully crawled: {item['urls']}")
+            else:
+                if self.status is not None:
+                    self.status.mark(data['link'], False)
+                else:
+                    self.failed_urls.append(data['link'])
+                self.logger.warning(f"Failed to crawl: {data['link']}")
+        if self.frontier is not None:
+            if item:
+                self.frontier.mark_done(data['link'])
+            else:
+                failed = as_failure(item)
+                self.frontier.mark_failed(data['link'], f"{failed.kind}: {failed.error}", retryable=failed.kind in RETRY_LIMITS)
+
+    def crawl_batch(self, df: Union[pd.DataFrame, List[Dict[str, Any]]], drain_retries: bool = True) -> None:
+        """Crawl a batch of listing rows (DataFrame or records) using multiple threads or the async engine.
+
+        Unless `drain_retries` is False, the batch waits for the retries of its failures.
+        """
+        records = df.to_dict("records") if isinstance(df, pd.DataFrame) else df
+        if self.engine == "async":
+            engine = AsyncCrawlEngine(concurrency=self.concurrency, parse_workers=self.parse_workers, use_processes=self.use_processes)
+            engine.run(records, self.crawl_qa_async, self._record_result)
+        elif self.use_processes:
+            with ParsePool(workers=self.parse_workers, max_pending=self.max_pending) as parse_pool:
+                parse_pool.run(records, self.fetch_qa, extract_qa, self._record_result, self.num_threads)
+        else:
+            with ThreadPoolExecutor(max_workers=self.num_threads) as executor:
+                future_to_url = {executor.submit(self.crawl_qa, data['link'], data['keyword'], data['date'], data['time'], data['type']): data for data in records}
+                for future in as_completed(future_to_url):
+                    data = future_to_url[future]
+                    try:
+                        self._record_result(data, future.result())
+                    except Exception as e:
+                        self.logger.error(f"Error crawling {data['link']}: {str(e)}")
+                        self._record_result(data, failure(e))
+        if drain_retries:
+            self._drain_retries()
+
+        if self.status is not None:
+            self.logger.info(
+                f"Crawled {self.status.success_count} articles, {self.status.failure_count} failed; "
+                f"peak RSS {peak_rss_mb():.0f} MB (parse workers {peak_rss_mb(children=True):.0f} MB)"
+            )
+            return
+        if self.frontier is not None:
+            return
 
         # Save URLs to files
         if self.successful_urls:
@@ -138,20 +335,365 @@ class QACrawler:
                 f.write("\n".join(self.failed_urls))
             self.logger.info(f"Saved {len(self.failed_urls)} failed URLs to failed_qa_urls.txt")
 
+    def _key(self, link: str) -> Union[int, str]:
+        return numeric_id(link) or link
+
+    def _claim(self, data: Dict[str, Any]) -> bool:
+        """True the first time a listing record's article is seen, so it is crawled once.
+
+        Articles in `self.known` (crawled by an earlier run) are never claimed.
+        """
+        if not data['link']:
+            return False
+        key = self._key(data['link'])
+        with self.lock:
+            if key in self.seen or key in self.known:
+                return False
+            self.seen.add(key)
+            return True
+
+    def _record_listing(self, url: str, result: Any, retry: Optional[Callable[[], None]] = None) -> bool:
+        """Count a listing page; True if it loaded. A failed one is handed to the retry queue with `retry`."""
+        if result is not None and not isinstance(result, Failure):
+            record_outcome("listing", "ok")
+            if self.retries is not None:
+                self.retries.succeed(url, stage="listing")
+            return True
+        if self.retries is not None and retry is not None and self.retries.fail(url, result, retry, stage="listing"):
+            record_outcome("listing", "retrying")
+            return False
+        record_outcome("listing", "failed")
+        with self.lock:
+            self.failed_listings.append(url)
+        self.logger.warning(f"Failed to load listing page: {url}")
+        return False
+
+    def _reached_known(self, url: str, records: List[Dict[str, Any]]) -> bool:
+        """True when a listing page holds an article crawled by an earlier run.
+
+        Listings are newest first, so the pages after it were walked by that run
+        if its walk of the topic was complete (see `_begin_walk`).
+        """
+        if any(data['link'] and self._key(data['link']) in self.known for data in records):
+            self.logger.info(f"Reached already crawled articles at {url}")
+            return True
+        return False
+
+    def load_listing(self, url: str) -> Union[List[Dict[str, Any]], Failure]:
+        """The listing records of one listing page, or the Failure if it could not be loaded."""
+        try:
+            return get_sub_qa_records(url)
+        except Exception as e:
+            self.logger.error(f"Error loading listing page {url}: {str(e)}")
+            return failure(e)
+
+    def load_listing_page(self, url: str) -> Union[Tuple[List[Dict[str, Any]], Optional[int]], Failure]:
+        """Like `load_listing`, also returning the last page number in the pager."""
+        try:
+            return get_listing_page(url)
+        except Exception as e:
+            self.logger.error(f"Error loading listing page {url}: {str(e)}")
+            return failure(e)
+
+    def _retry_listing(self, url: str, enqueue: Callable[[Dict[str, Any]], None]) -> None:
+        """Retry of a listing page that failed: load it again and pass its records to `enqueue`."""
+        records = self.load_listing(url)
+        if self._record_listing(url, records, lambda: self._retry_listing(url, enqueue)):
+            for data in records:
+                enqueue(data)
+
+    def _crawl_new(self, data: Dict[str, Any]) -> None:
+        """Crawl a listing record's article right away unless it was seen before (retries of the async engine)."""
+        if self._claim(data):
+            self._crawl_record(data)
+
+    async def crawl_listing_async(self, engine: AsyncCrawlEngine, url: str) -> None:
+        """Async engine handler of `crawl_listings`: load one listing page and crawl its new articles."""
+        try:
+            content = await engine.fetch(url, raise_errors=True)
+            records = await engine.parse(extract_sub_qa_records, content, url)
+        except Exception as e:
+            self.logger.error(f"Error loading listing page {url}: {str(e)}")
+            self._record_listing(url, failure(e), lambda: self._retry_listing(url, self._crawl_new))
+            return
+        self._record_listing(url, records)
+        await self._crawl_new_async(engine, records)
+
+    async def _crawl_new_async(self, engine: AsyncCrawlEngine, records: List[Dict[str, Any]]) -> None:
+        async def crawl(data):
+            self._record_result(data, await self.crawl_qa_async(engine, data))
+
+        await asyncio.gather(*(crawl(data) for data in records if self._claim(data)))
+
+    @contextmanager
+    def _article_queue(self):
+        """Run the article workers on a bounded queue; yields the function that queues a listing record.
+
+        New articles are crawled on `num_threads` threads (fetch and extract, or
+        fetch and hand off to the parse pool with `use_processes`).
+        """
+        pending = queue.Queue(maxsize=self.max_pending or 4 * self.num_threads)
+        parse_pool = ParsePool(workers=self.parse_workers, max_pending=self.max_pending) if self.use_processes else None
+
+        def crawl_articles():
+            while True:
+                data = pending.get()
+                if data is _STOP:
+                    return
+                try:
+                    if parse_pool is None:
+                        self._crawl_record(data)
+                    else:
+                        parse_pool.submit(extract_qa, *self.fetch_qa(data), on_result=lambda item, data=data: self._record_result(data, item))
+                except Exception as e:
+                    self.logger.error(f"Error crawling {data['link']}: {str(e)}")
+                    self._record_result(data, failure(e))
+
+        def enqueue(data):
+            if self._claim(data):
+                pending.put(data)
+
+        workers = [Thread(target=crawl_articles, daemon=True) for _ in range(self.num_threads)]
+        for worker in workers:
+            worker.start()
+        try:
+            yield enqueue
+        finally:
+            for _ in workers:
+                pending.put(_STOP)
+            for worker in workers:
+                worker.join()
+            if parse_pool is not None:
+                parse_pool.shutdown()
+
+    def crawl_listings(self, listing_urls: Iterable[str], listing_threads: int = 8) -> None:
+        """Crawl the articles of a stream of listing pages as the pages come in.
+
+        `listing_threads` threads load listing pages and put every new article
+        (deduplicated by ID across pages and calls) on a bounded queue that the
+        `num_threads` article workers drain, so the first articles are crawled
+        while the listing is still running and no page becomes a DataFrame. The
+        async engine instead crawls each page's articles as soon as it is parsed.
+        """
+        if self.engine == "async":
+            engine = AsyncCrawlEngine(concurrency=self.concurrency, parse_workers=self.parse_workers, use_processes=self.use_processes)
+            engine.run(listing_urls, self.crawl_listing_async, lambda url, result: None)
+            self._finish_listings()
+            return
+
+        listing_urls = list(listing_urls)
+        configure_session(pool_size=self.num_threads + listing_threads)
+        with self._article_queue() as enqueue, ThreadPoolExecutor(max_workers=listing_threads) as listing:
+            for url, records in zip(listing_urls, listing.map(self.load_listing, listing_urls)):
+                if self._record_listing(url, records, lambda url=url: self._retry_listing(url, enqueue)):
+                    for data in records:
+                        enqueue(data)
+            # Listing retries feed the article queue, so they finish before it closes
+            self._drain_retries()
+        self._finish_listings()
+
+    def _begin_walk(self, topic_url: str) -> bool:
+        """Start a walk of `topic_url`; True if it may stop at the articles of earlier runs."""
+        return self.topic_walks is not None and self.topic_walks.begin(topic_url)
+
+    def _end_walk(self, topic_url: str, page: int, complete: bool) -> None:
+        if self.topic_walks is not None and complete:
+            self.topic_walks.finish(topic_url, page)
+
+    def walk_topic(self, topic_url: str, max_pages: int, enqueue: Callable[[Dict[str, Any]], None]) -> None:
+        """Queue the articles of one topic page by page.
+
+        `topic_url` has a `{}` for the page number. The walk ends at the last page
+        the pager links to (at most `max_pages`), at the first page without
+        articles, after MAX_LISTING_FAILURES pages in a row fail to load (those
+        are retried in the background with a retry queue), or at the first page
+        with an article crawled by an earlier run when the previous walk of the
+        topic was complete. Only a walk that loaded every page up to the end of
+        the topic is recorded as complete.
+        """
+        stop_at_known = self._begin_walk(topic_url)
+        page, last_page, failures = 1, max_pages, 0
+        complete, capped = True, True
+        while page <= last_page:
+            url = topic_url.format(page)
+            listing = self.load_listing_page(url)
+            if not self._record_listing(url, listing, lambda url=url: self._retry_listing(url, enqueue)):
+                complete = False
+                failures += 1
+                if failures >= MAX_LISTING_FAILURES:
+                    break
+                page += 1
+                continue
+            failures = 0
+            records, pager_last = listing
+            if pager_last:
+                last_page = min(max(pager_last, page), max_pages)
+                capped = pager_last > max_pages
+            if not records:
+                capped = False
+                break
+            for data in records:
+                enqueue(data)
+            if stop_at_known and self._reached_known(url, records):
+                capped = False
+                break
+            page += 1
+        self._end_walk(topic_url, min(page, last_page), complete and not capped)
+
+    async def crawl_topic_async(self, engine: AsyncCrawlEngine, topic_url: str, max_pages: int) -> None:
+        """Async counterpart of `walk_topic`; each page's articles are crawled while the next page loads."""
+        stop_at_known = self._begin_walk(topic_url)
+        page, last_page, failures = 1, max_pages, 0
+        complete, capped = True, True
+        articles = None
+        try:
+            while page <= last_page:
+                url = topic_url.format(page)
+                try:
+                    content = await engine.fetch(url, raise_errors=True)
+                    records, pager_last = await engine.parse(extract_listing_page, content, url)
+                except Exception as e:
+                    self.logger.error(f"Error loading listing page {url}: {str(e)}")
+                    self._record_listing(url, failure(e), lambda url=url: self._retry_listing(url, self._crawl_new))
+                    complete = False
+                    failures += 1
+                    if failures >= MAX_LISTING_FAILURES:
+                        break
+                    page += 1
+                    continue
+                self._record_listing(url, records)
+                failures = 0
+                if pager_last:
+                    last_page = min(max(pager_last, page), max_pages)
+                    capped = pager_last > max_pages
+                if not records:
+                    capped = False
+                    break
+                if articles is not None:
+                    await articles
+                articles = asyncio.ensure_future(self._crawl_new_async(engine, records))
+                if stop_at_known and self._reached_known(url, records):
+                    capped = False
+                    break
+                page += 1
+        finally:
+            if articles is not None:
+                await articles
+        self._end_walk(topic_url, min(page, last_page), complete and not capped)
+
+    def crawl_topics(
+        self,
+        topic_urls: Iterable[str],
+        max_pages: int = 499,
+        listing_threads: int = 8,
+        known_links: Iterable[str] = (),
+    ) -> None:
+        """Crawl Q&A topics, discovering how many listing pages each one has.
+
+        Each topic (a listing URL with `{}` for the page number) is walked in page
+        order by `walk_topic`, topics in parallel on `listing_threads` threads (or
+        on the async engine), and new articles stream into the article workers as
+        in `crawl_listings`. `known_links` are the articles of earlier runs: they
+        are not crawled again, and with `topic_walks` a topic whose previous walk
+        was complete stops where they begin.
+        """
+        self.known.update(self._key(link) for link in known_links if link)
+        topic_urls = list(dict.fromkeys(topic_urls))
+        if self.engine == "async":
+            engine = AsyncCrawlEngine(concurrency=self.concurrency, parse_workers=self.parse_workers, use_processes=self.use_processes)
+            engine.run(topic_urls, lambda engine, topic_url: self.crawl_topic_async(engine, topic_url, max_pages), lambda topic_url, result: None)
+            self._finish_listings()
+            return
+
+        configure_session(pool_size=self.num_threads + listing_threads)
+        with self._article_queue() as enqueue, ThreadPoolExecutor(max_workers=listing_threads) as listing:
+            for future in [listing.submit(self.walk_topic, topic_url, max_pages, enqueue) for topic_url in topic_urls]:
+                future.result()
+            self._drain_retries()
+        self._finish_listings()
+
+    def queue_topics(
+        self,
+        topic_urls: Iterable[str],
+        max_pages: int = 499,
+        listing_threads: int = 8,
+        known_links: Iterable[str] = (),
+    ) -> int:
+        """Walk Q&A topics like `crawl_topics`, adding their articles to the frontier instead of crawling them.
+
+        This seeds a frontier that `crawl_frontier` workers on other processes
+        or nodes then share. Returns how many articles were new to the frontier.
+        """
+        if self.frontier is None:
+            raise ValueError("queue_topics requires a frontier")
+        self.known.update(self._key(link) for link in known_links if link)
+        added = 0
+
+        def enqueue(data):
+            nonlocal added
+            if self._claim(data):
+                new = self.frontier.add_records([data])
+                with self.lock:
+                    added += new
+
+        configure_session(pool_size=listing_threads)
+        with ThreadPoolExecutor(max_workers=listing_threads) as listing:
+            for future in [listing.submit(self.walk_topic, topic_url, max_pages, enqueue) for topic_url in dict.fromkeys(topic_urls)]:
+                future.result()
+            self._drain_retries()
+        self._finish_listings()
+        return added
+
+    def _drain_retries(self) -> None:
+        if self.retries is not None:
+            self.retries.drain()
+
+    def _finish_listings(self) -> None:
+        self._drain_retries()
+        self.logger.info(f"Queued {len(self.seen)} articles; {len(self.failed_listings)} listing pages failed")
+        if self.status is not None:
+            self.logger.info(
+                f"Crawled {self.status.success_count} articles, {self.status.failure_count} failed; "
+                f"peak RSS {peak_rss_mb():.0f} MB (parse workers {peak_rss_mb(children=True):.0f} MB)"
+            )
+
+    def replay_batch(self, df: Union[pd.DataFrame, List[Dict[str, Any]]]) -> None:
+        """Re-extract archived articles of a batch of listing rows: no network, parsing on the parse pool."""
+        records = df.to_dict("records") if isinstance(df, pd.DataFrame) else df
+        with ParsePool(workers=self.parse_workers, max_pending=self.max_pending, use_processes=self.use_processes) as parse_pool:
+            parse_pool.run(records, self.load_archived_qa, extract_qa, self._record_result, self.num_threads)
+
+    def crawl_frontier(self, batch_size: int = 100) -> None:
+        """Pull listing records from the frontier until none are pending, saving after each batch.
+
+        Retries run alongside the following batches and are waited for at the end.
+        """
+        for batch in self.frontier.iter_batches(batch_size):
+            self.logger.info(f"Processing {len(batch)} URLs from the frontier")
+            self.crawl_batch(batch, drain_retries=False)
+            self.save_documents()
+        if self.retries is not None:
+            self._drain_retries()
+            self.save_documents()
+
     def save_documents(self, output_file: str = "data/qa/documents.json"):
-        """Save crawled documents to JSON file."""
+        """Save crawled documents to JSON file, or flush the sink when streaming."""
+        if self.sink is not None:
+            self.sink.flush()
+            self.logger.info(f"Flushed {self.sink.total_records} documents to {self.sink.output_file}")
+            return
+
         with self.lock:
             if not self.documents:
                 self.logger.warning("No documents to save")
                 return
                 
-            # Clean and prepare documents for JSON serialization
-            cleaned_documents = []
-            for doc in self.documents:
-                cleaned_doc = doc.copy()
-                cleaned_documents.append(cleaned_doc)
-                
+            # Same output as json.dump(list, indent=2), without copying every record first
             os.makedirs(os.path.dirname(output_file), exist_ok=True)
             with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(cleaned_documents, f, ensure_ascii=False, indent=2)
-            self.logger.info(f"Saved {len(cleaned_documents)} documents to {output_file}")
+                f.write("[")
+                for index, doc in enumerate(self.documents):
+                    f.write(",\n  " if index else "\n  ")
+                    f.write(json.dumps(doc, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+                f.write("\n]")
+            self.logger.info(f"Saved {len(self.documents)} documents to {output_file}")
@@ -1,9 +1,19 @@
 import fasteners
-from typing import List
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+from xml.etree import ElementTree
 from tqdm import tqdm
-from ..utils.url_utils import load_url
+from ..utils.http_client import fetch, configure_session
+from ..utils.frontier import CrawlFrontier
+from ..utils.refresh_store import RefreshStore
+from ..utils.url_utils import unique_urls
+
+SITEMAP_PART_NUMBER = re.compile(r"(\d+)")
+SITEMAP_ENTRY_TAGS = {"url", "sitemap"}
+SITEMAP_CHUNK_SIZE = 64 * 1024
 
 def write_to_record(object, file_output_path, by_line=False, is_append=False):
     try:
@@ -30,46 +40,144 @@ def write_to_record(object, file_output_path, by_line=False, is_append=False):
         print(f"Error writing to {file_output_path}: {str(e)}")
         raise
 
-def get_all_document_url_per_page(sitemap_url):
-    sitemap_soup = load_url(sitemap_url, return_content=True)
-    if sitemap_soup is None:
+def write_records(lines: Iterable[str], file_output_path: str, is_append: bool = True) -> int:
+    """Write many lines under a single lock acquisition and file open; returns the count."""
+    directory = os.path.dirname(os.path.abspath(file_output_path))
+    os.makedirs(directory, exist_ok=True)
+    lock_path = os.path.join(directory, f"{os.path.basename(file_output_path)}.lock")
+    count = 0
+    with fasteners.InterProcessLock(lock_path):
+        with open(file_output_path, "a" if is_append else "w", encoding='utf-8') as file:
+            for line in lines:
+                file.write(line + '\n')
+                count += 1
+    return count
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+def iter_sitemap_entries(chunks: Iterable[bytes]) -> Iterator[Tuple[str, Optional[str]]]:
+    """Incrementally parse sitemap XML, yielding (loc, lastmod) for every <url>.
+
+    Index sitemaps work too (their <sitemap> entries are yielded the same way).
+    Each entry is dropped from the tree once yielded, so memory stays flat.
+    """
+    parser = ElementTree.XMLPullParser(events=("start", "end"))
+    root = None
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if event == "start":
+                if root is None:
+                    root = element
+                continue
+            if _local_name(element.tag) not in SITEMAP_ENTRY_TAGS:
+                continue
+            loc = lastmod = None
+            for child in element:
+                name = _local_name(child.tag)
+                if name == "loc":
+                    loc = (child.text or "").strip()
+                elif name == "lastmod":
+                    lastmod = (child.text or "").strip() or None
+            if loc:
+                yield loc, lastmod
+            root.clear()
+    parser.close()
+
+def fetch_sitemap_part(sitemap_url: str, file_name: Optional[str] = None) -> List[Tuple[str, Optional[str]]]:
+    """Fetch a sitemap part once, streaming it to `file_name` (if given) while it is parsed."""
+    response = fetch(sitemap_url, stream=True)
+    try:
+        response.raise_for_status()
+        chunks = response.iter_content(chunk_size=SITEMAP_CHUNK_SIZE)
+        if file_name is None:
+            return list(iter_sitemap_entries(chunks))
+        with open(file_name, "wb") as raw_file:
+            def saved_chunks():
+                for chunk in chunks:
+                    raw_file.write(chunk)
+                    yield chunk
+            return list(iter_sitemap_entries(saved_chunks()))
+    finally:
+        response.close()
+
+def get_sitemap_parts(sitemap_url: str) -> List[Tuple[str, Optional[str]]]:
+    """(url, lastmod) of every part listed in the sitemap index."""
+    try:
+        return fetch_sitemap_part(sitemap_url)
+    except Exception as e:
+        print(e)
         return []
 
-    res = [url.text for url in sitemap_soup.find_all("loc")]
-    return res
+def get_all_document_url_per_page(sitemap_url, with_lastmod=False):
+    """URLs of a sitemap part, or (url, lastmod) pairs when `with_lastmod` is set."""
+    try:
+        entries = fetch_sitemap_part(sitemap_url)
+    except Exception as e:
+        print(e)
+        return []
+    if with_lastmod:
+        return entries
+    return [url for url, _ in entries]
 
 def get_all_document_url(
     sitemap_urls: List[str], 
     output_dir_url: str = "./data/raw/urls",
-    output_dir_sitemap: str = "./data/raw/sitemap"
-    ) -> None:
+    output_dir_sitemap: str = "./data/raw/sitemap",
+    refresh_store: Optional[RefreshStore] = None,
+    max_workers: int = 8,
+    frontier: Optional[CrawlFrontier] = None,
+    lastmods: Optional[Dict[str, Optional[str]]] = None,
+    skip_unchanged: bool = True,
+    ) -> int:
 
-    """Extract all document URLs from sitemaps and save them."""
+    """Extract all document URLs from sitemaps and save them.
+
+    Sitemap parts are fetched once each, `max_workers` at a time, saved as they
+    stream in, and their URLs canonicalized, deduplicated by document ID and
+    appended to urls.lines in one write per part.
+    With a `refresh_store`, the sitemap `<lastmod>` of every URL is recorded so an
+    incremental run only re-checks documents whose lastmod moved.
+    With a `frontier` and the parts' `lastmods` from the sitemap index, every
+    part loaded is recorded with its lastmod, and (with `skip_unchanged`) a
+    part whose lastmod is the one it had when it was last loaded is skipped.
+    Returns how many parts were skipped.
+    """
     os.makedirs(output_dir_url, exist_ok=True)
     os.makedirs(output_dir_sitemap, exist_ok=True)
 
     url_output_file = os.path.join(output_dir_url, "urls.lines")
-    
-    for sitemap_url in tqdm(sitemap_urls, total=len(sitemap_urls)):
-        try:
-            match = re.findall("(\d+)", sitemap_url)
+
+    future_to_url = {}
+    skipped = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        configure_session(pool_size=max_workers)
+        for sitemap_url in sitemap_urls:
+            match = SITEMAP_PART_NUMBER.search(urlsplit(sitemap_url).path)
             if not match:
                 continue
-                
-            file_name = os.path.join(output_dir_sitemap, f"sitemaps_part{match[0]}.xml")
-            soup = load_url(sitemap_url, return_content=True)
-            if soup:
-                write_to_record(soup.prettify(), file_name)
-                
-                document_urls = get_all_document_url_per_page(sitemap_url)
-
-                for document_url in document_urls:
-                    write_to_record(document_url, url_output_file, by_line=True, is_append=True)
-
+            if skip_unchanged and frontier is not None and lastmods is not None and frontier.part_unchanged(sitemap_url, lastmods.get(sitemap_url)):
+                skipped += 1
+                continue
+            file_name = os.path.join(output_dir_sitemap, f"sitemaps_part{match.group(1)}.xml")
+            future_to_url[executor.submit(fetch_sitemap_part, sitemap_url, file_name)] = sitemap_url
 
-        except Exception as e:
-            print(f"Error processing sitemap {sitemap_url}: {str(e)}")
-            continue
+        # Parts are recorded from this thread only, so the SQLite store has a single writer
+        for future in tqdm(as_completed(future_to_url), total=len(future_to_url)):
+            sitemap_url = future_to_url[future]
+            try:
+                url_lastmods = future.result()
+                if refresh_store is not None:
+                    refresh_store.record_sitemap_lastmod(url_lastmods)
+                # Canonical URLs, one per document ID (a part may list a document more than once)
+                write_records(unique_urls([document_url for document_url, _ in url_lastmods]), url_output_file)
+                if frontier is not None and lastmods is not None:
+                    frontier.record_part(sitemap_url, lastmods.get(sitemap_url))
+            except Exception as e:
+                print(f"Error processing sitemap {sitemap_url}: {str(e)}")
+                continue
+    return skipped
 
 def load_record_to_list(file_path: str) -> List[str]:
     """Load URLs from file into a list."""
@@ -78,4 +186,12 @@ def load_record_to_list(file_path: str) -> List[str]:
             return [line.strip() for line in f if line.strip()]
     except Exception as e:
         print(f"Error loading URLs from file: {str(e)}")
-        return []
\ No newline at end of file
+        return []
+
+def iter_record(file_path: str) -> Iterator[str]:
+    """Stream URLs from a record file without loading it into memory."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
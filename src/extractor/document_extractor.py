@@ -3,21 +3,59 @@ import requests
 import html2text
 from bs4 import BeautifulSoup
 import re
-from typing import Dict, Any, Optional
-from ..utils.url_utils import load_url_luocdo, get_id_from_url
+import logging
+from typing import Dict, Any, Optional, Union
+from ..utils.url_utils import load_url_luocdo, get_id_from_url, get_site_url
+from ..utils.html_parser import make_soup, get_parser_backend, DOCUMENT_CONTENT_STRAINER
+from ..utils.metrics import timed
+from ..utils.retry_queue import LOGIN, PARSE, Failure
+
+try:
+    from . import lxml_extractor
+    from .text_converter import html_to_text
+except ImportError:
+    lxml_extractor = None
+    html_to_text = None
+
+logger = logging.getLogger(__name__)
+
+# "dom" walks the content tree once (src.extractor.text_converter); "html2text"
+# reproduces the original full_text output, markdown and hyphen stripping included
+TEXT_MODES = ("dom", "html2text")
+DEFAULT_TEXT_MODE = "dom" if html_to_text is not None else "html2text"
+
+_text_mode = DEFAULT_TEXT_MODE
+
+MARKDOWN_MARKERS = re.compile(r'(\*|\||\_|\-)')
+BLANK_LINES = re.compile(r'\n\s*\n')
+SPACES = re.compile(' +')
+
+def set_text_mode(name: str) -> None:
+    """Select how `extract_raw_text_from_html` builds full_text ("dom" or "html2text")."""
+    global _text_mode
+    if name not in TEXT_MODES:
+        raise ValueError(f"Unknown text mode: {name}")
+    if name == "dom" and html_to_text is None:
+        raise ValueError("The dom text mode requires lxml: pip install lxml")
+    _text_mode = name
+
+def get_text_mode() -> str:
+    return _text_mode
 
 def keep_one_white_space(string):
-    return re.sub(' +', ' ', string)
+    return SPACES.sub(' ', string)
 
 def extract_raw_text_from_html(html_text: str) -> str:
     """Extract raw text from HTML content."""
     if html_text == "":
         return ""
-    else:
+    with timed("text"):
+        if _text_mode == "dom":
+            return html_to_text(html_text)
         text = html2text.html2text(html_text)
-        text = re.sub('(\*|\||\_|\-)', '', text)
+        text = MARKDOWN_MARKERS.sub('', text)
         text = text.replace("\\", "")
-        text = re.sub(r'\n\s*\n', '\n\n', text)
+        text = BLANK_LINES.sub('\n\n', text)
         return keep_one_white_space(text)
 
 def get_document_content(soup) -> str:
@@ -33,24 +71,39 @@ def get_document_content(soup) -> str:
     else:
         return ""
 
-def get_document_attributes_from_ajax(url: str) -> Dict[str, Any]:
-    """Get document attributes from AJAX endpoint."""
+def get_luocdo_url(url: str) -> str:
+    """Build the LoadLuocDo.aspx AJAX URL holding the attributes of a document."""
     doc_id = get_id_from_url(url)
-    url_luocdo = "https://thuvienphapluat.vn/AjaxLoadData/LoadLuocDo.aspx?LawID="+doc_id+"&IstraiNghiem=False"
-    try:
-        soup = load_url_luocdo(url, url_luocdo, return_content=True)
-        atts = {}
+    if doc_id is None:
+        raise ValueError(f"No document ID in {url}")
+    return get_site_url() + "/AjaxLoadData/LoadLuocDo.aspx?LawID="+doc_id+"&IstraiNghiem=False"
+
+def parse_document_attributes(soup) -> Dict[str, Any]:
+    """Parse the attribute table of a LoadLuocDo.aspx response."""
+    atts = {}
 
-        atts['Mô tả'] = soup.find("div", attrs={"class": "tt"}).text.strip() #None type has no "text"
-        for att_soup in soup.find_all("div", attrs={"class": "att"}):
-            att_name = att_soup.find("div", attrs={"class": "hd fl"}).text.strip().replace(":", "")
-            att_value = att_soup.find("div", attrs={"class": "ds fl"}).text.strip()
+    atts['Mô tả'] = soup.find("div", attrs={"class": "tt"}).text.strip() #None type has no "text"
+    for att_soup in soup.find_all("div", attrs={"class": "att"}):
+        att_name = att_soup.find("div", attrs={"class": "hd fl"}).text.strip().replace(":", "")
+        att_value = att_soup.find("div", attrs={"class": "ds fl"}).text.strip()
 
-            atts[att_name] = att_value
-        atts['Ghi chú'] = soup.find("div", attrs={"class": "tt", "style": "font-weight: normal"}).text.strip() if soup.find("div", attrs={"class": "tt", "style": "font-weight: normal"}) else ""
-        return atts
+        atts[att_name] = att_value
+    atts['Ghi chú'] = soup.find("div", attrs={"class": "tt", "style": "font-weight: normal"}).text.strip() if soup.find("div", attrs={"class": "tt", "style": "font-weight: normal"}) else ""
+    return atts
+
+def get_document_attributes_from_ajax(url: str, raise_errors: bool = False) -> Dict[str, Any]:
+    """Get document attributes from AJAX endpoint.
+
+    Failed requests give {}, or raise with `raise_errors` so the caller can classify them.
+    """
+    url_luocdo = get_luocdo_url(url)
+    try:
+        response = load_url_luocdo(url, url_luocdo, raise_errors=raise_errors)
+        return parse_luocdo_content(url, response.content)
 
     except Exception as e:
+        if raise_errors:
+            raise
         print("get_document_attributes_from_ajax error: " + str(e) + " at " + str(url))
         return {}
 
@@ -79,4 +132,61 @@ def modify_document_attribute(doc_attribute: Dict[str, Any]) -> Dict[str, Any]:
     # new_atts["document_department"] = []
     # new_atts["collection_source"] = []
 
-    return new_atts
\ No newline at end of file
+    return new_atts
+
+def build_document(url: str, doc_attribute: Dict[str, Any], extracted_html_text: str) -> Union[Dict[str, Any], Failure]:
+    """Build the document record from the raw attributes and the extracted content div.
+
+    Without attributes or content the (falsy) Failure says why.
+    """
+    # modify_document_attribute fills in every field, so check what LoadLuocDo gave
+    if not doc_attribute:
+        logger.warning(f"No attributes found for {url}")
+        return Failure(PARSE, "no attributes")
+    extracted_attributes = modify_document_attribute(doc_attribute)
+
+    # Extract title
+    extracted_title = extracted_attributes["document_type"][0].strip() + " " + extracted_attributes["official_number"][0].strip()
+
+    if not extracted_html_text:
+        logger.warning(f"No content at {url}")
+        return Failure(LOGIN, "no content")
+
+    extracted_full_text = extract_raw_text_from_html(extracted_html_text)
+
+    return {
+        "source_id" : get_id_from_url(url),
+        "source" : "thuvienphapluat.vn",
+        "url": url,
+        "title" : extracted_title,
+        "html_text": extracted_html_text,
+        "full_text" : extracted_full_text,
+        "attribute": extracted_attributes,
+    }
+
+def parse_luocdo_content(url: str, luocdo_content: Optional[bytes]) -> Dict[str, Any]:
+    """Parse the raw LoadLuocDo.aspx body, returning {} when it can't be read."""
+    if luocdo_content is None:
+        return {}
+    try:
+        if get_parser_backend() == "lxml":
+            return lxml_extractor.parse_document_attributes(luocdo_content)
+        return parse_document_attributes(make_soup(luocdo_content))
+    except Exception as e:
+        print("get_document_attributes_from_ajax error: " + str(e) + " at " + str(url))
+        return {}
+
+def extract_document_content(page_content: Optional[bytes]) -> str:
+    """Extract the content div from the raw document page body ("" if not viewable)."""
+    if page_content is None:
+        return ""
+    if get_parser_backend() == "lxml":
+        return lxml_extractor.get_document_content(page_content)
+    return get_document_content(make_soup(page_content, parse_only=DOCUMENT_CONTENT_STRAINER))
+
+def extract_document(url: str, luocdo_content: Optional[bytes], page_content: Optional[bytes]) -> Union[Dict[str, Any], Failure]:
+    """Build the document record from the raw LoadLuocDo and page response bodies.
+
+    The extract_* helpers are module level so they can be shipped to a worker pool.
+    """
+    return build_document(url, parse_luocdo_content(url, luocdo_content), extract_document_content(page_content))
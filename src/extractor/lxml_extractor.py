@@ -0,0 +1,179 @@
+"""lxml/XPath versions of the BeautifulSoup extractors.
+
+Each function takes the raw response body and returns exactly what its
+BeautifulSoup counterpart returns on a 'html.parser' tree; benchmarks/parity.py
+checks that over the saved fixtures. Class tests follow BeautifulSoup matching:
+a single class matches any class token, a multi-word value must equal the
+whole (whitespace-normalized) class attribute.
+"""
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+from lxml import etree
+
+from ..utils.html_parser import get_text, make_tree, to_soup_html
+from ..utils.url_utils import get_page_number, get_site_url, get_type_of_law
+
+
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+TAI_VAN_BAN = etree.XPath(f"//div[{_has_class('TaiVanBan')}]")
+CONTENT1 = etree.XPath(f"//div[{_has_class('content1')}]")
+LOGIN_LINK = etree.XPath(f".//a[@style='color:blue' and {_has_class('clsopentLogin')}]")
+
+ATT_DESCRIPTION = etree.XPath(f"//div[{_has_class('tt')}]")
+ATT_ROWS = etree.XPath(f"//div[{_has_class('att')}]")
+ATT_NAME = etree.XPath("descendant::div[normalize-space(@class)='hd fl'][1]")
+ATT_VALUE = etree.XPath("descendant::div[normalize-space(@class)='ds fl'][1]")
+ATT_NOTE = etree.XPath(f"//div[{_has_class('tt')} and @style='font-weight: normal']")
+
+ARTICLES = etree.XPath("//article")
+TITLE_LINK = etree.XPath(f"descendant::a[{_has_class('title-link')}][1]")
+KEYWORDS = etree.XPath(f"descendant::*[{_has_class('d-block')} and {_has_class('sub-item-head-keyword')}]")
+SUB_TIME = etree.XPath(f"descendant::span[{_has_class('sub-time')}][1]")
+PAGER_LINKS = etree.XPath(f"//ul[{_has_class('pagination')}]//a[{_has_class('page-link')}]/@href")
+
+H1 = etree.XPath("//h1")
+H2 = etree.XPath("//h2")
+INTRODUCTION = etree.XPath("//strong[normalize-space(@class)='d-block mt-3 mb-3 sapo']")
+AUTHOR = etree.XPath("//span[normalize-space(@class)='text-end fw-bold']")
+FIRST_IMG = etree.XPath("descendant::img[1]")
+FIRST_STRONG = etree.XPath("descendant::strong[1]")
+EMS = etree.XPath("descendant::em")
+
+
+def _clean_text(text):
+    return text.strip() if text else ""
+
+
+def _first(xpath, element):
+    found = xpath(element)
+    return found[0] if found else None
+
+
+def get_document_content(content: Union[bytes, str]) -> str:
+    tree = make_tree(content)
+    if TAI_VAN_BAN(tree):
+        return ""
+    # Loại trừ các văn bản không thể xem được
+    content_div = _first(CONTENT1, tree)
+    if LOGIN_LINK(content_div):
+        return ""
+    for element in content_div.iterdescendants():
+        if isinstance(element.tag, str) and "href" in element.attrib:
+            del element.attrib["href"]
+    return to_soup_html(content_div)
+
+
+def parse_document_attributes(content: Union[bytes, str]) -> Dict[str, Any]:
+    tree = make_tree(content)
+    atts = {}
+
+    atts['Mô tả'] = get_text(_first(ATT_DESCRIPTION, tree)).strip()
+    for att in ATT_ROWS(tree):
+        att_name = get_text(_first(ATT_NAME, att)).strip().replace(":", "")
+        att_value = get_text(_first(ATT_VALUE, att)).strip()
+
+        atts[att_name] = att_value
+    note = _first(ATT_NOTE, tree)
+    atts['Ghi chú'] = get_text(note).strip() if note is not None else ""
+    return atts
+
+
+def _sub_qa_records(tree, url: str) -> List[Dict[str, Any]]:
+    type_url = get_type_of_law(url)
+    site_url = get_site_url()
+    records = []
+
+    for article in ARTICLES(tree):
+        tag_a = _first(TITLE_LINK, article)
+        keyword_find = KEYWORDS(article)
+        sub_time_tag = _first(SUB_TIME, article)
+        if sub_time_tag is not None:
+            sub_time = get_text(sub_time_tag, strip=True).replace(" ", "").split("|")
+            time, date = sub_time[0], sub_time[1]
+        else:
+            time, date = None, None
+        records.append({
+            "link": site_url + tag_a.get("href") if tag_a is not None else None,
+            "keyword": [get_text(kw, strip=True) for kw in keyword_find] if keyword_find else [None],
+            "date": date,
+            "time": time,
+            "type": type_url,
+        })
+
+    return records
+
+
+def parse_sub_qa_records(content: Union[bytes, str], url: str) -> List[Dict[str, Any]]:
+    return _sub_qa_records(make_tree(content), url)
+
+
+def parse_listing_page(content: Union[bytes, str], url: str) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    tree = make_tree(content)
+    pages = [page for page in map(get_page_number, PAGER_LINKS(tree)) if page is not None]
+    return _sub_qa_records(tree, url), max(pages) if pages else None
+
+
+def parse_sub_qa_url(content: Union[bytes, str], url: str) -> pd.DataFrame:
+    return pd.DataFrame(parse_sub_qa_records(content, url), columns=['link', 'keyword', "date", "time", "type"])
+
+
+def _flatten_and_join(content: List[Any]) -> List[str]:
+    flattened = []
+    for item in content:
+        if isinstance(item, list):
+            flattened.extend(_flatten_and_join(item))
+        else:
+            flattened.append(str(item))
+    return flattened
+
+
+def parse_qa_article(content: Union[bytes, str], url: str, kw: List[str], time: str, date: str, type_of_qa: str) -> Dict[str, Any]:
+    tree = make_tree(content)
+    title = _clean_text(get_text(H1(tree)[0]))
+
+    introduction_tag = _first(INTRODUCTION, tree)
+    introduction = _clean_text(get_text(introduction_tag) if introduction_tag is not None else "No introduction found")
+
+    author = _first(AUTHOR, tree)
+    metadata = {
+        "time_published": time,
+        "date_published": date,
+        "type": type_of_qa,
+        "author": _clean_text(get_text(author)) if author is not None else "",
+    }
+
+    content_sections = []
+    for h2_tag in H2(tree):
+        sub_content = []
+        for sibling in h2_tag.itersiblings():
+            if not isinstance(sibling.tag, str):
+                continue
+            if sibling.tag == 'h2':
+                break
+            if sibling.tag == 'p':
+                img_tag = _first(FIRST_IMG, sibling)
+                if img_tag is not None:
+                    sub_content.append(img_tag.get("src") if img_tag.get("src") else "No image source")
+                else:
+                    sub_content.append(_clean_text(get_text(sibling)))
+            if sibling.tag == 'blockquote':
+                sub_content.append([get_text(em) for em in EMS(sibling)])
+
+        strong = _first(FIRST_STRONG, h2_tag)
+        content_sections.append({
+            "sub_title": get_text(strong) if strong is not None else "",
+            "sub_content": "\n".join(_flatten_and_join(sub_content)),
+        })
+
+    return {
+        "urls": url,
+        "keyword": kw,
+        "title": title,
+        "introduction": introduction,
+        "content": content_sections,
+        "metadata": metadata,
+    }
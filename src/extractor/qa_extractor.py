@@ -1,6 +1,14 @@
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 import pandas as pd 
-from src.utils.url_utils import load_url, get_type_of_law
+from src.utils.url_utils import load_url, get_type_of_law, get_site_url, get_page_number
+from src.utils.http_client import configure_session
+from src.utils.html_parser import make_soup, get_parser_backend, QA_LISTING_STRAINER, QA_LISTING_PAGE_STRAINER
+from src.utils.metrics import record_outcome, timed
+try:
+    from src.extractor import lxml_extractor
+except ImportError:
+    lxml_extractor = None
+from src.crawler.async_engine import AsyncCrawlEngine
 import json
 import requests
 from bs4 import BeautifulSoup
@@ -11,54 +19,101 @@ from typing import List, Optional
 import pandas as pd 
 from concurrent.futures import ThreadPoolExecutor
 
+# Fields of a listing record, one per article card
+LISTING_COLUMNS = ['link', 'keyword', "date", "time", "type"]
+
 def get_all_sub_qa_url(url: str) -> List[str]:
     """Get all sub-URLs from the main QA URL."""
-    soup = load_url(url, return_content=True)
+    response = load_url(url)
+    with timed("extract"):
+        return extract_sub_qa_url(response.content, url)
+
+def get_sub_qa_records(url: str) -> List[Dict[str, Any]]:
+    """Like `get_all_sub_qa_url`, as plain listing records instead of a DataFrame.
+
+    An error status is raised (requests.HTTPError) rather than failing on a None response.
+    """
+    response = load_url(url, raise_errors=True)
+    with timed("extract"):
+        return extract_sub_qa_records(response.content, url)
+
+def get_listing_page(url: str) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """Like `get_sub_qa_records`, also returning the last page number in the pager."""
+    response = load_url(url, raise_errors=True)
+    with timed("extract"):
+        return extract_listing_page(response.content, url)
+
+def parse_sub_qa_records(soup, url: str) -> List[Dict[str, Any]]:
+    """Parse the article links of a parsed QA listing page into one record per article."""
     # Extract article links
     articles = soup.select('article')
-    keywords = []
-    time = []
-    date = []
-    links = []
-    type_qa = []
+    records = []
 
     type_url = get_type_of_law(url)
+    site_url = get_site_url()
     for article in articles:
         tag_a = article.find('a', class_='title-link')
-        links.append("https://thuvienphapluat.vn" + tag_a.get("href") if tag_a else None)
-        type_qa.append(type_url)
         # Keyword
         keyword_find = article.select('.d-block.sub-item-head-keyword')
-        if keyword_find:
-            keywords.append([kw.get_text(strip=True) for kw in keyword_find])
-        else:
-            keywords.append([None])
-            
-         # Get sub-time
+        # Get sub-time
         sub_time_tag = article.find('span', class_='sub-time')
         if sub_time_tag:
-            time.append(sub_time_tag.get_text(strip=True).replace(" ","").split("|")[0])
-            date.append(sub_time_tag.get_text(strip=True).replace(" ","").split("|")[1])
+            sub_time = sub_time_tag.get_text(strip=True).replace(" ","").split("|")
+            time, date = sub_time[0], sub_time[1]
         else:
-            time.append(None)
-            date.append(None)
-        
-    df = pd.DataFrame(list(zip(links, keywords, date, time, type_qa)), columns =['link', 'keyword', "date", "time", "type"])
-    return df
+            time, date = None, None
+        records.append({
+            "link": site_url + tag_a.get("href") if tag_a else None,
+            "keyword": [kw.get_text(strip=True) for kw in keyword_find] if keyword_find else [None],
+            "date": date,
+            "time": time,
+            "type": type_url,
+        })
+    return records
+
+def parse_last_page(soup) -> Optional[int]:
+    """Highest page number the pager of a parsed QA listing page links to, or None without a pager."""
+    pages = [get_page_number(a.get("href") or "") for a in soup.select('ul.pagination a.page-link')]
+    pages = [page for page in pages if page is not None]
+    return max(pages) if pages else None
+
+def parse_sub_qa_url(soup, url: str) -> pd.DataFrame:
+    """Parse the article links of a parsed QA listing page."""
+    return pd.DataFrame(parse_sub_qa_records(soup, url), columns=LISTING_COLUMNS)
+
+def extract_sub_qa_records(content: bytes, url: str) -> List[Dict[str, Any]]:
+    """Parse the raw body of a QA listing page into records (the QACrawler input)."""
+    if get_parser_backend() == "lxml":
+        return lxml_extractor.parse_sub_qa_records(content, url)
+    return parse_sub_qa_records(make_soup(content, parse_only=QA_LISTING_STRAINER), url)
+
+def extract_listing_page(content: bytes, url: str) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """The records of a QA listing page and the last page number in its pager (None without one)."""
+    if get_parser_backend() == "lxml":
+        return lxml_extractor.parse_listing_page(content, url)
+    soup = make_soup(content, parse_only=QA_LISTING_PAGE_STRAINER)
+    return parse_sub_qa_records(soup, url), parse_last_page(soup)
+
+def extract_sub_qa_url(content: bytes, url: str) -> pd.DataFrame:
+    """Parse the raw body of a QA listing page; runs on the async engine's parse pool."""
+    return pd.DataFrame(extract_sub_qa_records(content, url), columns=LISTING_COLUMNS)
 
 def process_url(url: str):
     try:
         df = get_all_sub_qa_url(url)
+        record_outcome("listing", "ok")
         return df
     except Exception as e:
+        record_outcome("listing", "failed")
         with open("failed_links.txt", "a") as log_file:
             log_file.write(f"{url}\t{str(e)}\n")
         print(f"Error processing {url}: {e}")
         return None
     
-def process_urls_multithreaded(urls, max_workers=10, num_page_urls=500):
+def process_urls_multithreaded(urls, max_workers=10):
     dfs = []
     failed_urls = []
+    configure_session(pool_size=max_workers)
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         results = executor.map(process_url, urls)
         for url, result in zip(urls, results):
@@ -76,5 +131,38 @@ def process_urls_multithreaded(urls, max_workers=10, num_page_urls=500):
         final_df = pd.concat(dfs, ignore_index=True)
         return final_df
     else:
-        return pd.DataFrame()  
+        return pd.DataFrame()
 
+async def process_url_async(engine: AsyncCrawlEngine, url: str):
+    try:
+        content = await engine.fetch(url)
+        if content is None:
+            raise ValueError("empty response")
+        df = await engine.parse(extract_sub_qa_url, content, url)
+        record_outcome("listing", "ok")
+        return df
+    except Exception as e:
+        record_outcome("listing", "failed")
+        with open("failed_links.txt", "a") as log_file:
+            log_file.write(f"{url}\t{str(e)}\n")
+        print(f"Error processing {url}: {e}")
+        return None
+
+def process_urls_async(urls, concurrency=256, parse_workers=None):
+    """Same as `process_urls_multithreaded`, with the listing pages fetched on one event loop."""
+    results = {}
+    engine = AsyncCrawlEngine(concurrency=concurrency, parse_workers=parse_workers)
+    engine.run(urls, process_url_async, results.__setitem__)
+
+    failed_urls = [url for url in urls if results.get(url) is None]
+    if failed_urls:
+        with open("failed_links_summary.txt", "w") as f:
+            for url in failed_urls:
+                f.write(url + "\n")
+
+    dfs = [results[url] for url in urls if results.get(url) is not None]
+    if dfs:
+        final_df = pd.concat(dfs, ignore_index=True)
+        return final_df
+    else:
+        return pd.DataFrame()
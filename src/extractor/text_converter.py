@@ -0,0 +1,127 @@
+"""Single-pass conversion of the document content div to plain text.
+
+Walks the lxml tree once and writes normalized text directly: whitespace runs
+collapse to one space, paragraphs are separated by a blank line, every table
+row is one line with its cells separated by tabs (blocks inside a cell are
+joined with spaces), and nothing else (markdown
+markers, hyphens, line wrapping) is added or removed.
+"""
+import re
+from typing import List
+
+import lxml.html
+
+WHITESPACE = re.compile(r"\s+")
+# Number of line breaks a tag forces before and after its content
+PARAGRAPH_BREAK = 2
+LINE_BREAK = 1
+BLOCK_BREAKS = {
+    **dict.fromkeys(["p", "h1", "h2", "h3", "h4", "h5", "h6", "table", "blockquote", "pre", "ul", "ol", "dl", "hr"], PARAGRAPH_BREAK),
+    **dict.fromkeys(["div", "tr", "li", "dd", "dt", "section", "article", "header", "footer", "caption", "br"], LINE_BREAK),
+}
+CELL_TAGS = {"td", "th"}
+SKIPPED_TAGS = {"script", "style", "template", "head", "title"}
+
+
+class _TextWriter:
+    """Accumulates text, deferring spaces and line breaks until real text follows."""
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.pending_breaks = 0
+        self.pending_space = False
+        # No cell of the current table row was started yet
+        self.first_cell = True
+
+    def text(self, value: str, preformatted: bool = False) -> None:
+        if not preformatted:
+            value = WHITESPACE.sub(" ", value)
+            if value.startswith(" "):
+                self.pending_space = True
+                value = value[1:]
+        if not value:
+            return
+        self._flush_breaks()
+        if self.pending_space and self.parts and not self.parts[-1].endswith(("\n", "\t")):
+            self.parts.append(" ")
+        if not preformatted and value.endswith(" "):
+            self.parts.append(value[:-1])
+            self.pending_space = True
+        else:
+            self.parts.append(value)
+            self.pending_space = False
+
+    def block(self, breaks: int) -> None:
+        if self.parts:
+            self.pending_breaks = max(self.pending_breaks, breaks)
+        self.pending_space = False
+
+    def space(self) -> None:
+        self.pending_space = True
+
+    def row(self) -> None:
+        self.first_cell = True
+
+    def cell(self) -> None:
+        """Start a table cell; every cell after the first in a row is preceded by a tab, empty ones included."""
+        if not self.first_cell:
+            self._flush_breaks()
+            self.parts.append("\t")
+        self.first_cell = False
+        self.pending_space = False
+
+    def _flush_breaks(self) -> None:
+        if self.pending_breaks:
+            self.parts.append("\n" * self.pending_breaks)
+            self.pending_breaks = 0
+            self.pending_space = False
+
+    def getvalue(self) -> str:
+        return "".join(self.parts)
+
+
+def _walk(element, writer: _TextWriter, preformatted: bool, in_cell: bool) -> None:
+    tag = element.tag
+    if not isinstance(tag, str) or tag in SKIPPED_TAGS:
+        return
+    breaks = BLOCK_BREAKS.get(tag, 0)
+    if tag == "tr" and not in_cell:
+        writer.row()
+    if tag in CELL_TAGS:
+        if in_cell:
+            # A nested table's cells only separate words, like the blocks in a cell
+            writer.space()
+        else:
+            writer.cell()
+        in_cell = True
+    # Inside a table cell blocks only separate words, so each row stays on one line
+    joined = breaks and in_cell
+    if joined:
+        writer.space()
+    elif breaks:
+        writer.block(breaks)
+    preformatted = preformatted or tag == "pre"
+    if element.text:
+        writer.text(element.text, preformatted)
+    for child in element:
+        _walk(child, writer, preformatted, in_cell)
+        if child.tail:
+            writer.text(child.tail, preformatted)
+    if joined:
+        writer.space()
+    elif breaks:
+        writer.block(breaks)
+
+
+def element_to_text(element) -> str:
+    """Plain text of an lxml element tree, in one pass."""
+    writer = _TextWriter()
+    _walk(element, writer, False, False)
+    return writer.getvalue()
+
+
+def html_to_text(html_text: str) -> str:
+    """Plain text of an HTML fragment such as the extracted content div."""
+    if not html_text:
+        return ""
+    return element_to_text(lxml.html.fragment_fromstring(html_text, create_parent="div"))
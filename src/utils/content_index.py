@@ -0,0 +1,195 @@
+import hashlib
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+
+from .frontier import frontier_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS content (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    simhash INTEGER NOT NULL,
+    band0 INTEGER NOT NULL,
+    band1 INTEGER NOT NULL,
+    band2 INTEGER NOT NULL,
+    band3 INTEGER NOT NULL,
+    duplicate_of TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS content_hash ON content (content_hash);
+CREATE INDEX IF NOT EXISTS content_band0 ON content (band0);
+CREATE INDEX IF NOT EXISTS content_band1 ON content (band1);
+CREATE INDEX IF NOT EXISTS content_band2 ON content (band2);
+CREATE INDEX IF NOT EXISTS content_band3 ON content (band3);
+"""
+
+SIMHASH_BITS = 64
+# Fingerprints within BANDS - 1 bits of each other agree on at least one whole band
+BANDS = 4
+BAND_BITS = SIMHASH_BITS // BANDS
+# Words per shingle hashed into the SimHash
+SHINGLE_WORDS = 3
+
+
+def normalize_text(text: str) -> str:
+    """Case-folded text with every run of whitespace collapsed to one space."""
+    return " ".join(text.lower().split())
+
+
+def content_hash(text: str) -> str:
+    return hashlib.blake2b(normalize_text(text).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def simhash(text: str, shingle_words: int = SHINGLE_WORDS) -> int:
+    """64-bit SimHash of the word shingles of `text`; similar texts differ in few bits."""
+    words = normalize_text(text).split()
+    shingles = {" ".join(words[index:index + shingle_words]) for index in range(max(1, len(words) - shingle_words + 1))}
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little") for shingle in shingles),
+        dtype="<u8",
+        count=len(shingles),
+    )
+    # One row of 64 bits per shingle; a bit is set when most shingles have it set
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    majority = bits.sum(axis=0, dtype=np.int64) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(majority, bitorder="little").tobytes(), "little")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _signed(value: int) -> int:
+    """A 64-bit fingerprint as the signed integer SQLite stores."""
+    return value - (1 << SIMHASH_BITS) if value >= 1 << (SIMHASH_BITS - 1) else value
+
+
+def _bands(value: int):
+    mask = (1 << BAND_BITS) - 1
+    return [(value >> (band * BAND_BITS)) & mask for band in range(BANDS)]
+
+
+class Duplicate(NamedTuple):
+    """The earlier document a text duplicates: its key (document ID), URL and estimated similarity."""
+    key: str
+    url: str
+    similarity: float
+
+    @property
+    def exact(self) -> bool:
+        """The same normalized text, not just a close SimHash."""
+        return self.similarity == 1.0
+
+
+class ContentIndex:
+    """Content hash and SimHash of every crawled document, keyed by document ID.
+
+    `add` indexes a document's text and says which earlier document it
+    duplicates: the same normalized text (similarity 1.0), or a SimHash at
+    most `max_distance` of its 64 bits away (the banded lookup finds every
+    such match up to 3 bits; 0 disables near duplicates). Only exact
+    duplicates are recorded as such; a near duplicate may be an amended text,
+    so it stays an original that later documents can match. Only originals are
+    matched against, so every duplicate points at a stored full copy. When an
+    original is crawled again with another text, the duplicates stored as
+    references to it are dropped from the index and listed by `pop_stale`, to
+    be crawled again in full. The table lives next to the frontier and refresh
+    state by default.
+    """
+
+    def __init__(self, db_path: str = "data/frontier.sqlite3", max_distance: int = 3, journal_mode: str = "WAL"):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.max_distance = max_distance
+        self.lock = Lock()
+        # Shared with the frontier, which worker processes may be writing at the same time
+        self.conn = sqlite3.connect(db_path, timeout=60, check_same_thread=False)
+        self.conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        # URLs of references dropped because their original changed, see `pop_stale`
+        self.stale = []
+
+    def _release(self, key: str, digest: str) -> List[str]:
+        """Drop the references to `key` when its text is now `digest`; returns their URLs."""
+        row = self.conn.execute("SELECT content_hash, duplicate_of FROM content WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] is not None or row[0] == digest:
+            return []
+        urls = [url for (url,) in self.conn.execute(
+            "SELECT url FROM content WHERE duplicate_of = ? AND content_hash != ?", (key, digest)
+        )]
+        self.conn.execute("DELETE FROM content WHERE duplicate_of = ? AND content_hash != ?", (key, digest))
+        return urls
+
+    def _find(self, key: str, digest: str, fingerprint: int) -> Optional[Duplicate]:
+        row = self.conn.execute(
+            "SELECT key, url FROM content WHERE content_hash = ? AND key != ? AND duplicate_of IS NULL LIMIT 1",
+            (digest, key),
+        ).fetchone()
+        if row is not None:
+            return Duplicate(row[0], row[1], 1.0)
+        if not self.max_distance:
+            return None
+        bands = _bands(fingerprint)
+        best = None
+        for other_key, other_url, other in self.conn.execute(
+            "SELECT key, url, simhash FROM content WHERE (band0 = ? OR band1 = ? OR band2 = ? OR band3 = ?) "
+            "AND key != ? AND duplicate_of IS NULL",
+            (*bands, key),
+        ):
+            distance = hamming_distance(fingerprint, other & ((1 << SIMHASH_BITS) - 1))
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, other_key, other_url)
+        if best is None:
+            return None
+        # Below 1.0 even at distance 0: the normalized texts differ
+        return Duplicate(best[1], best[2], min(0.9999, round(1 - best[0] / SIMHASH_BITS, 4)))
+
+    def add(self, url: str, text: str) -> Optional[Duplicate]:
+        """Index the text of `url`; returns the earlier document it duplicates, or None when it is new.
+
+        A document crawled again (same ID) replaces its own entry and never
+        matches itself.
+        """
+        if not normalize_text(text):
+            return None
+        key = frontier_key(url)
+        digest = content_hash(text)
+        fingerprint = simhash(text)
+        with self.lock, self.conn:
+            # Lookup and insert as one write transaction, so two workers cannot both keep a copy
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.stale.extend(self._release(key, digest))
+            duplicate = self._find(key, digest, fingerprint)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO content (key, url, content_hash, simhash, band0, band1, band2, band3, duplicate_of, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, digest, _signed(fingerprint), *_bands(fingerprint), duplicate.key if duplicate and duplicate.exact else None, time.time()),
+            )
+        return duplicate
+
+    def pop_stale(self) -> List[str]:
+        """URLs stored as references to an original whose text has changed since; cleared on return."""
+        with self.lock:
+            stale, self.stale = self.stale, []
+        return stale
+
+    def __contains__(self, url: str) -> bool:
+        """Whether a document with this URL's ID was indexed already (by any URL alias)."""
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM content WHERE key = ?", (frontier_key(url),)).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM content").fetchone()[0]
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
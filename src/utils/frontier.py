@@ -0,0 +1,310 @@
+import json
+import os
+import socket
+import sqlite3
+import time
+from itertools import islice
+from threading import Lock
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .url_utils import get_id_from_url
+
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    payload TEXT,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS frontier_state ON frontier (state);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sitemap_parts (
+    url TEXT PRIMARY KEY,
+    lastmod TEXT,
+    loaded_at REAL NOT NULL
+);
+"""
+
+# Lease columns, added to frontiers created before worker mode
+LEASE_COLUMNS = {"owner": "TEXT", "lease_until": "REAL"}
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def frontier_key(url: str) -> str:
+    """Dedupe key of a URL: the document ID when the URL carries one, else the URL."""
+    return get_id_from_url(url) or url
+
+
+class CrawlFrontier:
+    """On-disk crawl frontier keyed by document ID.
+
+    Every URL is stored once with its state (pending/in_flight/done/failed),
+    attempt count and timestamps, so a restarted run only claims what is left.
+    On open, URLs left in flight by a crash go back to pending, as do failed
+    ones with fewer than `max_attempts` attempts.
+
+    With a `worker_id` the frontier is one worker's view of a queue shared by
+    several processes, possibly on several nodes: claimed URLs are leased to
+    the worker for `lease_seconds`, `heartbeat` renews its leases, and a URL
+    whose lease ran out (its worker died or hung) is claimed again by another
+    worker. Opening a worker frontier leaves the other workers' leases alone.
+    On a network file system pass `journal_mode="DELETE"`, since WAL needs
+    shared memory between the processes.
+
+    The sitemap parts whose URLs were queued are remembered with their
+    `<lastmod>` in the sitemap index, so a later run can skip unchanged parts.
+    """
+
+    def __init__(
+        self,
+        db_path: str = "data/frontier.sqlite3",
+        max_attempts: int = 3,
+        worker_id: Optional[str] = None,
+        lease_seconds: float = 300.0,
+        journal_mode: str = "WAL",
+    ):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.lock = Lock()
+        # Other workers hold the write lock for a claim or a state update at a time
+        self.conn = sqlite3.connect(db_path, timeout=60, check_same_thread=False)
+        self.conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._add_lease_columns()
+        self._recover()
+        if worker_id is not None:
+            self.heartbeat()
+
+    def _add_lease_columns(self) -> None:
+        with self.lock, self.conn:
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(frontier)")}
+            for name, kind in LEASE_COLUMNS.items():
+                if name not in columns:
+                    self.conn.execute(f"ALTER TABLE frontier ADD COLUMN {name} {kind}")
+
+    def _recover(self) -> None:
+        with self.lock, self.conn:
+            now = time.time()
+            if self.worker_id is None:
+                # In flight without a lease: claimed by a single-process run that stopped
+                self.conn.execute(
+                    "UPDATE frontier SET state = ?, updated_at = ? WHERE state = ? AND lease_until IS NULL",
+                    (PENDING, now, IN_FLIGHT),
+                )
+                self.conn.execute(
+                    "UPDATE frontier SET state = ?, updated_at = ? WHERE state = ? AND attempts < ?",
+                    (PENDING, now, FAILED, self.max_attempts),
+                )
+            # Leases of dead workers that ran out of attempts are not handed out again
+            self.conn.execute(
+                "UPDATE frontier SET state = ?, error = ?, owner = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE state = ? AND lease_until < ? AND attempts >= ?",
+                (FAILED, "lease expired", now, IN_FLIGHT, now, self.max_attempts),
+            )
+
+    def add(self, urls: Iterable[str], chunk_size: int = 10000) -> int:
+        """Queue URLs not seen before; returns how many were new."""
+        return self._insert(((url, None) for url in urls), chunk_size)
+
+    def add_records(self, records: Iterable[Dict[str, Any]], url_key: str = "link", chunk_size: int = 10000) -> int:
+        """Queue records (e.g. Q&A listing rows) keyed by their `url_key` field."""
+        return self._insert(((record[url_key], json.dumps(record, ensure_ascii=False)) for record in records), chunk_size)
+
+    def _insert(self, rows: Iterable, chunk_size: int) -> int:
+        added = 0
+        rows = iter(rows)
+        while True:
+            now = time.time()
+            chunk = [
+                (frontier_key(url), url, payload, PENDING, now, now)
+                for url, payload in islice(rows, chunk_size)
+                if url
+            ]
+            if not chunk:
+                return added
+            with self.lock, self.conn:
+                before = self.conn.total_changes
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO frontier (key, url, payload, state, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    chunk,
+                )
+                added += self.conn.total_changes - before
+
+    def requeue(self, urls: Iterable[str], chunk_size: int = 10000) -> int:
+        """Queue URLs again even if already done or failed (incremental refresh)."""
+        requeued = 0
+        urls = iter(urls)
+        while True:
+            now = time.time()
+            chunk = [(frontier_key(url), url, PENDING, now, now) for url in islice(urls, chunk_size) if url]
+            if not chunk:
+                return requeued
+            with self.lock, self.conn:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO frontier (key, url, state, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    chunk,
+                )
+                before = self.conn.total_changes
+                self.conn.executemany(
+                    "UPDATE frontier SET state = ?, attempts = 0, updated_at = ? WHERE key = ? AND state IN (?, ?)",
+                    [(PENDING, now, key, DONE, FAILED) for key, _, _, _, _ in chunk],
+                )
+                requeued += self.conn.total_changes - before
+
+    def claim(self, limit: int) -> List[Dict[str, Any]]:
+        """Move up to `limit` pending URLs (or URLs whose lease expired) to in_flight and return them as records."""
+        if self.worker_id is not None:
+            self._recover()
+        with self.lock, self.conn:
+            now = time.time()
+            # Taken before the SELECT so two workers never read the same pending rows
+            self.conn.execute("BEGIN IMMEDIATE")
+            rows = self.conn.execute(
+                "SELECT key, url, payload FROM frontier WHERE state = ? OR (state = ? AND lease_until < ?) LIMIT ?",
+                (PENDING, IN_FLIGHT, now, limit),
+            ).fetchall()
+            lease_until = now + self.lease_seconds if self.worker_id is not None else None
+            self.conn.executemany(
+                "UPDATE frontier SET state = ?, attempts = attempts + 1, owner = ?, lease_until = ?, updated_at = ? WHERE key = ?",
+                [(IN_FLIGHT, self.worker_id, lease_until, now, key) for key, _, _ in rows],
+            )
+        return [json.loads(payload) if payload else {"url": url} for _, url, payload in rows]
+
+    def leased(self) -> int:
+        """URLs in flight under a lease that has not run out yet, this worker's included."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM frontier WHERE state = ? AND lease_until >= ?",
+                (IN_FLIGHT, time.time()),
+            ).fetchone()[0]
+
+    def iter_batches(self, batch_size: int = 100, poll_interval: Optional[float] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Yield claimed batches until nothing is pending.
+
+        A worker does not stop while other workers still hold leases: it polls
+        every `poll_interval` seconds (a quarter lease, at most 1) and picks up
+        the URLs of a lease that runs out.
+        """
+        poll_interval = poll_interval or min(1.0, self.lease_seconds / 4)
+        while True:
+            batch = self.claim(batch_size)
+            if batch:
+                yield batch
+            elif self.worker_id is not None and self.leased():
+                time.sleep(poll_interval)
+            else:
+                return
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for batch in self.iter_batches():
+            yield from batch
+
+    def _set_state(self, url: str, state: str, error: Optional[str] = None) -> None:
+        # A worker whose lease ran out and was reassigned no longer owns the URL
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE frontier SET state = ?, error = ?, owner = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE key = ? AND (owner IS NULL OR owner = ?)",
+                (state, error, time.time(), frontier_key(url), self.worker_id),
+            )
+
+    def mark_done(self, url: str) -> None:
+        self._set_state(url, DONE)
+
+    def mark_failed(self, url: str, error: Optional[str] = None, retryable: bool = True) -> None:
+        """A URL that is not `retryable` (e.g. a 404) is not picked up again by a later run."""
+        self._set_state(url, FAILED, error)
+        if not retryable:
+            with self.lock, self.conn:
+                self.conn.execute("UPDATE frontier SET attempts = MAX(attempts, ?) WHERE key = ?", (self.max_attempts, frontier_key(url)))
+
+    def heartbeat(self) -> int:
+        """Renew this worker's leases; returns how many workers are alive (seen within a lease)."""
+        with self.lock, self.conn:
+            now = time.time()
+            self.conn.execute(
+                "INSERT INTO workers (worker_id, started_at, last_seen) VALUES (?, ?, ?) "
+                "ON CONFLICT (worker_id) DO UPDATE SET last_seen = excluded.last_seen",
+                (self.worker_id, now, now),
+            )
+            self.conn.execute(
+                "UPDATE frontier SET lease_until = ? WHERE state = ? AND owner = ?",
+                (now + self.lease_seconds, IN_FLIGHT, self.worker_id),
+            )
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM workers WHERE last_seen >= ?",
+                (now - self.lease_seconds,),
+            ).fetchone()[0]
+
+    def leave(self) -> None:
+        """Hand this worker's leases back to pending and drop it from the live workers."""
+        with self.lock, self.conn:
+            now = time.time()
+            self.conn.execute(
+                "UPDATE frontier SET state = ?, attempts = MAX(attempts - 1, 0), owner = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE state = ? AND owner = ?",
+                (PENDING, now, IN_FLIGHT, self.worker_id),
+            )
+            self.conn.execute("DELETE FROM workers WHERE worker_id = ?", (self.worker_id,))
+
+    def part_unchanged(self, url: str, lastmod: Optional[str]) -> bool:
+        """Whether sitemap part `url` was loaded when its lastmod was already `lastmod` (never without one)."""
+        if lastmod is None:
+            return False
+        with self.lock:
+            row = self.conn.execute("SELECT lastmod FROM sitemap_parts WHERE url = ?", (url,)).fetchone()
+        return row is not None and row[0] == lastmod
+
+    def record_part(self, url: str, lastmod: Optional[str]) -> None:
+        """Remember that sitemap part `url` was loaded at `lastmod`."""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sitemap_parts (url, lastmod, loaded_at) VALUES (?, ?, ?)",
+                (url, lastmod, time.time()),
+            )
+
+    def iter_urls(self, state: Optional[str] = None) -> Iterator[str]:
+        """URLs in the frontier, only those in `state` when given."""
+        with self.lock:
+            if state is None:
+                rows = self.conn.execute("SELECT url FROM frontier").fetchall()
+            else:
+                rows = self.conn.execute("SELECT url FROM frontier WHERE state = ?", (state,)).fetchall()
+        for (url,) in rows:
+            yield url
+
+    def __contains__(self, url: str) -> bool:
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM frontier WHERE key = ?", (frontier_key(url),)).fetchone()
+        return row is not None
+
+    def counts(self) -> Dict[str, int]:
+        """Number of URLs per state."""
+        with self.lock:
+            return dict(self.conn.execute("SELECT state, COUNT(*) FROM frontier GROUP BY state").fetchall())
+
+    def close(self) -> None:
+        if self.worker_id is not None:
+            self.leave()
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,173 @@
+from typing import Iterator, Optional, Union
+
+from bs4 import BeautifulSoup, SoupStrainer, UnicodeDammit
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+from .metrics import timed
+
+# "html.parser" builds full BeautifulSoup trees (the original extractors);
+# "lxml" runs the XPath extractors of src.extractor.lxml_extractor on libxml2 trees.
+# libxml2 closes an unclosed <p>/<td>/<li> where html.parser nests the next one
+# inside it, so lxml gives the same output only on well-formed markup and is opt-in
+# (--parser lxml); by default pages are parsed by html.parser as before, with the strainers below
+BACKENDS = ("html.parser", "lxml")
+DEFAULT_BACKEND = "html.parser"
+
+_backend = DEFAULT_BACKEND
+
+# Only the nodes get_document_content looks at; the rest of the page is never built
+DOCUMENT_CONTENT_STRAINER = SoupStrainer("div", attrs={"class": ["content1", "TaiVanBan"]})
+# Only the article cards of a Q&A listing page
+QA_LISTING_STRAINER = SoupStrainer("article")
+# The article cards and the pager
+QA_LISTING_PAGE_STRAINER = SoupStrainer(["article", "ul"])
+
+# Tags BeautifulSoup serializes as <tag/>
+VOID_ELEMENTS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "keygen", "link", "menuitem",
+    "meta", "param", "source", "track", "wbr", "basefont", "bgsound", "command", "frame",
+    "image", "isindex", "nextid", "spacer",
+}
+# Tags whose strings BeautifulSoup neither escapes on output nor counts in .text
+CDATA_ELEMENTS = {"script", "style"}
+NON_TEXT_ELEMENTS = {"script", "style", "template"}
+# Tags inside which BeautifulSoup keeps whitespace-only strings as they are
+PRESERVE_WHITESPACE_ELEMENTS = {"pre", "textarea"}
+ASCII_SPACES = str.maketrans("", "", "\x20\x0a\x09\x0c\x0d")
+# Attributes BeautifulSoup splits on whitespace and re-joins with single spaces
+MULTI_VALUED_ATTRIBUTES = {
+    "*": {"class", "accesskey", "dropzone"},
+    "a": {"rel", "rev"},
+    "link": {"rel", "rev"},
+    "td": {"headers"},
+    "th": {"headers"},
+    "form": {"accept-charset"},
+    "object": {"archive"},
+    "area": {"rel"},
+    "icon": {"sizes"},
+    "iframe": {"sandbox"},
+    "output": {"for"},
+}
+
+
+def set_parser_backend(name: str) -> None:
+    """Select the backend used by every extract_* function ("lxml" or "html.parser")."""
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown parser backend: {name}")
+    if name == "lxml" and lxml is None:
+        raise ValueError("The lxml backend requires lxml: pip install lxml")
+    _backend = name
+
+
+def get_parser_backend() -> str:
+    return _backend
+
+
+def make_soup(content: Union[bytes, str], parse_only: Optional[SoupStrainer] = None) -> BeautifulSoup:
+    """Parse HTML into a BeautifulSoup tree, optionally building only `parse_only` subtrees."""
+    with timed("parse"):
+        return BeautifulSoup(content, 'html.parser', parse_only=parse_only)
+
+
+def make_tree(content: Union[bytes, str]):
+    """Parse HTML into an lxml tree, decoding bytes the way BeautifulSoup would."""
+    if isinstance(content, bytes):
+        try:
+            content = content.decode("utf-8")
+        except UnicodeDecodeError:
+            content = UnicodeDammit(content, is_html=True).unicode_markup
+    if content.startswith("\ufeff"):
+        content = content[1:]
+    with timed("parse"):
+        return lxml.html.document_fromstring(content)
+
+
+def _soup_string(text: str, preserve: bool) -> str:
+    """BeautifulSoup collapses a whitespace-only string to "\\n" (or " " without a newline)."""
+    if preserve or text.translate(ASCII_SPACES):
+        return text
+    return "\n" if "\n" in text else " "
+
+
+def _preserves_whitespace(element) -> bool:
+    if element.tag in PRESERVE_WHITESPACE_ELEMENTS:
+        return True
+    return any(ancestor.tag in PRESERVE_WHITESPACE_ELEMENTS for ancestor in element.iterancestors())
+
+
+def iter_strings(element, preserve: Optional[bool] = None) -> Iterator[str]:
+    """Text nodes under `element` in document order, as BeautifulSoup's .text sees them."""
+    if preserve is None:
+        preserve = _preserves_whitespace(element)
+    if element.tag not in NON_TEXT_ELEMENTS and element.text:
+        yield _soup_string(element.text, preserve)
+    for child in element:
+        if isinstance(child.tag, str):
+            yield from iter_strings(child, preserve or child.tag in PRESERVE_WHITESPACE_ELEMENTS)
+        if child.tail:
+            yield _soup_string(child.tail, preserve)
+
+
+def get_text(element, strip: bool = False) -> str:
+    """Equivalent of BeautifulSoup's `tag.text` / `tag.get_text(strip=True)`."""
+    if strip:
+        return "".join(text.strip() for text in iter_strings(element) if text.strip())
+    return "".join(iter_strings(element))
+
+
+def _escape(text: str) -> str:
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _quote_attribute(value: str) -> str:
+    value = _escape(value)
+    if '"' in value:
+        if "'" in value:
+            return '"' + value.replace('"', "&quot;") + '"'
+        return "'" + value + "'"
+    return '"' + value + '"'
+
+
+def _serialize(element, parts, preserve: bool) -> None:
+    tag = element.tag
+    if tag is etree.Comment:
+        parts.append("<!--" + (element.text or "") + "-->")
+        return
+    if tag is etree.ProcessingInstruction:
+        parts.append("<?" + element.target + (" " + element.text if element.text else "") + ">")
+        return
+    multi_valued = MULTI_VALUED_ATTRIBUTES["*"] | MULTI_VALUED_ATTRIBUTES.get(tag, set())
+    parts.append("<" + tag)
+    # BeautifulSoup's default formatter writes attributes in sorted order
+    for name, value in sorted(element.attrib.items()):
+        if name in multi_valued:
+            value = " ".join(value.split())
+        parts.append(" " + name + "=" + _quote_attribute(value))
+    if tag in VOID_ELEMENTS:
+        parts.append("/>")
+        return
+    parts.append(">")
+    cdata = tag in CDATA_ELEMENTS
+    inner = preserve or tag in PRESERVE_WHITESPACE_ELEMENTS
+    if element.text:
+        text = _soup_string(element.text, inner)
+        parts.append(text if cdata else _escape(text))
+    for child in element:
+        _serialize(child, parts, inner)
+        if child.tail:
+            tail = _soup_string(child.tail, inner)
+            parts.append(tail if cdata else _escape(tail))
+    parts.append("</" + tag + ">")
+
+
+def to_soup_html(element) -> str:
+    """Serialize an lxml element exactly like `str(tag)` on the BeautifulSoup tree."""
+    parts = []
+    _serialize(element, parts, _preserves_whitespace(element))
+    return "".join(parts)
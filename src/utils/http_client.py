@@ -0,0 +1,187 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import count, get_metrics, observe_stage
+from .rate_limiter import THROTTLE_STATUS, backoff_delay, get_host_limiter, retry_after
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# (connect, read) timeouts in seconds; a stuck socket must never block a worker forever
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 30
+DEFAULT_POOL_SIZE = 10
+# Number of distinct hosts whose pools are kept alive (site, proxy api, ...)
+DEFAULT_POOL_HOSTS = 10
+MAX_RETRIES = 3
+
+_session: Optional[requests.Session] = None
+_session_pool_size = 0
+_session_lock = threading.Lock()
+_proxy_pool = None
+_response_archive = None
+
+
+def _accept_encoding() -> str:
+    """Advertise brotli only when urllib3 is able to decode it."""
+    try:
+        import brotli  # noqa: F401
+        return "gzip, deflate, br"
+    except ImportError:
+        pass
+    try:
+        import brotlicffi  # noqa: F401
+        return "gzip, deflate, br"
+    except ImportError:
+        return "gzip, deflate"
+
+
+def create_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """Create a keep-alive session with one connection pool of `pool_size` per host."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=DEFAULT_POOL_HOSTS, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        "User-Agent": USER_AGENT,
+        "Accept-Encoding": _accept_encoding(),
+        "Connection": "keep-alive",
+    })
+    return session
+
+
+def configure_session(pool_size: int) -> requests.Session:
+    """Make sure the shared session can hold at least `pool_size` connections per host.
+
+    Called by the crawlers with their thread count so that every worker thread can keep
+    its own connection alive instead of re-doing the TCP+TLS handshake per request.
+    """
+    global _session, _session_pool_size
+    with _session_lock:
+        if _session is None or pool_size > _session_pool_size:
+            old_session = _session
+            _session = create_session(pool_size)
+            _session_pool_size = pool_size
+            if old_session is not None:
+                old_session.close()
+        return _session
+
+
+def get_session() -> requests.Session:
+    """Return the process-wide shared session."""
+    if _session is None:
+        return configure_session(DEFAULT_POOL_SIZE)
+    return _session
+
+
+def set_proxy_pool(pool) -> None:
+    """Route every fetch through `pool` (a ProxyPool), or go direct again with None."""
+    global _proxy_pool
+    _proxy_pool = pool
+
+
+def get_proxy_pool():
+    return _proxy_pool
+
+
+def set_response_archive(archive) -> None:
+    """Record every successful fetch in `archive` (a ResponseArchive), or stop with None."""
+    global _response_archive
+    _response_archive = archive
+
+
+def get_response_archive():
+    return _response_archive
+
+
+def _record_response(response: requests.Response, latency: float, stream: bool) -> None:
+    count("responses_total", status=response.status_code)
+    # `elapsed` stops at the headers; a non-streamed body has been read by now
+    ttfb = response.elapsed.total_seconds()
+    observe_stage("ttfb", ttfb)
+    if not stream:
+        observe_stage("download", max(latency - ttfb, 0.0))
+        observe_stage("request", latency)
+        count("response_bytes_total", len(response.content))
+
+
+def fetch(
+    url: str,
+    headers: Optional[Dict[str, str]] = None,
+    proxies: Optional[Dict[str, str]] = None,
+    timeout: Tuple[float, float] = (CONNECT_TIMEOUT, READ_TIMEOUT),
+    max_retries: int = MAX_RETRIES,
+    use_proxy: bool = True,
+    stream: bool = False,
+) -> requests.Response:
+    """GET `url` through the shared session with explicit connect/read timeouts.
+
+    Requests go through the host's adaptive limiter; disconnects, timeouts, 429 and
+    5xx responses slow the host down and are retried with jittered exponential
+    backoff. The last response (or exception) is returned (raised) once retries
+    are exhausted. With a proxy pool set (and no explicit `proxies`), each attempt
+    picks a proxy for both http and https and reports how it did. With `stream`
+    the body is left unread for `iter_content`.
+
+    With metrics installed, the slot wait, time to headers and body download are
+    recorded as the "throttle", "ttfb" and "download" stages, along with status
+    codes, error types and body bytes.
+    """
+    limiter = get_host_limiter(url)
+    pool = _proxy_pool if use_proxy and proxies is None else None
+    host = urlsplit(url).netloc
+    for attempt in range(max_retries + 1):
+        delay = None
+        proxy = pool.choose(host) if pool is not None else None
+        attempt_proxies = {"http": proxy, "https": proxy} if proxy else proxies
+        metrics = get_metrics()
+        wait_start = time.monotonic()
+        with limiter.slot():
+            start = time.monotonic()
+            if metrics is not None:
+                observe_stage("throttle", start - wait_start)
+                metrics.add_gauge("in_flight", 1, stage="fetch")
+            try:
+                response = get_session().get(url, headers=headers, proxies=attempt_proxies, timeout=timeout, stream=stream)
+            except requests.exceptions.ProxyError as e:
+                count("errors_total", type=type(e).__name__)
+                # The proxy is at fault, not the host: no reason to slow the host down
+                if proxy:
+                    pool.report_failure(proxy)
+                if attempt == max_retries:
+                    raise
+                response = None
+            except (requests.ConnectionError, requests.Timeout) as e:
+                count("errors_total", type=type(e).__name__)
+                if proxy:
+                    pool.report_failure(proxy)
+                limiter.record_throttle()
+                if attempt == max_retries:
+                    raise
+                response = None
+            else:
+                latency = time.monotonic() - start
+                if metrics is not None:
+                    _record_response(response, latency, stream)
+                if proxy:
+                    pool.report_success(proxy, latency)
+                if response.status_code in THROTTLE_STATUS:
+                    limiter.record_throttle()
+                    delay = retry_after(response.headers.get("Retry-After"))
+                    if stream and attempt < max_retries:
+                        response.close()
+                else:
+                    limiter.record_success(latency)
+                    if _response_archive is not None and response.status_code == 200 and not stream:
+                        _response_archive.append(url, response.status_code, response.reason, response.headers, response.content)
+                    return response
+            finally:
+                if metrics is not None:
+                    metrics.add_gauge("in_flight", -1, stage="fetch")
+        if response is not None and attempt == max_retries:
+            return response
+        time.sleep(delay if delay is not None else backoff_delay(attempt))
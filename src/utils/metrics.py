@@ -0,0 +1,424 @@
+import argparse
+import cProfile
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+# Latency stages, in pipeline order. "throttle" is the wait for a per-host slot,
+# "ttfb" runs from sending the request (including connection set-up) to the
+# response headers, "request" is ttfb plus "download". "extract" is one extract_*
+# call and contains "parse" (tree building) and "text" (full_text conversion).
+STAGES = ("throttle", "dns", "connect", "ttfb", "download", "request", "extract", "parse", "text", "write")
+# Histogram upper bounds in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_HELP = {
+    "stage_seconds": ("histogram", "Time spent in each crawl stage"),
+    "records_total": ("counter", "Crawled items by crawler and outcome"),
+    "responses_total": ("counter", "HTTP responses by status code"),
+    "errors_total": ("counter", "Fetch and extraction errors by exception type"),
+    "response_bytes_total": ("counter", "Decoded response body bytes received"),
+    "in_flight": ("gauge", "Requests currently being sent or read"),
+    "queue_depth": ("gauge", "Items waiting in a pipeline queue"),
+    "retries_total": ("counter", "Failed URLs by failure kind, rescheduled, given up or recovered"),
+    "live_workers": ("gauge", "Workers sharing the frontier, as seen by the last heartbeat"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, as exposed by Prometheus."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (the largest bound for the overflow bucket)."""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _bucket_bounds(histogram: Histogram) -> List[str]:
+    return [f"{bound:g}" for bound in histogram.buckets] + ["+Inf"]
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+class CrawlMetrics:
+    """Thread-safe registry of the crawl's stage histograms, counters and gauges.
+
+    Install it with `set_metrics` (or the crawlers' `metrics` argument); the HTTP
+    client, the async engine, the parse pools and the crawlers then report into it.
+    Read it with `snapshot()` (JSON-ready dict) or `to_prometheus()` (text format).
+    """
+
+    def __init__(
+        self,
+        prefix: str = "crawler",
+        profiler: Optional["ProfileSampler"] = None,
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.prefix = prefix
+        self.profiler = profiler
+        self.buckets = buckets
+        self.started_at = time.time()
+        self.lock = threading.Lock()
+        self.histograms: Dict[str, Histogram] = {}
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.gauges: Dict[str, Dict[Labels, float]] = {}
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def observe_many(self, observations: List[Tuple[str, float]]) -> None:
+        for stage, seconds in observations:
+            self.observe(stage, seconds)
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = _labels(labels)
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        with self.lock:
+            self.gauges.setdefault(name, {})[_labels(labels)] = value
+
+    def add_gauge(self, name: str, delta: float, **labels) -> None:
+        key = _labels(labels)
+        with self.lock:
+            series = self.gauges.setdefault(name, {})
+            series[key] = series.get(key, 0) + delta
+
+    @contextmanager
+    def in_flight(self, **labels) -> Iterator[None]:
+        self.add_gauge("in_flight", 1, **labels)
+        try:
+            yield
+        finally:
+            self.add_gauge("in_flight", -1, **labels)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current values; throughput is successful records per second since start."""
+        now = time.time()
+        uptime = now - self.started_at
+        with self.lock:
+            records = self.counters.get("records_total", {})
+            throughput: Dict[str, float] = {}
+            for labels, value in records.items():
+                label_map = dict(labels)
+                if label_map.get("outcome") == "ok":
+                    crawler = label_map.get("crawler", "")
+                    throughput[crawler] = throughput.get(crawler, 0) + value
+            return {
+                "time": round(now, 3),
+                "uptime": round(uptime, 3),
+                "throughput": {crawler: round(count / uptime, 3) for crawler, count in throughput.items()} if uptime else {},
+                "stages": {stage: histogram.snapshot() for stage, histogram in sorted(self.histograms.items())},
+                "counters": {
+                    name + _format_labels(labels): value
+                    for name, series in sorted(self.counters.items()) for labels, value in sorted(series.items())
+                },
+                "gauges": {
+                    name + _format_labels(labels): value
+                    for name, series in sorted(self.gauges.items()) for labels, value in sorted(series.items())
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        """The registry in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+
+        def header(name: str, default_type: str) -> str:
+            metric_type, text = METRIC_HELP.get(name, (default_type, name))
+            full_name = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {full_name} {text}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            return full_name
+
+        with self.lock:
+            if self.histograms:
+                name = header("stage_seconds", "histogram")
+                for stage, histogram in sorted(self.histograms.items()):
+                    cumulative = 0
+                    for bound, count in zip(_bucket_bounds(histogram), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+            for kind, registry in (("counter", self.counters), ("gauge", self.gauges)):
+                for metric, series in sorted(registry.items()):
+                    name = header(metric, kind)
+                    for labels, value in sorted(series.items()):
+                        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+_metrics: Optional[CrawlMetrics] = None
+# Per-thread buffer of (stage, seconds) while `run_staged` is collecting
+_local = threading.local()
+
+
+def set_metrics(metrics: Optional[CrawlMetrics]) -> None:
+    """Report every crawl stage into `metrics`, or stop with None."""
+    global _metrics
+    _metrics = metrics
+
+
+def get_metrics() -> Optional[CrawlMetrics]:
+    return _metrics
+
+
+def _collecting() -> bool:
+    return _metrics is not None or getattr(_local, "stages", None) is not None
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Record one stage latency, in the buffer of `run_staged` when one is active."""
+    stages = getattr(_local, "stages", None)
+    if stages is not None:
+        stages.append((stage, seconds))
+    elif _metrics is not None:
+        _metrics.observe(stage, seconds)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time the block as one `stage` observation; free when metrics are off."""
+    if not _collecting():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def count(name: str, value: float = 1, **labels) -> None:
+    if _metrics is not None:
+        _metrics.inc(name, value, **labels)
+
+
+def record_outcome(crawler: str, outcome: str) -> None:
+    """Count one finished item: outcome is "ok", "failed", "unchanged", "duplicate" or "near_duplicate"."""
+    if _metrics is not None:
+        _metrics.inc("records_total", crawler=crawler, outcome=outcome)
+
+
+def run_staged(func: Callable[..., Any], profile_path: Optional[str], *args) -> Tuple[Any, List[Tuple[str, float]]]:
+    """Run `func(*args)` and return its result with the stage timings it produced.
+
+    Used on the parse pools: worker processes have no registry, so the timings
+    travel back with the result and are merged by the parent.
+    """
+    _local.stages = stages = []
+    try:
+        with profiled(profile_path):
+            start = time.perf_counter()
+            result = func(*args)
+            stages.append(("extract", time.perf_counter() - start))
+        return result, stages
+    finally:
+        _local.stages = None
+
+
+def merge_stages(stages: List[Tuple[str, float]]) -> None:
+    if _metrics is not None:
+        _metrics.observe_many(stages)
+
+
+def sample_profile(label: str) -> Optional[str]:
+    """Output path when the installed profiler samples `label`, else None."""
+    if _metrics is None or _metrics.profiler is None:
+        return None
+    return _metrics.profiler.sample(label)
+
+
+@contextmanager
+def profiled(path: Optional[str]) -> Iterator[None]:
+    """Profile the block into `path` (.html: pyinstrument, anything else: cProfile stats)."""
+    if path is None:
+        yield
+        return
+    if path.endswith(".html") and pyinstrument is not None:
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+class ProfileSampler:
+    """Pick a random `rate` share of URLs to profile, one file per sampled URL.
+
+    `backend` is "cprofile" (.prof files for pstats/snakeviz) or "pyinstrument"
+    (.html reports, needs pyinstrument). Files go to `output_dir`.
+    """
+
+    def __init__(self, output_dir: str = "data/profiles", rate: float = 0.01, backend: str = "cprofile"):
+        if backend not in ("cprofile", "pyinstrument"):
+            raise ValueError(f"Unknown profiler backend: {backend}")
+        if backend == "pyinstrument" and pyinstrument is None:
+            raise ImportError("The pyinstrument backend requires pyinstrument: pip install pyinstrument")
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.rate = rate
+        self.extension = ".html" if backend == "pyinstrument" else ".prof"
+        self._counter = itertools.count()
+
+    def sample(self, label: str) -> Optional[str]:
+        if random.random() >= self.rate:
+            return None
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", label.rsplit("/", 1)[-1])[:80].strip("-")
+        return os.path.join(self.output_dir, f"{next(self._counter):06d}-{slug}{self.extension}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    metrics: CrawlMetrics
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = self.metrics.to_prometheus().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path == "/metrics.json":
+            body = json.dumps(self.metrics.snapshot()).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer:
+    """Serve `/metrics` (Prometheus text) and `/metrics.json` from a daemon thread."""
+
+    def __init__(self, metrics: CrawlMetrics, port: int = 9108, host: str = "127.0.0.1"):
+        handler = type("MetricsHandler", (_MetricsHandler,), {"metrics": metrics})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+        self.thread.start()
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class SnapshotWriter:
+    """Append a JSON `snapshot()` line to `path` every `interval` seconds, and once more on close."""
+
+    def __init__(self, metrics: CrawlMetrics, path: str, interval: float = 10.0):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="metrics-snapshots", daemon=True)
+        self.thread.start()
+
+    def _write(self) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.metrics.snapshot()) + "\n")
+
+    def _run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            self._write()
+
+    def close(self) -> None:
+        self.stopped.set()
+        self.thread.join()
+        self._write()
+
+
+def add_metrics_arguments(parser: argparse.ArgumentParser) -> None:
+    """The --metrics-* and --profile-rate options shared by main.py and main_qa.py."""
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics (JSON at /metrics.json)")
+    parser.add_argument("--metrics-json", help="append a JSON metrics snapshot to this file every --metrics-interval seconds")
+    parser.add_argument("--metrics-interval", type=float, default=10.0)
+    parser.add_argument("--profile-rate", type=float, default=0.0, help="cProfile this share of URLs into data/profiles")
+
+
+def start_metrics(args: argparse.Namespace) -> Tuple[Optional[CrawlMetrics], list]:
+    """The CrawlMetrics asked for on the command line (or None) and the reporters to close at exit."""
+    if args.metrics_port is None and args.metrics_json is None and not args.profile_rate:
+        return None, []
+    profiler = ProfileSampler("data/profiles", rate=args.profile_rate) if args.profile_rate else None
+    metrics = CrawlMetrics(profiler=profiler)
+    reporters = []
+    if args.metrics_port is not None:
+        reporters.append(MetricsServer(metrics, port=args.metrics_port))
+    if args.metrics_json is not None:
+        reporters.append(SnapshotWriter(metrics, args.metrics_json, interval=args.metrics_interval))
+    return metrics, reporters
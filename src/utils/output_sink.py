@@ -0,0 +1,170 @@
+import glob
+import gzip
+import io
+import json
+import os
+import re
+from threading import Lock
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_SUFFIX = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """Records of one JSONL file or shard, decompressed by its suffix.
+
+    Lines that do not parse and the truncated tail of a killed run are skipped.
+    """
+    if path.endswith(".gz"):
+        f = gzip.open(path, "rb")
+    elif path.endswith(".zst"):
+        if zstandard is None:
+            raise ImportError("zstd compression requires zstandard: pip install zstandard")
+        f = io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True))
+    else:
+        f = open(path, "rb")
+    with f:
+        try:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+        except EOFError:
+            return
+
+
+class JsonlSink:
+    """Append-only JSONL writer: one record per line, nothing kept in memory.
+
+    Without `max_records`/`max_bytes` everything is appended to `output_file`.
+    With either limit set, records roll over into numbered shards next to it
+    (`documents-00000.jsonl`, `documents-00001.jsonl`, ...); a restarted run
+    continues in a new shard instead of touching finished ones. `max_bytes`
+    counts uncompressed bytes. `compression` is None, "gzip" or "zstd".
+    """
+
+    def __init__(
+        self,
+        output_file: str,
+        max_records: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        compression: Optional[str] = None,
+    ):
+        if compression not in COMPRESSION_SUFFIX:
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("zstd compression requires zstandard: pip install zstandard")
+        self.output_file = output_file
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.lock = Lock()
+        self.total_records = 0
+        self._file = None
+        self._raw_file = None
+        self._shard_records = 0
+        self._shard_bytes = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+        root, ext = os.path.splitext(output_file)
+        self._root = root
+        self._ext = ext or ".jsonl"
+        self._shard_index = self._next_shard_index() if self.sharded else 0
+
+    @property
+    def sharded(self) -> bool:
+        return bool(self.max_records or self.max_bytes)
+
+    def _shard_path(self, index: int) -> str:
+        suffix = COMPRESSION_SUFFIX[self.compression]
+        if not self.sharded:
+            return self._root + self._ext + suffix
+        return f"{self._root}-{index:05d}{self._ext}{suffix}"
+
+    def _next_shard_index(self) -> int:
+        pattern = re.compile(re.escape(os.path.basename(self._root)) + r"-(\d{5})")
+        indexes = [
+            int(match.group(1))
+            for match in (pattern.match(os.path.basename(path)) for path in glob.glob(self._root + "-*"))
+            if match
+        ]
+        return max(indexes) + 1 if indexes else 0
+
+    def _open(self) -> None:
+        path = self._shard_path(self._shard_index)
+        if self.compression == "gzip":
+            self._file = gzip.open(path, "ab")
+        elif self.compression == "zstd":
+            self._raw_file = open(path, "ab")
+            self._file = zstandard.ZstdCompressor().stream_writer(self._raw_file)
+        else:
+            self._file = open(path, "ab")
+        self._shard_records = 0
+        self._shard_bytes = 0
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._raw_file is not None:
+            self._raw_file.close()
+            self._raw_file = None
+
+    def _should_roll(self) -> bool:
+        if self.max_records and self._shard_records >= self.max_records:
+            return True
+        if self.max_bytes and self._shard_bytes >= self.max_bytes:
+            return True
+        return False
+
+    def read_field(self, field: str) -> Iterator[Any]:
+        """`record[field]` of every record in this sink's file or shards, written by any run.
+
+        Meant to be called before writing; the truncated tail a killed run leaves
+        behind is skipped.
+        """
+        suffix = COMPRESSION_SUFFIX[self.compression]
+        if self.sharded:
+            paths = sorted(glob.glob(f"{glob.escape(self._root)}-[0-9][0-9][0-9][0-9][0-9]{self._ext}{suffix}"))
+        else:
+            paths = [self._shard_path(0)]
+        for path in paths:
+            if os.path.exists(path):
+                for record in iter_jsonl(path):
+                    yield record.get(field)
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """Serialize `record` as one line; the caller can drop it right after."""
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self.lock:
+            if self._file is None:
+                self._open()
+            elif self.sharded and self._should_roll():
+                self._close_file()
+                self._shard_index += 1
+                self._open()
+            self._file.write(line)
+            self._shard_records += 1
+            self._shard_bytes += len(line)
+            self.total_records += 1
+
+    def flush(self) -> None:
+        with self.lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self) -> None:
+        with self.lock:
+            self._close_file()
+
+    def __enter__(self) -> "JsonlSink":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,307 @@
+import datetime
+import glob
+import json
+import os
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+except ImportError:
+    pa = ds = pafs = None
+
+from .output_sink import iter_jsonl
+from .url_status import numeric_id
+
+# Records per record batch handed to the writer; a document with its HTML is ~100 KB
+BATCH_ROWS = 1000
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("Parquet export requires pyarrow: pip install pyarrow")
+
+
+def iter_json_array(path: str, chunk_size: int = 1 << 20) -> Iterator[Dict[str, Any]]:
+    """Records of a JSON array file (the old documents.json output) without loading it whole."""
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buffer, position = "", 0
+        while True:
+            chunk = f.read(chunk_size)
+            buffer = buffer[position:] + chunk
+            position = 0
+            while True:
+                # Skip the separators between records: whitespace, the commas and the brackets
+                while position < len(buffer) and buffer[position] in " \t\r\n,[]":
+                    position += 1
+                if position == len(buffer):
+                    break
+                try:
+                    record, position = decoder.raw_decode(buffer, position)
+                except ValueError:
+                    # The record runs past the end of the buffer
+                    if not chunk:
+                        raise
+                    break
+                yield record
+            if not chunk:
+                return
+
+
+def iter_records(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Records of JSONL files or shards (.jsonl, .gz, .zst) and of old .json array files."""
+    for path in paths:
+        if path.endswith(".json"):
+            yield from iter_json_array(path)
+        else:
+            yield from iter_jsonl(path)
+
+
+def default_inputs(directory: str) -> List[str]:
+    """Every crawl output under `directory`: documents.json and the (per-worker) JSONL shards."""
+    paths = sorted(glob.glob(os.path.join(directory, "documents*.jsonl*")))
+    legacy = os.path.join(directory, "documents.json")
+    return paths + [legacy] if os.path.exists(legacy) else paths
+
+
+def parse_date(value: Any) -> Optional[datetime.date]:
+    """A dd/mm/yyyy date as the site prints it; None for "Đang cập nhật" and the like."""
+    try:
+        day, month, year = str(value).strip().split("/")
+        return datetime.date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+
+
+def _scalar(value: Any) -> Optional[str]:
+    """First string of an attribute value, which the crawler wraps in (nested) lists; "" becomes None."""
+    while isinstance(value, (list, tuple)):
+        value = value[0] if value else None
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def document_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a document record: every attribute from modify_document_attribute becomes a typed column."""
+    attribute = record.get("attribute") or {}
+    issued_date = parse_date(attribute.get("issued_date"))
+    source_id = record.get("source_id")
+    duplicate_of = record.get("duplicate_of")
+    return {
+        "source_id": int(source_id) if str(source_id).isdigit() else None,
+        "source": record.get("source"),
+        "url": record.get("url"),
+        "title": record.get("title"),
+        "official_number": _scalar(attribute.get("official_number")),
+        "document_info": _scalar(attribute.get("document_info")),
+        "document_status": _scalar(attribute.get("document_status")),
+        "place_issue": _scalar(attribute.get("place_issue")),
+        "signer": _scalar(attribute.get("signer")),
+        "document_field": _scalar(attribute.get("document_field")),
+        "gazette_number": _scalar(attribute.get("gazette_number")),
+        "issued_date": issued_date,
+        "effective_date": parse_date(attribute.get("effective_date")),
+        "enforced_date": parse_date(attribute.get("enforced_date")),
+        "note": _scalar(attribute.get("note")),
+        # Set on reference records, which carry no text, and on near duplicates, which keep theirs (see DocumentCrawler's dedup)
+        "duplicate_of": int(duplicate_of) if str(duplicate_of).isdigit() else None,
+        "similarity": record.get("similarity"),
+        "full_text": record.get("full_text"),
+        "html_text": record.get("html_text"),
+        "document_type": _scalar(attribute.get("document_type")),
+        "year": issued_date.year if issued_date else None,
+    }
+
+
+def qa_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a Q&A record; the metadata fields become columns."""
+    metadata = record.get("metadata") or {}
+    url = record.get("urls")
+    date_published = parse_date(metadata.get("date_published"))
+    return {
+        "source_id": numeric_id(url) if url else None,
+        "url": url,
+        "title": record.get("title"),
+        "keyword": [keyword for keyword in record.get("keyword") or [] if keyword],
+        "author": metadata.get("author") or None,
+        "date_published": date_published,
+        "time_published": metadata.get("time_published"),
+        "year": date_published.year if date_published else None,
+        "introduction": record.get("introduction"),
+        "content": record.get("content") or [],
+        "type": metadata.get("type"),
+    }
+
+
+class ExportKind(NamedTuple):
+    row: Callable[[Dict[str, Any]], Dict[str, Any]]
+    schema: Callable[[], "pa.Schema"]
+    # Hive partition columns, and the column groups written as separate datasets
+    # (each also holds the key and partition columns, so they line up)
+    partitions: List[str]
+    keys: List[str]
+    groups: Dict[str, List[str]]
+
+
+def document_schema() -> "pa.Schema":
+    return pa.schema([
+        ("source_id", pa.int64()),
+        ("source", pa.string()),
+        ("url", pa.string()),
+        ("title", pa.string()),
+        ("official_number", pa.string()),
+        ("document_info", pa.string()),
+        ("document_status", pa.string()),
+        ("place_issue", pa.string()),
+        ("signer", pa.string()),
+        ("document_field", pa.string()),
+        ("gazette_number", pa.string()),
+        ("issued_date", pa.date32()),
+        ("effective_date", pa.date32()),
+        ("enforced_date", pa.date32()),
+        ("note", pa.string()),
+        ("duplicate_of", pa.int64()),
+        ("similarity", pa.float64()),
+        ("full_text", pa.large_string()),
+        ("html_text", pa.large_string()),
+        ("document_type", pa.string()),
+        ("year", pa.int16()),
+    ])
+
+
+def qa_schema() -> "pa.Schema":
+    return pa.schema([
+        ("source_id", pa.int64()),
+        ("url", pa.string()),
+        ("title", pa.string()),
+        ("keyword", pa.list_(pa.string())),
+        ("author", pa.string()),
+        ("date_published", pa.date32()),
+        ("time_published", pa.string()),
+        ("year", pa.int16()),
+        ("introduction", pa.string()),
+        ("content", pa.list_(pa.struct([("sub_title", pa.string()), ("sub_content", pa.large_string())]))),
+        ("type", pa.string()),
+    ])
+
+
+KINDS = {
+    "documents": ExportKind(
+        document_row,
+        document_schema,
+        partitions=["document_type", "year"],
+        keys=["source_id", "url"],
+        groups={
+            "meta": [
+                "source", "title", "official_number", "document_info", "document_status", "place_issue",
+                "signer", "document_field", "gazette_number", "issued_date", "effective_date", "enforced_date", "note",
+                "duplicate_of", "similarity",
+            ],
+            "text": ["full_text", "html_text"],
+        },
+    ),
+    "qa": ExportKind(
+        qa_row,
+        qa_schema,
+        partitions=["type"],
+        keys=["source_id", "url"],
+        groups={
+            "meta": ["title", "keyword", "author", "date_published", "time_published", "year"],
+            "text": ["introduction", "content"],
+        },
+    ),
+}
+
+
+def group_schema(kind: str, group: str) -> "pa.Schema":
+    spec = KINDS[kind]
+    schema = spec.schema()
+    return pa.schema([schema.field(name) for name in spec.keys + spec.groups[group] + spec.partitions])
+
+
+def _partitioning(kind: str) -> "ds.Partitioning":
+    schema = KINDS[kind].schema()
+    return ds.partitioning(pa.schema([schema.field(name) for name in KINDS[kind].partitions]), flavor="hive")
+
+
+def export_parquet(
+    paths: Iterable[str],
+    output_dir: str,
+    kind: str = "documents",
+    batch_rows: int = BATCH_ROWS,
+    max_rows_per_file: int = 100000,
+    compression: str = "zstd",
+) -> int:
+    """Write the records in `paths` as partitioned Parquet under `output_dir`; returns the row count.
+
+    `kind` is "documents" (partitioned by document_type and the issued year) or
+    "qa" (by the Q&A type). Each column group is its own dataset,
+    `output_dir/meta` and `output_dir/text`, with the same partitions and row
+    order, so reading the metadata never touches a page of the text columns.
+    The input is streamed once per group and nothing but one batch is held in
+    memory; partitions written before are replaced.
+    """
+    _require_pyarrow()
+    spec = KINDS[kind]
+    paths = list(paths)
+    rows = 0
+    for group in spec.groups:
+        schema = group_schema(kind, group)
+        written = 0
+
+        def batches():
+            nonlocal written
+            batch = []
+            for record in iter_records(paths):
+                batch.append(spec.row(record))
+                if len(batch) >= batch_rows:
+                    written += len(batch)
+                    yield pa.RecordBatch.from_pylist(batch, schema=schema)
+                    batch = []
+            if batch:
+                written += len(batch)
+                yield pa.RecordBatch.from_pylist(batch, schema=schema)
+
+        ds.write_dataset(
+            batches(),
+            os.path.join(output_dir, group),
+            schema=schema,
+            format="parquet",
+            partitioning=_partitioning(kind),
+            basename_template="part-{i}.parquet",
+            existing_data_behavior="delete_matching",
+            # Keeps the groups in the same row order; a type/year partition per document type and year
+            preserve_order=True,
+            max_partitions=10000,
+            max_rows_per_file=max_rows_per_file,
+            max_rows_per_group=min(max_rows_per_file, 64 * 1024),
+            file_options=ds.ParquetFileFormat().make_write_options(compression=compression),
+        )
+        rows = written
+    return rows
+
+
+def read_export(
+    output_dir: str,
+    kind: str = "documents",
+    group: str = "meta",
+    columns: Optional[List[str]] = None,
+    filter: Optional["ds.Expression"] = None,
+) -> "pa.Table":
+    """Read `columns` of one column group of an export, memory-mapped.
+
+    `filter` (e.g. `ds.field("year") >= 2020`) prunes whole partitions before
+    any file is opened.
+    """
+    _require_pyarrow()
+    dataset = ds.dataset(
+        os.path.join(output_dir, group),
+        format="parquet",
+        partitioning=_partitioning(kind),
+        filesystem=pafs.LocalFileSystem(use_mmap=True),
+    )
+    return dataset.to_table(columns=columns, filter=filter)
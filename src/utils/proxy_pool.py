@@ -0,0 +1,137 @@
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .http_client import fetch
+
+# Get the absolute path to the project root directory
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+PROXY_LIST_PATH = os.path.join(PROJECT_ROOT, 'config', 'proxy_list.txt')
+PROXY_URL = 'https://api.proxyscrape.com/v2/?request=displayproxies&protocol=http&timeout=10000&country=all&ssl=all&anonymity=all'
+
+
+def create_proxy_list():
+    proxy_list = fetch(PROXY_URL, use_proxy=False)
+    os.makedirs(os.path.dirname(PROXY_LIST_PATH), exist_ok=True)
+    with open(PROXY_LIST_PATH, 'w') as f:
+        f.write(proxy_list.text.replace('\r\n', '\n'))
+
+
+class ProxyStats:
+    """Health of one proxy: EWMA success rate and latency, plus failure cooldown."""
+
+    def __init__(self):
+        self.success_rate = 1.0
+        self.latency = 1.0
+        self.failures = 0
+        self.cooldown_until = 0.0
+
+    @property
+    def weight(self) -> float:
+        return max(self.success_rate, 0.01) / (1.0 + self.latency)
+
+
+class ProxyPool:
+    """In-memory proxy pool with health scoring, cooldowns and per-host affinity.
+
+    The proxy list is read once and then refreshed in a background thread every
+    `refresh_interval` seconds. Proxies are picked at random weighted by their
+    score; a host keeps using the same proxy while it stays healthy. After a
+    failure a proxy sits out `cooldown * 2 ** (failures - 1)` seconds.
+    """
+
+    def __init__(
+        self,
+        path: str = PROXY_LIST_PATH,
+        refresh_interval: float = 600.0,
+        cooldown: float = 30.0,
+        max_cooldown: float = 600.0,
+        smoothing: float = 0.3,
+    ):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.smoothing = smoothing
+        self.lock = threading.Lock()
+        self.stats: Dict[str, ProxyStats] = {}
+        self.affinity: Dict[str, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.load()
+
+    @staticmethod
+    def _normalize(proxy: str) -> str:
+        proxy = proxy.strip()
+        return proxy if "://" in proxy else "http://" + proxy
+
+    def load(self) -> None:
+        """(Re)read the proxy list, keeping the stats of proxies still listed."""
+        if not os.path.exists(self.path):
+            create_proxy_list()
+        with open(self.path, 'r') as f:
+            proxies = [self._normalize(line) for line in f if line.strip()]
+        with self.lock:
+            self.stats = {proxy: self.stats.get(proxy) or ProxyStats() for proxy in proxies}
+            self.affinity = {host: proxy for host, proxy in self.affinity.items() if proxy in self.stats}
+
+    def start_refresh(self) -> None:
+        """Refresh the list from the proxy API in a daemon thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._refresh_loop, name="proxy-pool-refresh", daemon=True)
+        self._thread.start()
+
+    def stop_refresh(self) -> None:
+        self._stop.set()
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                create_proxy_list()
+                self.load()
+            except Exception as e:
+                print(f"Error refreshing proxy list: {str(e)}")
+
+    def _available(self, now: float) -> List[str]:
+        return [proxy for proxy, stats in self.stats.items() if stats.cooldown_until <= now]
+
+    def choose(self, host: Optional[str] = None) -> Optional[str]:
+        """Pick a proxy for `host`, or None when every proxy is cooling down."""
+        now = time.monotonic()
+        with self.lock:
+            proxy = self.affinity.get(host)
+            if proxy is not None and self.stats[proxy].cooldown_until <= now:
+                return proxy
+            available = self._available(now)
+            if not available:
+                return None
+            proxy = random.choices(available, weights=[self.stats[p].weight for p in available])[0]
+            if host is not None:
+                self.affinity[host] = proxy
+            return proxy
+
+    def report_success(self, proxy: str, latency: float) -> None:
+        with self.lock:
+            stats = self.stats.get(proxy)
+            if stats is None:
+                return
+            stats.success_rate += self.smoothing * (1.0 - stats.success_rate)
+            stats.latency += self.smoothing * (latency - stats.latency)
+            stats.failures = 0
+
+    def report_failure(self, proxy: str) -> None:
+        with self.lock:
+            stats = self.stats.get(proxy)
+            if stats is None:
+                return
+            stats.success_rate -= self.smoothing * stats.success_rate
+            stats.failures += 1
+            stats.cooldown_until = time.monotonic() + min(self.max_cooldown, self.cooldown * 2 ** (stats.failures - 1))
+            for host in [host for host, p in self.affinity.items() if p == proxy]:
+                del self.affinity[host]
+
+    def __len__(self) -> int:
+        return len(self.stats)
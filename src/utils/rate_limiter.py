@@ -0,0 +1,219 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from urllib.parse import urlsplit
+
+# Status codes that mean the site wants us to slow down
+THROTTLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter for retry number `attempt` (0-based)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def set_rate(self, rate: float) -> None:
+        with self.lock:
+            self._refill()
+            self.rate = rate
+            self.burst = max(1.0, rate)
+            self.tokens = min(self.tokens, self.burst)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self) -> float:
+        """Take one token and return how long the caller must wait before using it."""
+        with self.lock:
+            self._refill()
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def acquire(self) -> None:
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+
+class AIMDController:
+    """Additive-increase/multiplicative-decrease control of a limit.
+
+    The limit grows by `increase` after every `window` healthy responses (fast
+    enough and not throttled) and is multiplied by `decrease` on a throttle
+    signal, at most once per `cooldown` seconds so a burst of simultaneous
+    failures counts as one congestion event.
+    """
+
+    def __init__(
+        self,
+        initial: float,
+        minimum: float,
+        maximum: float,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+        target_latency: float = 2.0,
+        window: int = 20,
+        cooldown: float = 2.0,
+    ):
+        self.value = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.target_latency = target_latency
+        self.window = window
+        self.cooldown = cooldown
+        self._healthy = 0
+        self._last_decrease = 0.0
+        self.lock = threading.Lock()
+
+    def on_success(self, latency: float) -> float:
+        with self.lock:
+            if latency <= self.target_latency:
+                self._healthy += 1
+                if self._healthy >= self.window:
+                    self._healthy = 0
+                    self.value = min(self.maximum, self.value + self.increase)
+            return self.value
+
+    def on_throttle(self) -> float:
+        with self.lock:
+            self._healthy = 0
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self._last_decrease = now
+                self.value = max(self.minimum, self.value * self.decrease)
+            return self.value
+
+    def set_maximum(self, maximum: float) -> float:
+        """Lower or raise the ceiling; the limit is clamped to it right away."""
+        with self.lock:
+            self.maximum = maximum
+            self.minimum = min(self.minimum, maximum)
+            self.value = min(self.value, maximum)
+            return self.value
+
+
+class HostLimiter:
+    """Politeness budget of one host: adaptive request rate plus adaptive concurrency."""
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        max_rate: float = 200.0,
+        concurrency: int = 16,
+        max_concurrency: int = 256,
+        target_latency: float = 2.0,
+    ):
+        self.bucket = TokenBucket(rate)
+        self.rate = AIMDController(rate, min(1.0, max_rate), max_rate, increase=1.0, target_latency=target_latency)
+        self.concurrency = AIMDController(concurrency, 1, max_concurrency, increase=1, target_latency=target_latency)
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold one of the host's concurrent request slots, then wait for a token."""
+        with self.condition:
+            while self.in_flight >= int(self.concurrency.value):
+                self.condition.wait()
+            self.in_flight += 1
+        try:
+            self.bucket.acquire()
+            yield
+        finally:
+            self.leave()
+
+    def try_enter(self) -> bool:
+        """Non-blocking `slot()` entry for event-loop callers; pair with `leave()`."""
+        with self.condition:
+            if self.in_flight >= int(self.concurrency.value):
+                return False
+            self.in_flight += 1
+            return True
+
+    def leave(self) -> None:
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def record_success(self, latency: float) -> None:
+        self.bucket.set_rate(self.rate.on_success(latency))
+        self.concurrency.on_success(latency)
+        with self.condition:
+            self.condition.notify_all()
+
+    def record_throttle(self) -> None:
+        self.bucket.set_rate(self.rate.on_throttle())
+        self.concurrency.on_throttle()
+
+    def cap(self, rate: float, concurrency: Optional[int] = None) -> None:
+        """Keep the adaptive rate (and concurrency) at or below these ceilings."""
+        self.bucket.set_rate(self.rate.set_maximum(rate))
+        if concurrency is not None:
+            self.concurrency.set_maximum(max(1, concurrency))
+        with self.condition:
+            self.condition.notify_all()
+
+
+_limiters: Dict[str, HostLimiter] = {}
+_limiter_settings: Dict[str, float] = {}
+_limiters_lock = threading.Lock()
+
+
+def configure_rate_limit(**settings) -> None:
+    """Set the HostLimiter arguments used for hosts seen from now on."""
+    with _limiters_lock:
+        _limiter_settings.update(settings)
+        _limiters.clear()
+
+
+def cap_rate_limit(rate: float, concurrency: Optional[int] = None) -> None:
+    """Cap the rate (and concurrency) of every host, the ones already seen included.
+
+    Unlike `configure_rate_limit` the existing limiters keep their adapted state
+    and in-flight requests, so a worker can move its share of a shared budget
+    while it crawls.
+    """
+    with _limiters_lock:
+        _limiter_settings["rate"] = min(_limiter_settings.get("rate", 10.0), rate)
+        _limiter_settings["max_rate"] = rate
+        if concurrency is not None:
+            _limiter_settings["concurrency"] = min(_limiter_settings.get("concurrency", 16), max(1, concurrency))
+            _limiter_settings["max_concurrency"] = max(1, concurrency)
+        limiters = list(_limiters.values())
+    for limiter in limiters:
+        limiter.cap(rate, concurrency)
+
+
+def get_host_limiter(url: str) -> HostLimiter:
+    host = urlsplit(url).netloc
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = _limiters[host] = HostLimiter(**_limiter_settings)
+        return limiter
+
+
+def retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header given in seconds (HTTP dates are ignored)."""
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
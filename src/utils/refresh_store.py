@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from itertools import islice
+from threading import Lock
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from .frontier import frontier_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS refresh (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    luocdo_etag TEXT,
+    luocdo_last_modified TEXT,
+    page_hash TEXT,
+    luocdo_hash TEXT,
+    record_hash TEXT,
+    sitemap_lastmod TEXT,
+    checked_lastmod TEXT,
+    checked_at REAL,
+    changed_at REAL
+);
+"""
+
+
+def content_hash(content: Optional[bytes]) -> Optional[str]:
+    if content is None:
+        return None
+    return hashlib.sha1(content).hexdigest()
+
+
+def record_hash(doc: Dict[str, Any]) -> str:
+    """Hash of the extracted parts of a document that matter downstream."""
+    payload = json.dumps({"html_text": doc["html_text"], "attribute": doc["attribute"]}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+# Added after the first release; stores created before get them on open
+LUOCDO_COLUMNS = {"luocdo_etag": "TEXT", "luocdo_last_modified": "TEXT"}
+
+
+class RefreshStore:
+    """Per-document validators for incremental re-crawls.
+
+    Keeps the ETag/Last-Modified of the document page and of its LoadLuocDo
+    response, hashes of the raw page
+    and LoadLuocDo bodies, a hash of the extracted record, and the sitemap
+    `<lastmod>` both as last seen and as of the last check. May share the
+    SQLite file of the frontier.
+    """
+
+    def __init__(self, db_path: str = "data/frontier.sqlite3", journal_mode: str = "WAL"):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.lock = Lock()
+        # Shared with the frontier, which worker processes may be writing at the same time
+        self.conn = sqlite3.connect(db_path, timeout=60, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        with self.conn:
+            columns = {row[1] for row in self.conn.execute("PRAGMA table_info(refresh)")}
+            for name, kind in LUOCDO_COLUMNS.items():
+                if name not in columns:
+                    self.conn.execute(f"ALTER TABLE refresh ADD COLUMN {name} {kind}")
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM refresh WHERE key = ?", (frontier_key(url),)).fetchone()
+        return dict(row) if row else None
+
+    def conditional_headers(self, state: Optional[Dict[str, Any]], luocdo: bool = False) -> Dict[str, str]:
+        """If-None-Match/If-Modified-Since headers for a conditional GET of the page (or of its LoadLuocDo)."""
+        prefix = "luocdo_" if luocdo else ""
+        headers = {}
+        if state and state[prefix + "etag"]:
+            headers["If-None-Match"] = state[prefix + "etag"]
+        if state and state[prefix + "last_modified"]:
+            headers["If-Modified-Since"] = state[prefix + "last_modified"]
+        return headers
+
+    def record_sitemap_lastmod(self, pairs: Iterable[Tuple[str, Optional[str]]], chunk_size: int = 10000) -> None:
+        """Remember the sitemap `<lastmod>` of each URL."""
+        pairs = iter(pairs)
+        while True:
+            chunk = [(frontier_key(url), url, lastmod) for url, lastmod in islice(pairs, chunk_size)]
+            if not chunk:
+                return
+            with self.lock, self.conn:
+                self.conn.executemany(
+                    "INSERT INTO refresh (key, url, sitemap_lastmod) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET sitemap_lastmod = excluded.sitemap_lastmod",
+                    chunk,
+                )
+
+    def iter_stale(self, chunk_size: int = 10000) -> Iterator[str]:
+        """URLs never checked, without a sitemap lastmod, or whose lastmod moved since the last check."""
+        last_rowid = 0
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT rowid, url FROM refresh WHERE rowid > ? AND (checked_at IS NULL OR sitemap_lastmod IS NULL "
+                    "OR checked_lastmod IS NULL OR sitemap_lastmod != checked_lastmod) ORDER BY rowid LIMIT ?",
+                    (last_rowid, chunk_size),
+                ).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1]["rowid"]
+            for row in rows:
+                yield row["url"]
+
+    def touch(self, url: str) -> None:
+        """Mark a document as checked and unchanged."""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE refresh SET checked_at = ?, checked_lastmod = sitemap_lastmod WHERE key = ?",
+                (time.time(), frontier_key(url)),
+            )
+
+    def update(self, url: str, **fields: Any) -> None:
+        """Store new validators/hashes for a checked document."""
+        now = time.time()
+        fields.update(checked_at=now)
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO refresh (key, url) VALUES (?, ?)", (frontier_key(url), url))
+            self.conn.execute(
+                f"UPDATE refresh SET {columns}, checked_lastmod = sitemap_lastmod WHERE key = ?",
+                (*fields.values(), frontier_key(url)),
+            )
+
+    def forget(self, urls: Iterable[str]) -> None:
+        """Drop the validators and hashes of `urls`, so their next check fetches and emits them in full."""
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE refresh SET etag = NULL, last_modified = NULL, luocdo_etag = NULL, luocdo_last_modified = NULL, "
+                "page_hash = NULL, luocdo_hash = NULL, record_hash = NULL WHERE key = ?",
+                [(frontier_key(url),) for url in urls],
+            )
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,189 @@
+import glob
+import gzip
+import os
+import re
+import sqlite3
+import time
+import uuid
+from threading import Lock
+from typing import Dict, Iterator, NamedTuple, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    shard TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    status INTEGER NOT NULL,
+    fetched_at REAL NOT NULL
+);
+"""
+
+WARC_VERSION = "WARC/1.1"
+
+
+class ArchivedResponse(NamedTuple):
+    url: str
+    status: int
+    reason: str
+    headers: Dict[str, str]
+    content: bytes
+
+
+def _http_block(status: int, reason: str, headers: Dict[str, str], content: bytes) -> bytes:
+    lines = [f"HTTP/1.1 {status} {reason}"]
+    # The body is stored decoded, so transfer/content encodings no longer apply
+    lines.extend(
+        f"{name}: {value}" for name, value in headers.items()
+        if name.lower() not in ("content-encoding", "transfer-encoding", "content-length")
+    )
+    lines.append(f"Content-Length: {len(content)}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8") + content
+
+
+def _parse_headers(block: bytes) -> Dict[str, str]:
+    headers = {}
+    for line in block.decode("utf-8").split("\r\n"):
+        name, _, value = line.partition(":")
+        headers[name.strip()] = value.strip()
+    return headers
+
+
+class ResponseArchive:
+    """Append-only WARC archive of raw responses with a URL -> offset index.
+
+    Every response is written as a WARC/1.1 `response` record (one gzip member per
+    record, as in .warc.gz files) to rolling shards of at most `max_bytes`; the
+    SQLite index next to them maps each URL to its latest record, so `get` is a
+    single seek and read. Shards are standard WARC files readable by other tools.
+
+    Shards are named `{name}-NNNNN.warc.gz`. Processes sharing a directory
+    (crawl workers) must each use their own `name`: the offsets indexed are
+    those of the process's own appends.
+    """
+
+    def __init__(
+        self,
+        directory: str = "data/archive",
+        max_bytes: int = 1 << 30,
+        compression: Optional[str] = "gzip",
+        name: str = "archive",
+    ):
+        if compression not in (None, "gzip"):
+            raise ValueError(f"Unknown compression: {compression}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.name = name
+        self.lock = Lock()
+        # Shared by the workers archiving into the same directory
+        self.conn = sqlite3.connect(os.path.join(directory, "index.sqlite3"), timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._file = None
+        self._shard = None
+        self._shard_index = self._next_shard_index()
+
+    @property
+    def _extension(self) -> str:
+        return ".warc.gz" if self.compression == "gzip" else ".warc"
+
+    def _next_shard_index(self) -> int:
+        pattern = re.compile(re.escape(self.name) + r"-(\d+)\.warc(\.gz)?$")
+        paths = glob.glob(os.path.join(glob.escape(self.directory), glob.escape(self.name) + "-*"))
+        indexes = [int(m.group(1)) for m in (pattern.match(os.path.basename(path)) for path in paths) if m]
+        return max(indexes) + 1 if indexes else 0
+
+    def _open(self) -> None:
+        self._shard = f"{self.name}-{self._shard_index:05d}{self._extension}"
+        self._file = open(os.path.join(self.directory, self._shard), "ab")
+        self._shard_index += 1
+
+    def append(self, url: str, status: int, reason: str, headers: Dict[str, str], content: bytes) -> None:
+        """Archive one response; a later record for the same URL replaces it in the index."""
+        block = _http_block(status, reason, headers, content)
+        warc_headers = (
+            f"{WARC_VERSION}\r\n"
+            "WARC-Type: response\r\n"
+            f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n"
+            f"WARC-Date: {time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}\r\n"
+            f"WARC-Target-URI: {url}\r\n"
+            "Content-Type: application/http;msgtype=response\r\n"
+            f"Content-Length: {len(block)}\r\n\r\n"
+        ).encode("utf-8")
+        record = warc_headers + block + b"\r\n\r\n"
+        if self.compression == "gzip":
+            record = gzip.compress(record, compresslevel=6)
+
+        with self.lock:
+            if self._file is None or (self._file.tell() and self._file.tell() + len(record) > self.max_bytes):
+                if self._file is not None:
+                    self._file.close()
+                self._open()
+            offset = self._file.tell()
+            self._file.write(record)
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO responses (url, shard, offset, length, status, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (url, self._shard, offset, len(record), status, time.time()),
+                )
+
+    def get(self, url: str) -> Optional[ArchivedResponse]:
+        """Latest archived response for `url`, or None when it was never archived."""
+        with self.lock:
+            row = self.conn.execute("SELECT shard, offset, length FROM responses WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                return None
+            shard, offset, length = row
+            if shard == self._shard:
+                self._file.flush()
+        with open(os.path.join(self.directory, shard), "rb") as f:
+            f.seek(offset)
+            record = f.read(length)
+        if shard.endswith(".gz"):
+            record = gzip.decompress(record)
+
+        _, _, block = record.partition(b"\r\n\r\n")
+        head, _, content = block.partition(b"\r\n\r\n")
+        status_line, _, header_lines = head.partition(b"\r\n")
+        _, status, reason = status_line.decode("utf-8").split(" ", 2)
+        headers = _parse_headers(header_lines) if header_lines else {}
+        content = content[:int(headers.get("Content-Length", len(content)))]
+        return ArchivedResponse(url, int(status), reason, headers, content)
+
+    def get_content(self, url: str) -> Optional[bytes]:
+        response = self.get(url)
+        return response.content if response is not None else None
+
+    def iter_urls(self, contains: Optional[str] = None, chunk_size: int = 10000) -> Iterator[str]:
+        """Archived URLs (optionally only those containing `contains`), streamed in index order."""
+        last_rowid = 0
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT rowid, url FROM responses WHERE rowid > ? AND instr(url, ?) > 0 ORDER BY rowid LIMIT ?",
+                    (last_rowid, contains or "", chunk_size),
+                ).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            for _, url in rows:
+                yield url
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def flush(self) -> None:
+        with self.lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self) -> None:
+        with self.lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self.conn.close()
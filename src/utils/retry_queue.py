@@ -0,0 +1,243 @@
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Condition, Lock, Thread
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import requests
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from .metrics import count
+
+# Failure kinds
+TRANSPORT = "transport"  # dropped or refused connection, timeout, 5xx
+THROTTLE = "throttle"  # 429/503 still coming back after the client's own retries
+PARSE = "parse"  # a body came back but no record could be built from it (None soup, extractor error)
+LOGIN = "login"  # login-gated or download-only page, 401/403
+NOT_FOUND = "not_found"  # 404/410
+HTTP = "http"  # any other 4xx
+
+# Retries allowed per failure kind; the other kinds are never retried
+RETRY_LIMITS = {TRANSPORT: 4, THROTTLE: 6, PARSE: 1}
+
+TRANSPORT_ERRORS = (requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError, asyncio.TimeoutError)
+if aiohttp is not None:
+    TRANSPORT_ERRORS += (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)
+
+
+class Failure(NamedTuple):
+    """Why a URL failed; crawlers return it where they used to return None, and it is falsy like None."""
+    kind: str
+    error: str = ""
+
+    def __bool__(self) -> bool:
+        return False
+
+
+def classify_status(status: int) -> str:
+    if status in (429, 503):
+        return THROTTLE
+    if status >= 500:
+        return TRANSPORT
+    if status in (404, 410):
+        return NOT_FOUND
+    if status in (401, 403):
+        return LOGIN
+    return HTTP
+
+
+def classify_error(error: BaseException) -> str:
+    """Failure kind of an exception raised while fetching or extracting a page."""
+    # requests.HTTPError carries the response, aiohttp.ClientResponseError the status
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is None:
+        status = getattr(error, "status", None)
+    if isinstance(status, int):
+        return classify_status(status)
+    if isinstance(error, TRANSPORT_ERRORS):
+        return TRANSPORT
+    return PARSE
+
+
+def failure(error: BaseException) -> Failure:
+    return Failure(classify_error(error), f"{type(error).__name__}: {error}")
+
+
+def as_failure(result: Any) -> Failure:
+    """The Failure behind a falsy crawl result; a bare None means nothing could be built."""
+    return result if isinstance(result, Failure) else Failure(PARSE, "no record")
+
+
+class RetryQueue:
+    """Re-runs failed URLs in the background with jittered exponential backoff.
+
+    Only the kinds in `limits` are retried, each at most that many times, on
+    `concurrency` threads of their own, so the tail of failures drains while the
+    crawl runs without taking its workers. Every failure and recovery is
+    appended to the JSONL log at `log_path` with its attempt number, and
+    `resume` reads back what a previous run left waiting for a retry.
+    """
+
+    def __init__(
+        self,
+        log_path: str = "data/failures.jsonl",
+        concurrency: int = 2,
+        base_delay: float = 2.0,
+        max_delay: float = 120.0,
+        limits: Optional[Dict[str, int]] = None,
+    ):
+        os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+        self.log_path = log_path
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limits = RETRY_LIMITS if limits is None else limits
+        # Failed attempts of the keys that are waiting for (or running) a retry
+        self.attempts: Dict[str, int] = {}
+        self.scheduled = []
+        self.running = 0
+        self.recovered = 0
+        self.given_up = 0
+        self.condition = Condition()
+        self._sequence = itertools.count()
+        self._closed = False
+        self._log_lock = Lock()
+        self._log_file = open(log_path, "a", encoding="utf-8")
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="retry")
+        self._dispatcher = Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def delay(self, kind: str, attempt: int) -> float:
+        """Seconds before retry number `attempt` (1-based); a throttled host gets three times longer."""
+        base = self.base_delay * (3 if kind == THROTTLE else 1)
+        return min(self.max_delay, base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+    def fail(self, key: str, result: Any, retry: Callable[[], None], stage: str = "", payload: Any = None) -> bool:
+        """Record a failed attempt at `key` and schedule `retry()` if its kind allows another one.
+
+        `retry` repeats the attempt and reports it again through `fail` or
+        `succeed`. Returns whether a retry was scheduled; when not, `key` has
+        failed for good. `payload` is logged so `resume` can rebuild the work item.
+        """
+        failed = as_failure(result)
+        with self.condition:
+            attempt = self.attempts.get(key, 0) + 1
+            retrying = attempt <= self.limits.get(failed.kind, 0) and not self._closed
+            delay = self.delay(failed.kind, attempt) if retrying else None
+            if retrying:
+                self.attempts[key] = attempt
+                heapq.heappush(self.scheduled, (time.monotonic() + delay, next(self._sequence), key, retry, stage, payload))
+                self.condition.notify_all()
+            else:
+                self.attempts.pop(key, None)
+                self.given_up += 1
+        self._log({
+            "url": key,
+            "stage": stage,
+            "kind": failed.kind,
+            "error": failed.error,
+            "attempt": attempt,
+            "retry_in": round(delay, 2) if retrying else None,
+            "final": not retrying,
+            "payload": payload,
+        })
+        count("retries_total", kind=failed.kind, outcome="scheduled" if retrying else "given_up")
+        return retrying
+
+    def succeed(self, key: str, stage: str = "") -> None:
+        """Record that `key` worked; logged only when it had failed before."""
+        with self.condition:
+            attempt = self.attempts.pop(key, None)
+            if attempt is None:
+                return
+            self.recovered += 1
+        self._log({"url": key, "stage": stage, "kind": "ok", "attempt": attempt + 1, "final": True})
+        count("retries_total", kind="ok", outcome="recovered")
+
+    def _log(self, entry: Dict[str, Any]) -> None:
+        entry["time"] = round(time.time(), 3)
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._log_lock:
+            if not self._log_file.closed:
+                self._log_file.write(line)
+                self._log_file.flush()
+
+    def _dispatch(self) -> None:
+        while True:
+            with self.condition:
+                while True:
+                    if self.scheduled:
+                        wait = self.scheduled[0][0] - time.monotonic()
+                        if wait <= 0:
+                            break
+                        self.condition.wait(wait)
+                    elif self._closed:
+                        return
+                    else:
+                        self.condition.wait()
+                _, _, key, retry, stage, payload = heapq.heappop(self.scheduled)
+                self.running += 1
+            self.executor.submit(self._run, key, retry, stage, payload)
+
+    def _run(self, key: str, retry: Callable[[], None], stage: str, payload: Any) -> None:
+        try:
+            retry()
+        except Exception as e:
+            self.fail(key, failure(e), retry, stage, payload)
+        finally:
+            with self.condition:
+                self.running -= 1
+                self.condition.notify_all()
+
+    def drain(self) -> None:
+        """Block until no retry is scheduled or running."""
+        with self.condition:
+            self.condition.wait_for(lambda: not self.scheduled and not self.running)
+
+    def resume(self, stage: str = "") -> List[Dict[str, Any]]:
+        """Log entries of the `stage` keys the log leaves waiting for a retry (a previous run stopped first).
+
+        Their attempt counts carry over, so a key is not retried more often than
+        its limit across runs.
+        """
+        last = {}
+        with self._log_lock:
+            self._log_file.flush()
+            with open(self.log_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get("stage", "") == stage:
+                        last[entry["url"]] = entry
+        pending = [entry for entry in last.values() if not entry["final"]]
+        with self.condition:
+            for entry in pending:
+                self.attempts[entry["url"]] = entry["attempt"]
+        return pending
+
+    def close(self) -> None:
+        """Drain the queue, then stop its threads and close the log."""
+        self.drain()
+        with self.condition:
+            self._closed = True
+            self.condition.notify_all()
+        self._dispatcher.join()
+        self.executor.shutdown(wait=True)
+        with self._log_lock:
+            self._log_file.close()
+
+    def __enter__(self) -> "RetryQueue":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import Any, Dict, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS topic_walk (
+    topic_url TEXT PRIMARY KEY,
+    complete INTEGER NOT NULL DEFAULT 0,
+    last_page INTEGER,
+    started_at REAL,
+    finished_at REAL
+);
+"""
+
+
+class TopicWalks:
+    """Whether the last walk of each Q&A topic got to its end.
+
+    A walk is marked in progress when it starts and complete only when it ends
+    at the topic's last page (or at pages an earlier complete walk covered)
+    with every listing page loaded. A killed run or a failed page leaves it
+    incomplete, so the next walk of that topic goes all the way again. May
+    share the SQLite file of the frontier.
+    """
+
+    def __init__(self, db_path: str = "data/qa/topics.sqlite3", journal_mode: str = "WAL"):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.db_path = db_path
+        self.lock = Lock()
+        self.conn = sqlite3.connect(db_path, timeout=60, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def get(self, topic_url: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM topic_walk WHERE topic_url = ?", (topic_url,)).fetchone()
+        return dict(row) if row else None
+
+    def begin(self, topic_url: str) -> bool:
+        """Mark a walk of `topic_url` in progress; True if the previous one was complete."""
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT complete FROM topic_walk WHERE topic_url = ?", (topic_url,)).fetchone()
+            self.conn.execute(
+                "INSERT INTO topic_walk (topic_url, complete, started_at) VALUES (?, 0, ?) "
+                "ON CONFLICT(topic_url) DO UPDATE SET complete = 0, started_at = excluded.started_at",
+                (topic_url, time.time()),
+            )
+        return bool(row and row["complete"])
+
+    def finish(self, topic_url: str, last_page: int) -> None:
+        """Mark the walk of `topic_url` complete, having loaded pages 1 to `last_page`."""
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE topic_walk SET complete = 1, last_page = ?, finished_at = ? WHERE topic_url = ?",
+                (last_page, time.time(), topic_url),
+            )
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,135 @@
+import re
+import resource
+import sys
+from typing import Dict, Iterator, Optional, Set, Union
+
+# Document pages end in -<id>.aspx (or carry /<id>/), Q&A articles end in -<id>.html
+NUMERIC_ID = re.compile(r"/(\d+)/|-(\d+)\.(?:aspx|html?)")
+
+
+def numeric_id(url: str) -> Optional[int]:
+    """The integer page ID carried by a thuvienphapluat.vn URL, or None."""
+    match = NUMERIC_ID.search(url)
+    if match is None:
+        return None
+    return int(match.group(1) or match.group(2))
+
+
+# IDs per bitmap page: 8 KB each once dense
+PAGE_BITS = 16
+PAGE_BYTES = 1 << (PAGE_BITS - 3)
+# A page holding fewer IDs than this is a set of offsets, smaller than its bitmap
+SPARSE_LIMIT = 128
+
+
+class UrlStatus:
+    """Per-URL crawl outcome in two bitmaps indexed by page ID (one bit per ID).
+
+    Replaces lists of URL strings for long runs: a million IDs cost 250 KB in
+    total. The bitmaps are paged by ID range and a page only becomes a bitmap
+    once it holds SPARSE_LIMIT IDs (a set of offsets until then), so memory
+    follows the number of IDs, not the largest one. URLs without a numeric
+    ID fall back to a small dict.
+    """
+
+    def __init__(self):
+        self.succeeded: Dict[int, Union[Set[int], bytearray]] = {}
+        self.failed: Dict[int, Union[Set[int], bytearray]] = {}
+        self.other: Dict[str, bool] = {}
+        self.success_count = 0
+        self.failure_count = 0
+
+    @staticmethod
+    def _test(bitmap: Dict[int, Union[Set[int], bytearray]], page_id: int) -> bool:
+        page = bitmap.get(page_id >> PAGE_BITS)
+        offset = page_id & ((1 << PAGE_BITS) - 1)
+        if page is None:
+            return False
+        if isinstance(page, set):
+            return offset in page
+        return bool(page[offset >> 3] & (1 << (offset & 7)))
+
+    @staticmethod
+    def _set(bitmap: Dict[int, Union[Set[int], bytearray]], page_id: int, value: bool) -> None:
+        index = page_id >> PAGE_BITS
+        offset = page_id & ((1 << PAGE_BITS) - 1)
+        page = bitmap.get(index)
+        if page is None:
+            if not value:
+                return
+            page = bitmap[index] = set()
+        if isinstance(page, set):
+            if not value:
+                page.discard(offset)
+                return
+            page.add(offset)
+            if len(page) < SPARSE_LIMIT:
+                return
+            offsets, page = page, bytearray(PAGE_BYTES)
+            for other in offsets:
+                page[other >> 3] |= 1 << (other & 7)
+            bitmap[index] = page
+        elif value:
+            page[offset >> 3] |= 1 << (offset & 7)
+        else:
+            page[offset >> 3] &= ~(1 << (offset & 7)) & 0xFF
+
+    def mark(self, url: str, ok: bool) -> None:
+        """Record the latest outcome of `url`; a retried URL moves between the two sets."""
+        previous = self.get(url)
+        if previous is ok:
+            return
+        page_id = numeric_id(url)
+        if page_id is None:
+            self.other[url] = ok
+        else:
+            self._set(self.succeeded, page_id, ok)
+            self._set(self.failed, page_id, not ok)
+        if previous is not None:
+            if previous:
+                self.success_count -= 1
+            else:
+                self.failure_count -= 1
+        if ok:
+            self.success_count += 1
+        else:
+            self.failure_count += 1
+
+    def get(self, url: str) -> Optional[bool]:
+        """True/False for a crawled URL, None when it was never recorded."""
+        page_id = numeric_id(url)
+        if page_id is None:
+            return self.other.get(url)
+        if self._test(self.succeeded, page_id):
+            return True
+        if self._test(self.failed, page_id):
+            return False
+        return None
+
+    def iter_ids(self, ok: bool) -> Iterator[int]:
+        """IDs of the succeeded (or failed) numeric URLs, ascending."""
+        bitmap = self.succeeded if ok else self.failed
+        for page_index in sorted(bitmap):
+            first_id = page_index << PAGE_BITS
+            page = bitmap[page_index]
+            if isinstance(page, set):
+                for offset in sorted(page):
+                    yield first_id | offset
+                continue
+            for byte_index, byte in enumerate(page):
+                if byte:
+                    for bit in range(8):
+                        if byte & (1 << bit):
+                            yield first_id | (byte_index << 3) | bit
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the bitmap pages and offset sets (the int objects in the sets not counted)."""
+        return sum(len(page) if isinstance(page, bytearray) else sys.getsizeof(page) for bitmap in (self.succeeded, self.failed) for page in bitmap.values())
+
+
+def peak_rss_mb(children: bool = False) -> float:
+    """Peak resident set size of this process (or of its reaped children) in MB."""
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
@@ -1,64 +1,135 @@
-import requests
-from bs4 import BeautifulSoup
 import pandas as pd
-from typing import List, Optional
-from random import choice
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
 import re
 import os
 
-# Get the absolute path to the project root directory
-PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-PROXY_LIST_PATH = os.path.join(PROJECT_ROOT, 'config', 'proxy_list.txt')
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = pc = None
 
-def create_proxy_list():
-    PROXY_URL = 'https://api.proxyscrape.com/v2/?request=displayproxies&protocol=http&timeout=10000&country=all&ssl=all&anonymity=all'
-    proxy_list = requests.get(PROXY_URL)
-    os.makedirs(os.path.dirname(PROXY_LIST_PATH), exist_ok=True)
-    with open(PROXY_LIST_PATH, 'w') as f:
-        f.write(proxy_list.text.replace('\r\n', '\n'))
+from .http_client import fetch, set_proxy_pool
+from .html_parser import make_soup
+from .proxy_pool import ProxyPool, PROJECT_ROOT, PROXY_LIST_PATH, create_proxy_list
+
+_proxy_pool: Optional[ProxyPool] = None
+
+# Root of the absolute URLs the extractors build (LoadLuocDo, Q&A article links);
+# the offline benchmarks point it at a local stand-in of the site
+SITE_URL = "https://thuvienphapluat.vn"
+_site_url = SITE_URL
+
+# URL patterns, in the syntax both re and pyarrow's RE2 read the same way (named groups,
+# explicit character classes), so the batch functions below extract exactly what the scalar ones do.
+# Document pages carry their ID as /<id>/ or end in -<id>.aspx
+DOCUMENT_ID = re.compile(r"/(?P<slash>[0-9]+)/|-(?P<aspx>[0-9]+)\.aspx")
+# Scheme, host, port and path of an absolute URL; the query and fragment are matched but not kept
+URL_PARTS = re.compile(
+    r"^[\t\n\v\f\r ]*(?P<scheme>[A-Za-z][A-Za-z0-9+.-]*)://(?P<host>[^/?#:@\t\n\v\f\r ]+)(?::(?P<port>[0-9]*))?"
+    r"(?P<path>[^?#\t\n\v\f\r ]*)(?:[?#][^\t\n\v\f\r ]*)?[\t\n\v\f\r ]*$"
+)
+# A URL canonicalize_url leaves as it is: lower-case scheme and host, no port, a path and nothing after it
+CANONICAL_URL = re.compile(r"^[a-z][a-z0-9+.-]*://[a-z0-9.-]*[a-z0-9-]/[^?#\t\n\v\f\r ]*$")
+# The second path segment of a Q&A listing URL, e.g. lao-dong-tien-luong
+TYPE_OF_LAW = re.compile(r"^[^/]*/[^/]*/[^/]*/[^/]*/(?P<type>[^/?]*)")
+PAGE_NUMBER = re.compile(r"[?&]page=([0-9]+)")
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+def set_site_url(url: str) -> None:
+    global _site_url
+    _site_url = url.rstrip("/")
+
+def get_site_url() -> str:
+    return _site_url
+
+def use_proxy_pool(refresh: bool = True) -> ProxyPool:
+    """Load the proxy list once and route every fetch through the pool."""
+    global _proxy_pool
+    if _proxy_pool is None:
+        _proxy_pool = ProxyPool(PROXY_LIST_PATH)
+        if refresh:
+            _proxy_pool.start_refresh()
+        set_proxy_pool(_proxy_pool)
+    return _proxy_pool
 
 def choice_proxy() -> Optional[str]:
-    if not os.path.exists(PROXY_LIST_PATH):
-        create_proxy_list()
-    
-    with open(PROXY_LIST_PATH, 'r') as f:
-        proxies = f.read().split('\n')
-        return choice(proxies)
-
-def get_id_from_url(url: str) -> str:
-    regex = re.search('(/[0-9]+/)|(-[0-9]+.aspx)', url)
-    id_index = list(regex.span())
-    result = url[id_index[0]:id_index[1]]
-    return re.sub(".aspx|/|-", "", result)
-
-def load_url(url: str, return_content: bool = False) -> Optional[str]:
-    """Load URL content with error handling."""
-    proxy = choice_proxy()
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"}
-    response = requests.get(url, headers=headers, proxies={'http':proxy})
+    """A proxy from the pool `use_proxy_pool` installed (see --proxy), or None without one."""
+    if _proxy_pool is None:
+        return None
+    return _proxy_pool.choose()
+
+@lru_cache(maxsize=65536)
+def _document_id(url: str) -> Optional[str]:
+    match = DOCUMENT_ID.search(url)
+    if match is None:
+        return None
+    return match.group(1) or match.group(2)
+
+def get_id_from_url(url: str) -> Optional[str]:
+    """The document ID of a document URL, or None when it carries none.
+
+    Cached, as the frontier and the extractors look up the same URL several times.
+    """
+    if not isinstance(url, str):
+        return None
+    return _document_id(url)
+
+def canonicalize_url(url: str) -> Optional[str]:
+    """`url` without its query and fragment, with the scheme and host in lower case and no default port.
+
+    None for anything that is not an absolute http(s)-style URL. Listing URLs
+    keep their meaning in ?page=, so this is for document and article URLs.
+    """
+    if not isinstance(url, str):
+        return None
+    match = URL_PARTS.match(url)
+    if match is None:
+        return None
+    scheme, host, port, path = match.groups()
+    scheme = scheme.lower()
+    netloc = host.lower().rstrip(".")
+    if port and port != DEFAULT_PORTS.get(scheme):
+        netloc += ":" + port
+    return f"{scheme}://{netloc}{path or '/'}"
+
+def load_url(
+    url: str,
+    return_content: bool = False,
+    headers: Optional[Dict[str, str]] = None,
+    raise_errors: bool = False,
+) -> Optional[str]:
+    """Load URL content with error handling.
+
+    Extra `headers` (e.g. If-None-Match for a conditional GET) are sent along; a 304
+    response is returned as is when `return_content` is False. An error status
+    gives None, or raises the HTTPError (with the response) with `raise_errors`.
+    """
+    response = fetch(url, headers=headers)
+    if raise_errors:
+        response.raise_for_status()
     try:
         response.raise_for_status()
         if not return_content:
             return response
         else:
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = make_soup(response.content)
             return soup
     except Exception as e: 
         print(e)
 
-def load_url_luocdo(url, url_luocdo, return_content=False):
-    proxy = choice_proxy()
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-        "Referer": url
-    }
-    response = requests.get(url_luocdo, headers=headers, proxies={'http':proxy})
+def load_url_luocdo(url, url_luocdo, return_content=False, headers=None, raise_errors=False):
+    headers = {**(headers or {}), "Referer": url}
+    response = fetch(url_luocdo, headers=headers)
+    if raise_errors:
+        response.raise_for_status()
     try:
         response.raise_for_status()
         if not return_content:
             return response
         else:
-            soup = BeautifulSoup(response.content, 'html.parser')
+            soup = make_soup(response.content)
             return soup
     except Exception as e: 
         print(e)
@@ -73,6 +144,104 @@ def get_all_sitemaps_url(sitemap_url: str) -> List[str]:
     return [tag.text for tag in sitemap_tags]
 
 # Helper function for crawl Q&A
-def get_type_of_law(url):
-    text = url.split("/")[4]
-    return text.split("?")[0]
\ No newline at end of file
+def get_type_of_law(url: str) -> Optional[str]:
+    """The Q&A type in a listing URL (its second path segment), or None."""
+    if not isinstance(url, str):
+        return None
+    parts = url.split("/", 5)
+    return parts[4].split("?", 1)[0] if len(parts) > 4 else None
+
+def get_page_number(url: str) -> Optional[int]:
+    """The ?page= number of a listing URL, or None."""
+    if not isinstance(url, str):
+        return None
+    match = PAGE_NUMBER.search(url)
+    return int(match.group(1)) if match else None
+
+# Batch versions for whole sitemaps: take a list, pandas Series or pyarrow array of
+# URLs and return a pandas string Series with <NA> where the scalar function gives
+# None. With pyarrow they run as vectorized Arrow (RE2) kernels, else as a loop.
+def _url_array(urls: Any) -> "pa.ChunkedArray":
+    if isinstance(urls, (pa.Array, pa.ChunkedArray)):
+        array = urls
+    else:
+        urls = urls if isinstance(urls, (list, tuple, pd.Series)) else list(urls)
+        try:
+            array = pa.array(urls, type=pa.string(), from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Anything but a string (numbers, bytes) counts as malformed
+            array = pa.array([url if isinstance(url, str) else None for url in urls], type=pa.string())
+    array = array if isinstance(array, pa.ChunkedArray) else pa.chunked_array([array])
+    if not (pa.types.is_string(array.type) or pa.types.is_large_string(array.type)):
+        array = array.cast(pa.string())
+    return array
+
+def _string_series(values: Any) -> pd.Series:
+    if pa is not None and isinstance(values, (pa.Array, pa.ChunkedArray)):
+        return pd.Series(pd.arrays.ArrowStringArray(values))
+    return pd.Series(values, dtype="string")
+
+def _map(func, urls: Iterable[Any]) -> pd.Series:
+    if isinstance(urls, pd.Series) or (pa is not None and isinstance(urls, (pa.Array, pa.ChunkedArray))):
+        urls = urls.tolist() if isinstance(urls, pd.Series) else urls.to_pylist()
+    return _string_series([func(url) for url in urls])
+
+def _arrow_document_ids(urls: "pa.ChunkedArray") -> "pa.ChunkedArray":
+    parts = pc.extract_regex(urls, DOCUMENT_ID.pattern)
+    slash = pc.struct_field(parts, "slash")
+    return pc.if_else(pc.equal(slash, ""), pc.struct_field(parts, "aspx"), slash)
+
+def _arrow_canonical(urls: "pa.ChunkedArray") -> "pa.Array":
+    # Extracting the parts is the slow kernel, so URLs that are canonical already skip it
+    urls = urls.combine_chunks()
+    rework = pc.invert(pc.fill_null(pc.match_substring_regex(urls, CANONICAL_URL.pattern), False))
+    parts = pc.extract_regex(urls.filter(rework), URL_PARTS.pattern)
+    scheme = pc.ascii_lower(pc.struct_field(parts, "scheme"))
+    host = pc.utf8_rtrim(pc.utf8_lower(pc.struct_field(parts, "host")), characters=".")
+    port = pc.struct_field(parts, "port")
+    path = pc.struct_field(parts, "path")
+    default_port = pc.or_(
+        pc.equal(port, ""),
+        pc.or_(
+            pc.and_(pc.equal(scheme, "http"), pc.equal(port, "80")),
+            pc.and_(pc.equal(scheme, "https"), pc.equal(port, "443")),
+        ),
+    )
+    netloc = pc.if_else(default_port, host, pc.binary_join_element_wise(host, port, ":"))
+    path = pc.if_else(pc.equal(path, ""), "/", path)
+    canonical = pc.binary_join_element_wise(scheme, pc.binary_join_element_wise(netloc, path, ""), "://")
+    return pc.replace_with_mask(urls, rework, canonical)
+
+def document_ids(urls: Iterable[str]) -> pd.Series:
+    """`get_id_from_url` of every URL."""
+    if pa is None:
+        return _map(get_id_from_url, urls)
+    return _string_series(_arrow_document_ids(_url_array(urls)))
+
+def canonicalize_urls(urls: Iterable[str]) -> pd.Series:
+    """`canonicalize_url` of every URL."""
+    if pa is None:
+        return _map(canonicalize_url, urls)
+    return _string_series(_arrow_canonical(_url_array(urls)))
+
+def types_of_law(urls: Iterable[str]) -> pd.Series:
+    """`get_type_of_law` of every URL."""
+    if pa is None:
+        return _map(get_type_of_law, urls)
+    return _string_series(pc.struct_field(pc.extract_regex(_url_array(urls), TYPE_OF_LAW.pattern), "type"))
+
+def unique_urls(urls: Iterable[str]) -> pd.Series:
+    """Canonical URLs, the first of each document ID (or canonical URL when it has none); malformed ones dropped."""
+    if pa is None:
+        seen, unique = set(), []
+        for url in _map(canonicalize_url, urls).dropna():
+            key = get_id_from_url(url) or url
+            if key not in seen:
+                seen.add(key)
+                unique.append(url)
+        return _string_series(unique)
+    canonical = _arrow_canonical(_url_array(urls))
+    keys = pc.coalesce(_arrow_document_ids(canonical), canonical)
+    table = pa.table({"key": keys, "index": pa.array(range(len(keys)), type=pa.int64())}).filter(pc.is_valid(keys))
+    first = table.group_by("key", use_threads=False).aggregate([("index", "min")])["index_min"]
+    return _string_series(canonical.take(pc.take(first, pc.sort_indices(first))))
@@ -0,0 +1,75 @@
+import logging
+from threading import Event, Thread
+from typing import Optional
+
+from .frontier import CrawlFrontier
+from .metrics import get_metrics
+from .rate_limiter import cap_rate_limit
+
+
+class WorkerHeartbeat:
+    """Keeps one worker's frontier leases alive and its share of the per-host budget current.
+
+    Every `interval` seconds (a third of the lease, at most 5, by default) the
+    worker's leases are renewed and the live workers counted. `host_rate`
+    requests per second and `host_concurrency` requests in flight are the
+    politeness budget of each host for all workers together: every worker caps
+    its own limiters at an equal share, so the site sees the same load whether
+    one worker or twenty are running. Use as a context manager around the crawl.
+    """
+
+    def __init__(
+        self,
+        frontier: CrawlFrontier,
+        interval: Optional[float] = None,
+        host_rate: Optional[float] = None,
+        host_concurrency: Optional[int] = None,
+    ):
+        if frontier.worker_id is None:
+            raise ValueError("WorkerHeartbeat needs a frontier opened with a worker_id")
+        self.frontier = frontier
+        self.interval = interval or min(5.0, frontier.lease_seconds / 3)
+        self.host_rate = host_rate
+        self.host_concurrency = host_concurrency
+        self.live_workers = 0
+        self.logger = logging.getLogger(__name__)
+        self._stopped = Event()
+        self._thread = Thread(target=self._run, daemon=True)
+
+    def beat(self) -> None:
+        live = max(1, self.frontier.heartbeat())
+        metrics = get_metrics()
+        if metrics is not None:
+            metrics.set_gauge("live_workers", live)
+        if live == self.live_workers:
+            return
+        self.live_workers = live
+        if self.host_rate is not None or self.host_concurrency is not None:
+            rate = self.host_rate / live if self.host_rate is not None else float("inf")
+            concurrency = max(1, self.host_concurrency // live) if self.host_concurrency is not None else None
+            cap_rate_limit(rate, concurrency)
+            self.logger.info(f"{live} live workers: {self.frontier.worker_id} gets {rate:.2f} req/s, {concurrency} in flight per host")
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self.beat()
+            except Exception as e:
+                # A busy shared database must not stop the beat; the lease outlasts a few misses
+                self.logger.warning(f"Heartbeat of {self.frontier.worker_id} failed: {e}")
+
+    def start(self) -> "WorkerHeartbeat":
+        self.beat()
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def __enter__(self) -> "WorkerHeartbeat":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()